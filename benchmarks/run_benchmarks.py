@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Parser and model benchmarks
+
+Times the hot paths between a Darwin response and the JSON the board
+receives: SOAP parsing in both clients, per-service parsing, _get_text,
+calculate_delay_minutes, multi-destination filtering and serialization.
+Every case runs against the recorded boards in benchmarks/fixtures/ and
+synthetic boards of 1 to 150 rows.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py                 # compare with baseline.json
+    python3 benchmarks/run_benchmarks.py --save          # write a new baseline
+    python3 benchmarks/run_benchmarks.py -k parse -t 0.5 # subset, 50% threshold
+
+Exits with status 1 if any case is slower, or allocates more, than the
+baseline by more than the threshold. Timings are scaled by a calibration
+loop so a baseline recorded on one machine stays usable on another.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+sys.path.insert(0, str(ROOT / 'standalone'))
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from darwin_api import NS, DarwinApi, _cut_calling_points  # noqa: E402
+from darwin_simulator import Network, SimulatorConfig, render_board  # noqa: E402
+
+SYNTHETIC_ROWS = (1, 10, 50, 150)
+SYNTHETIC_NOW = datetime(2026, 1, 26, 7, 30)
+FILTER_DESTINATIONS = ['RDG', 'OXF']
+FILTER_NUM = 6
+
+DEFAULT_THRESHOLD = 0.25
+# Allocation growth below this many bytes is noise, whatever the percentage
+ALLOC_SLACK = 4096
+MIN_SAMPLE_TIME = 0.1
+REPEATS = 5
+
+
+@dataclass
+class Result:
+    """Timing and allocation figures for one case on one board."""
+
+    name: str
+    rows: int
+    per_board_us: float
+    boards_per_sec: float
+    peak_kib: float
+
+
+def load_integration_api():
+    """Load the integration's api.py without importing Home Assistant."""
+    path = ROOT / 'custom_components' / 'uk_train_departures' / 'api.py'
+    try:
+        spec = importlib.util.spec_from_file_location('uk_train_departures_api', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except ImportError as e:
+        print(f"Skipping integration cases: {e}")
+        return None
+    return module
+
+
+def load_app():
+    """Import the standalone Flask app, or None if Flask is not installed."""
+    try:
+        import app
+    except ImportError as e:
+        print(f"Skipping filtering/serialization cases: {e}")
+        return None
+    return app
+
+
+def load_boards() -> dict[str, str]:
+    """Return board XML keyed by name: recorded fixtures, then synthetic boards."""
+    boards = {}
+    for path in sorted(FIXTURES.glob('*.xml')):
+        boards[path.stem] = path.read_text(encoding='utf-8')
+
+    config = SimulatorConfig(services=max(SYNTHETIC_ROWS), window=max(SYNTHETIC_ROWS),
+                             calling_points=10, seed=1)
+    network = Network(config)
+    for rows in SYNTHETIC_ROWS:
+        services = network.board('PAD', rows, time_window=max(SYNTHETIC_ROWS),
+                                 now=SYNTHETIC_NOW)
+        boards[f'synthetic_{rows}'] = render_board(
+            network, 'GetDepBoardWithDetails', 'PAD', services,
+            with_details=True, now=SYNTHETIC_NOW,
+        )
+    return boards
+
+
+def build_cases(boards: dict[str, str]) -> list[tuple[str, int, Callable[[], None]]]:
+    """Return (name, rows, fn) for every case on every board."""
+    api = DarwinApi('benchmark')
+    ha_api = load_integration_api()
+    app = load_app()
+    fields = ['lt4:serviceID', 'lt4:std', 'lt4:etd', 'lt4:platform',
+              'lt4:operator', 'lt4:operatorCode', 'lt4:cancelReason', 'lt4:delayReason']
+
+    cases = []
+    for board, xml_text in boards.items():
+        # Services as _parse_response sees them, with calling points cut out
+        cut_text, slices, namespaces = _cut_calling_points(xml_text)
+        elems = ET.fromstring(cut_text).findall('.//lt8:service', NS)
+        decode = partial(api._decode_calling_points, namespaces)
+        rows = len(elems)
+
+        def parse(xml_text=xml_text):
+            api._parse_response(xml_text)
+
+        def parse_decoded(xml_text=xml_text):
+            for service in api._parse_response(xml_text):
+                len(service.calling_points)
+
+        def parse_service(elems=elems, slices=slices, decode=decode):
+            for elem in elems:
+                api._parse_service(elem, slices, decode)
+
+        def get_text(elems=elems):
+            for elem in elems:
+                for path in fields:
+                    api._get_text(elem, path)
+
+        cases += [
+            (f'parse_response[{board}]', rows, parse),
+            (f'parse_response_decoded[{board}]', rows, parse_decoded),
+            (f'parse_service[{board}]', rows, parse_service),
+            (f'get_text[{board}]', rows, get_text),
+        ]
+
+        if ha_api is not None:
+            ha_client = ha_api.DarwinApi('benchmark')
+            times = [(s.scheduled_time, s.expected_time)
+                     for s in ha_client._parse_response(xml_text)]
+
+            def parse_ha(xml_text=xml_text, client=ha_client):
+                client._parse_response(xml_text)
+
+            def delay_minutes(times=times, fn=ha_api.calculate_delay_minutes):
+                for scheduled, expected in times:
+                    fn(scheduled, expected)
+
+            cases += [
+                (f'parse_response_integration[{board}]', rows, parse_ha),
+                (f'calculate_delay_minutes[{board}]', rows, delay_minutes),
+            ]
+
+        if app is not None:
+            services = api._parse_response(xml_text)
+
+            def select(services=services):
+                app.select_departures(api, services, FILTER_DESTINATIONS, FILTER_NUM)
+
+            def serialize(services=services, now=SYNTHETIC_NOW.replace(tzinfo=app.UK_TIMEZONE)):
+                json.dumps([app.departure_to_dict(s, now) for s in services])
+
+            cases += [
+                (f'filter_destinations[{board}]', rows, select),
+                (f'json_serialize[{board}]', rows, serialize),
+            ]
+    return cases
+
+
+def time_per_call(fn) -> float:
+    """Return the best per-call time in seconds over several samples."""
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_TIME:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def peak_allocation(fn) -> int:
+    """Return the peak bytes allocated during one call."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def calibrate() -> float:
+    """Time a fixed parse-and-sort workload, in microseconds, to scale baselines."""
+    xml_text = '<r>' + ''.join(f'<i n="{i}">{i * 7 % 101}</i>' for i in range(200)) + '</r>'
+
+    def workload():
+        values = [int(e.text) for e in ET.fromstring(xml_text)]
+        sorted(values)
+        json.dumps(values)
+
+    return time_per_call(workload) * 1e6
+
+
+def run(cases, pattern=None) -> list[Result]:
+    """Run the selected cases and print a table."""
+    results = []
+    print(f"{'case':58} {'rows':>5} {'us/board':>10} {'boards/s':>10} {'peak KiB':>9}")
+    for name, rows, fn in cases:
+        if pattern and pattern not in name:
+            continue
+        per_call = time_per_call(fn)
+        result = Result(
+            name=name,
+            rows=rows,
+            per_board_us=per_call * 1e6,
+            boards_per_sec=1 / per_call,
+            peak_kib=peak_allocation(fn) / 1024,
+        )
+        results.append(result)
+        print(f"{name:58} {rows:>5} {result.per_board_us:>10.1f} "
+              f"{result.boards_per_sec:>10.0f} {result.peak_kib:>9.1f}")
+    return results
+
+
+def compare(results: list[Result], calibration_us: float, threshold: float) -> int:
+    """Compare results with the stored baseline and return the number of regressions."""
+    if not BASELINE.exists():
+        print(f"\nNo baseline at {BASELINE}; run with --save to create one.")
+        return 0
+
+    baseline = json.loads(BASELINE.read_text())
+    scale = calibration_us / baseline['calibration_us']
+    print(f"\nCalibration {calibration_us:.1f} us vs {baseline['calibration_us']:.1f} us "
+          f"in baseline (x{scale:.2f}); threshold {threshold:.0%}")
+
+    regressions = 0
+    for result in results:
+        base = baseline['results'].get(result.name)
+        if base is None:
+            continue
+        expected_us = base['per_board_us'] * scale
+        if result.per_board_us > expected_us * (1 + threshold):
+            regressions += 1
+            print(f"REGRESSION {result.name}: {result.per_board_us:.1f} us/board, "
+                  f"baseline {expected_us:.1f} us (scaled)")
+        peak_limit = base['peak_kib'] * (1 + threshold) + ALLOC_SLACK / 1024
+        if result.peak_kib > peak_limit:
+            regressions += 1
+            print(f"REGRESSION {result.name}: {result.peak_kib:.1f} KiB peak, "
+                  f"baseline {base['peak_kib']:.1f} KiB")
+
+    if not regressions:
+        print("No regressions.")
+    return regressions
+
+
+def save(results: list[Result], calibration_us: float) -> None:
+    """Write results as the new baseline, keeping cases that were not run."""
+    existing = json.loads(BASELINE.read_text())['results'] if BASELINE.exists() else {}
+    existing.update({r.name: asdict(r) for r in results})
+    BASELINE.write_text(json.dumps({
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'recorded': datetime.now().isoformat(timespec='seconds'),
+        'calibration_us': calibration_us,
+        'results': dict(sorted(existing.items())),
+    }, indent=2) + '\n')
+    print(f"\nBaseline written to {BASELINE}")
+
+
+def main():
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description='Parser and model benchmarks')
+    parser.add_argument('-k', dest='pattern', help='only run cases containing this text')
+    parser.add_argument('-t', '--threshold', type=float,
+                        default=float(os.environ.get('BENCH_THRESHOLD', DEFAULT_THRESHOLD)),
+                        help='allowed slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--save', action='store_true', help='store results as the baseline')
+    args = parser.parse_args()
+
+    cases = build_cases(load_boards())
+    calibration_us = calibrate()
+    results = run(cases, args.pattern)
+
+    if args.save:
+        save(results, calibration_us)
+        return 0
+    return 1 if compare(results, calibration_us, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,12 +5,16 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
 from .api import DarwinApi
 from .const import (
     CONF_API_TOKEN,
     CONF_DESTINATION_CRS,
+    CONF_HEDGE_REQUESTS,
+    CONF_LAZY_CALLING_POINTS,
     CONF_NUM_DEPARTURES,
     CONF_STATION_CRS,
     CONF_WATCHED_TRAIN_1_TIME,
@@ -23,19 +27,40 @@ from .const import (
     DOMAIN,
 )
 from .coordinator import TrainDeparturesCoordinator
+from .punctuality import STORAGE_VERSION as PUNCTUALITY_STORAGE_VERSION, PunctualityTracker
+from .stations import get_station_index
+from .telemetry import CoordinatorTelemetry
+from .websocket_api import async_register_websocket_commands
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BINARY_SENSOR]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    """Set up the parts of the integration shared by every config entry."""
+    async_register_websocket_commands(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up UK Train Departures from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
-    # Create API client with HA's shared session
+    # Load the station index off the event loop before sensors look up names
+    await hass.async_add_executor_job(get_station_index)
+
+    # Create API client with HA's shared session, reporting fetch telemetry
     session = async_get_clientsession(hass)
-    api = DarwinApi(entry.data[CONF_API_TOKEN], session=session)
+    telemetry = CoordinatorTelemetry()
+    api = DarwinApi(
+        entry.data[CONF_API_TOKEN],
+        session=session,
+        hedge=entry.data.get(CONF_HEDGE_REQUESTS, False),
+        metrics=telemetry,
+    )
 
     # Build watched trains list
     watched_trains = []
@@ -60,6 +85,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry.data[CONF_STATION_CRS], destination_crs, dict(entry.data)
     )
 
+    # Restore the rolling punctuality counters kept for this entry
+    punctuality_store = Store(hass, PUNCTUALITY_STORAGE_VERSION, _punctuality_storage_key(entry))
+    punctuality = PunctualityTracker.from_dict(await punctuality_store.async_load())
+
     # Create coordinator
     coordinator = TrainDeparturesCoordinator(
         hass=hass,
@@ -68,6 +97,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         num_departures=entry.data.get(CONF_NUM_DEPARTURES, DEFAULT_NUM_DEPARTURES),
         destination_crs=destination_crs,
         watched_trains=watched_trains,
+        lazy_calling_points=entry.data.get(CONF_LAZY_CALLING_POINTS, False),
+        telemetry=telemetry,
+        punctuality=punctuality,
+        punctuality_store=punctuality_store,
     )
 
     # Fetch initial data
@@ -83,6 +116,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        # Don't lose counts still waiting for the delayed save on a reload
+        await coordinator.async_save_punctuality()
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored punctuality counters of a deleted config entry."""
+    await Store(hass, PUNCTUALITY_STORAGE_VERSION, _punctuality_storage_key(entry)).async_remove()
+
+
+def _punctuality_storage_key(entry: ConfigEntry) -> str:
+    """Return the storage key for an entry's punctuality counters."""
+    return f"{DOMAIN}.punctuality.{entry.entry_id}"
@@ -2,8 +2,16 @@
 
 import asyncio
 import logging
+import random
+import re
+import threading
+import time
 import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from collections.abc import Sequence
 from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
 from typing import Optional
 
 import aiohttp
@@ -13,6 +21,60 @@ _LOGGER = logging.getLogger(__name__)
 # Darwin API endpoint
 DARWIN_ENDPOINT = "https://lite.realtime.nationalrail.co.uk/OpenLDBWS/ldb12.asmx"
 
+# SOAP actions for the operations we call
+SOAP_ACTION_DEP_BOARD_WITH_DETAILS = 'http://thalesgroup.com/RTTI/2015-05-14/ldb/GetDepBoardWithDetails'
+SOAP_ACTION_DEP_BOARD = 'http://thalesgroup.com/RTTI/2012-01-13/ldb/GetDepartureBoard'
+SOAP_ACTION_SERVICE_DETAILS = 'http://thalesgroup.com/RTTI/2012-01-13/ldb/GetServiceDetails'
+
+# How long fetched calling points are reused before asking Darwin again (seconds)
+SERVICE_DETAILS_TTL = 60
+
+# Bounds and defaults for adaptive board sizing
+DEFAULT_NUM_ROWS = 20
+DEFAULT_MIN_ROWS = 1
+DEFAULT_MAX_ROWS = 40
+DEFAULT_MIN_WINDOW = 30  # minutes
+DEFAULT_MAX_WINDOW = 120  # minutes, the most Darwin allows
+# Slack added on top of what recent boards actually needed
+ROW_HEADROOM = 2
+WINDOW_HEADROOM = 15  # minutes
+# Number of recent fetches the size estimates are based on
+SIZER_HISTORY = 10
+# Boards the sizer remembers; the least recently used is forgotten first
+SIZER_MAX_BOARDS = 256
+
+# Retry and circuit breaker settings for transient upstream errors
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 5.0  # seconds
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0  # seconds
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Timeouts for a single upstream call (seconds)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# Request hedging: send a second request once the first has taken longer
+# than the recent p95 latency, but only once there are enough samples
+LATENCY_WINDOW = 200
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.2  # seconds
+
+# Error kinds reported by DarwinApiError.kind
+ERROR_AUTH = "auth"
+ERROR_SOAP_FAULT = "soap_fault"
+ERROR_HTTP = "http"
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection"
+ERROR_PARSE = "parse"
+ERROR_DEADLINE = "deadline"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+ERROR_UNKNOWN = "unknown"
+
 # Status constants
 STATUS_ON_TIME = "on_time"
 STATUS_DELAYED = "delayed"
@@ -32,6 +94,54 @@ NS = {
     'lt8': 'http://thalesgroup.com/RTTI/2021-11-01/ldb/types',
 }
 
+# Start tag of a board's calling point list, cut out before the rest is
+# parsed. Self-closing tags are left alone: they have no closing tag to find.
+_CALLING_POINT_LIST = re.compile(
+    r"<((?:[\w.-]+:)?(?:previous|subsequent)CallingPoints)\b[^>]*(?<!/)>"
+)
+# Prefixed or default namespace declaration, with either quote style
+_NAMESPACE_DECLARATION = re.compile(r"""\sxmlns(?::([\w.-]+))?\s*=\s*(["'])(.*?)\2""")
+# Attribute on the empty element left where a list was cut out
+_RAW_REF = "raw"
+
+
+def _cut_calling_points(xml_text: str) -> tuple[str, list[str], str]:
+    """Cut the calling point lists out of a board response.
+
+    Returns the response with each list replaced by an empty element whose
+    raw attribute indexes the list's XML, the cut lists, and the namespace
+    declarations needed to parse a list on its own. A response that binds
+    one prefix to two namespaces is returned uncut, since its lists cannot
+    be parsed apart from their place in the document.
+    """
+    slices: list[str] = []
+    if "CallingPoints" not in xml_text:
+        return xml_text, slices, ""
+    parts = []
+    declarations: dict[str, tuple[str, str]] = {}
+    position = 0
+    while (match := _CALLING_POINT_LIST.search(xml_text, position)) is not None:
+        closing = f"</{match.group(1)}>"
+        end = xml_text.find(closing, match.end())
+        if end < 0:
+            break
+        end += len(closing)
+        # Only the text that is kept can declare the lists' prefixes
+        for prefix, quote, uri in _NAMESPACE_DECLARATION.findall(xml_text, position,
+                                                                 match.start()):
+            if declarations.setdefault(prefix, (quote, uri))[1] != uri:
+                return xml_text, [], ""
+        parts.append(xml_text[position:match.start()])
+        parts.append(f'<{match.group(1)} {_RAW_REF}="{len(slices)}"/>')
+        slices.append(xml_text[match.start():end])
+        position = end
+    parts.append(xml_text[position:])
+    namespaces = "".join(
+        f" xmlns{':' + prefix if prefix else ''}={quote}{uri}{quote}"
+        for prefix, (quote, uri) in declarations.items()
+    )
+    return "".join(parts), slices, namespaces
+
 
 @dataclass
 class CallingPoint:
@@ -55,6 +165,64 @@ class CallingPoint:
         return STATUS_ON_TIME
 
 
+# Held while a LazyCallingPoints list is decoded
+_DECODE_LOCK = threading.Lock()
+
+
+class LazyCallingPoints(Sequence):
+    """Calling points kept as the raw XML cut from the response until first accessed.
+
+    Most consumers only look at the service summary, so the lists are cut
+    out of the response before it is parsed and only parsed and decoded
+    when something reads them.
+    """
+
+    __slots__ = ('_raw', '_decode', '_items')
+
+    def __init__(self, raw: str, decode) -> None:
+        """Initialize with a service's calling point XML and the function decoding it."""
+        self._raw = raw
+        self._decode = decode
+        self._items: Optional[list[CallingPoint]] = None
+
+    @property
+    def is_materialized(self) -> bool:
+        """Return True once the calling points have been decoded."""
+        return self._items is not None
+
+    def _materialize(self) -> list[CallingPoint]:
+        """Decode the raw XML on first use and drop it."""
+        items = self._items
+        if items is None:
+            # Services are shared between threads; only one decodes
+            with _DECODE_LOCK:
+                if self._items is None:
+                    self._items = self._decode(self._raw)
+                    self._raw = None
+                    self._decode = None
+                items = self._items
+        return items
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __len__(self) -> int:
+        return len(self._materialize())
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (LazyCallingPoints, list)):
+            return self._materialize() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        if self._items is None:
+            return f"<LazyCallingPoints: {len(self._raw)} bytes undecoded>"
+        return repr(self._items)
+
+
 @dataclass
 class TrainService:
     """Represents a train departure service."""
@@ -70,7 +238,10 @@ class TrainService:
     is_cancelled: bool = False
     cancel_reason: Optional[str] = None
     delay_reason: Optional[str] = None
-    calling_points: list[CallingPoint] = field(default_factory=list)
+    calling_points: Sequence[CallingPoint] = field(default_factory=list)
+    # False when fetched from the lightweight board and calling points
+    # have not been loaded with GetServiceDetails yet
+    details_loaded: bool = True
 
     @property
     def status(self) -> str:
@@ -91,20 +262,438 @@ class TrainService:
 
 class DarwinApiError(Exception):
     """Exception for Darwin API errors."""
-    pass
+
+    def __init__(self, message: str, transient: bool = False, kind: str = ERROR_UNKNOWN):
+        """Initialize the error.
+
+        transient marks failures worth retrying, such as timeouts,
+        connection errors and 5xx responses. kind is one of the ERROR_*
+        constants, for diagnostics.
+        """
+        super().__init__(message)
+        self.transient = transient
+        self.kind = kind
+
+
+class CircuitOpenError(DarwinApiError):
+    """Raised without calling Darwin while the circuit breaker is open."""
+
+    def __init__(self, message: str):
+        """Initialize the error."""
+        super().__init__(message, transient=True, kind=ERROR_CIRCUIT_OPEN)
+
+
+class CircuitBreaker:
+    """Stops calling an endpoint after repeated transient failures.
+
+    After `failure_threshold` failed calls in a row the circuit opens and
+    calls fail fast. Once `reset_timeout` seconds have passed a single
+    half-open probe is let through: success closes the circuit again,
+    failure re-opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        """Initialize the breaker in the closed state."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def admit(self) -> tuple[bool, bool]:
+        """Return whether a call may be made now and whether it is the half-open probe.
+
+        Both are decided together, so only one caller is ever
+        the probe, and that caller must end with record_success, record_failure
+        or release_probe.
+        """
+        return self._admit()
+
+    def record_success(self) -> None:
+        """Record that the endpoint answered."""
+        self._record_success()
+
+    def record_failure(self) -> None:
+        """Record a call that failed with a transient error."""
+        self._record_failure()
+
+    def release_probe(self) -> None:
+        """Let another call probe if the half-open probe ended without a result."""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        """Return the breaker state for health checks and diagnostics."""
+        retry_in = None
+        if self.state == CIRCUIT_OPEN and self.opened_at is not None:
+            retry_in = max(0.0, round(self.opened_at + self.reset_timeout - time.monotonic(), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected,
+            "retry_in": retry_in,
+        }
+
+    def _admit(self) -> tuple[bool, bool]:
+        """Decide whether a call may be made, moving to half-open when due."""
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False, False
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False, False
+            self._probe_in_flight = True
+            return True, True
+        return True, False
+
+    def _record_success(self) -> None:
+        """Close the circuit."""
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def _record_failure(self) -> None:
+        """Count a failure and open the circuit if needed."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self.times_opened += 1
+                _LOGGER.warning("Darwin circuit breaker opened after %d failures", self.failures)
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+
+
+# One breaker per endpoint, shared by every client talking to it
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(endpoint: str = DARWIN_ENDPOINT) -> CircuitBreaker:
+    """Return the shared circuit breaker for an endpoint."""
+    breaker = _circuit_breakers.get(endpoint)
+    if breaker is None:
+        breaker = _circuit_breakers.setdefault(endpoint, CircuitBreaker())
+    return breaker
+
+
+class LatencyHistogram:
+    """Rolling window of recent upstream latencies.
+
+    Keeps the last `size` successful call durations and answers percentile
+    queries, which is what request hedging needs to decide when a call is
+    running unusually long.
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        """Initialize an empty histogram."""
+        self._samples: deque = deque(maxlen=size)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    @property
+    def count(self) -> int:
+        """Return the number of samples in the window."""
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        """Record the duration of a successful call."""
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the given percentile in seconds, or None without samples."""
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+    def stats(self) -> dict:
+        """Return latency percentiles and hedging counts."""
+        return {
+            "samples": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
+
+
+# One latency window per endpoint, shared by every client talking to it
+_latency_histograms: dict[str, LatencyHistogram] = {}
+
+
+def get_latency_histogram(endpoint: str = DARWIN_ENDPOINT) -> LatencyHistogram:
+    """Return the shared latency histogram for an endpoint."""
+    histogram = _latency_histograms.get(endpoint)
+    if histogram is None:
+        histogram = _latency_histograms.setdefault(endpoint, LatencyHistogram())
+    return histogram
+
+
+def retry_delay(attempt: int) -> float:
+    """Return a full-jitter exponential backoff delay for a retry attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+
+class ServiceDetailsCache:
+    """TTL cache of calling points keyed by service ID."""
+
+    def __init__(self, ttl: float = SERVICE_DETAILS_TTL, max_entries: int = 200):
+        """Initialize the cache."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, tuple[float, list[CallingPoint]]] = {}
+
+    def get(self, service_id: str) -> list[CallingPoint] | None:
+        """Return cached calling points, or None if missing or expired."""
+        entry = self._entries.get(service_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[service_id]
+        self.misses += 1
+        return None
+
+    def put(self, service_id: str, calling_points: list[CallingPoint]) -> None:
+        """Store calling points for a service."""
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        self._entries[service_id] = (time.monotonic() + self.ttl, calling_points)
+
+    def _evict(self) -> None:
+        """Drop expired entries, or the oldest half if none have expired."""
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        if not expired:
+            expired = list(self._entries)[:len(self._entries) // 2]
+        for key in expired:
+            del self._entries[key]
+
+
+def minutes_until(
+    scheduled: str, now: Optional[datetime] = None, clamp: bool = True
+) -> Optional[int]:
+    """Minutes from now until an HH:MM time, allowing for midnight wraparound.
+
+    Times up to 12 hours ago are in the past: 0 minutes, or negative
+    minutes when clamp is False.
+    """
+    try:
+        hours, minutes = map(int, scheduled.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    now = now or datetime.now()
+    diff = hours * 60 + minutes - (now.hour * 60 + now.minute)
+    if diff < -720:  # More than 12 hours negative = next day
+        diff += 1440
+    return max(0, diff) if clamp else diff
+
+
+def calculate_delay_minutes(scheduled: str, expected: str) -> int:
+    """Calculate delay in minutes between scheduled and expected times."""
+    if not scheduled or not expected:
+        return 0
+    if expected in ("On time", "Delayed", "Cancelled"):
+        return 0 if expected == "On time" else -1  # -1 for unknown delay
+
+    try:
+        # Parse times (HH:MM format)
+        sch_h, sch_m = map(int, scheduled.split(":"))
+        exp_h, exp_m = map(int, expected.split(":"))
+
+        sch_mins = sch_h * 60 + sch_m
+        exp_mins = exp_h * 60 + exp_m
+
+        # Handle day wraparound
+        diff = exp_mins - sch_mins
+        if diff < -720:  # More than 12 hours negative = next day
+            diff += 1440
+
+        return max(0, diff)
+    except (ValueError, AttributeError):
+        return 0
+
+
+@dataclass
+class _QuerySize:
+    """Learned query size and hit statistics for one board."""
+
+    num_rows: int
+    time_window: int
+    fetches: int = 0
+    filled: int = 0
+    grown: int = 0
+    recent_rows: deque = field(default_factory=lambda: deque(maxlen=SIZER_HISTORY))
+    recent_minutes: deque = field(default_factory=lambda: deque(maxlen=SIZER_HISTORY))
+
+
+class AdaptiveQuerySizer:
+    """Learns the numRows and timeWindow needed to fill a board.
+
+    Sizes are tracked per station, destination filter and number of wanted
+    departures. After each fetch the caller reports how many rows it had to
+    scan to find its departures; the sizer shrinks towards what recent boards
+    needed and grows as soon as a board comes back short.
+    """
+
+    def __init__(
+        self,
+        min_rows: int = DEFAULT_MIN_ROWS,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        min_window: int = DEFAULT_MIN_WINDOW,
+        max_window: int = DEFAULT_MAX_WINDOW,
+        initial_rows: int = DEFAULT_NUM_ROWS,
+        max_boards: int = SIZER_MAX_BOARDS,
+    ):
+        """Initialize the sizer with its bounds."""
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.min_window = min_window
+        self.max_window = max_window
+        self.initial_rows = initial_rows
+        self.max_boards = max_boards
+        self._sizes: OrderedDict[tuple, _QuerySize] = OrderedDict()
+
+    def max_size(self, wanted: int) -> tuple[int, int]:
+        """Return the unadapted query size: the initial rows and full window."""
+        return self._clamp_rows(self.initial_rows, wanted), self.max_window
+
+    def size_for(self, station_crs: str, destinations: Sequence[str],
+                 wanted: int) -> tuple[int, int]:
+        """Return the (num_rows, time_window) to request for a board."""
+        size = self._get(self._key(station_crs, destinations, wanted), wanted)
+        return size.num_rows, size.time_window
+
+    def record(self, station_crs: str, destinations: Sequence[str], wanted: int,
+               services: Sequence[TrainService], consumed: int, filled: bool) -> bool:
+        """Record a fetch that used the first `consumed` rows of `services`.
+
+        Returns True if the board came back short and the query has been
+        grown, so fetching again might fill it.
+        """
+        return self._record(self._key(station_crs, destinations, wanted),
+                            wanted, services, consumed, filled)
+
+    def stats(self) -> dict[str, dict]:
+        """Return the learned size and hit rate for each board."""
+        return self._stats()
+
+    def _stats(self) -> dict[str, dict]:
+        """Build the statistics for stats()."""
+        result = {}
+        for (station_crs, destinations, wanted), size in self._sizes.items():
+            name = station_crs
+            if destinations:
+                name += "->" + ",".join(destinations)
+            result[f"{name}/{wanted}"] = {
+                "num_rows": size.num_rows,
+                "time_window": size.time_window,
+                "fetches": size.fetches,
+                "filled": size.filled,
+                "grown": size.grown,
+                # Share of fetches where the learned size was big enough
+                "hit_rate": round(1 - size.grown / size.fetches, 3) if size.fetches else None,
+            }
+        return result
+
+    def _record(self, key: tuple, wanted: int, services: Sequence[TrainService],
+                consumed: int, filled: bool) -> bool:
+        """Update the learned size for one fetch."""
+        size = self._get(key, wanted)
+        size.fetches += 1
+
+        if filled:
+            size.filled += 1
+            size.recent_rows.append(consumed)
+            size.num_rows = self._clamp_rows(max(size.recent_rows) + ROW_HEADROOM, wanted)
+            minutes = minutes_until(services[consumed - 1].scheduled_time) if consumed else None
+            if minutes is not None:
+                size.recent_minutes.append(minutes)
+                size.time_window = self._clamp_window(max(size.recent_minutes) + WINDOW_HEADROOM)
+            return False
+
+        if len(services) >= size.num_rows and size.num_rows < self.max_rows:
+            # Darwin returned every row we asked for, so ask for more
+            size.num_rows = self._clamp_rows(size.num_rows * 2, wanted)
+        elif len(services) < size.num_rows and size.time_window < self.max_window:
+            # Fewer trains than rows, so the time window cut the board short
+            size.time_window = self.max_window
+        else:
+            # Already at the bounds - the station has no more trains
+            return False
+        size.grown += 1
+        return True
+
+    def _get(self, key: tuple, wanted: int) -> _QuerySize:
+        """Return the size for a board, creating it at the full size."""
+        size = self._sizes.get(key)
+        if size is not None:
+            self._sizes.move_to_end(key)
+            return size
+        num_rows, time_window = self.max_size(wanted)
+        size = self._sizes[key] = _QuerySize(num_rows, time_window)
+        if len(self._sizes) > self.max_boards:
+            self._sizes.popitem(last=False)
+        return size
+
+    def _clamp_rows(self, num_rows: int, wanted: int) -> int:
+        """Keep a row count within bounds and no smaller than the departures wanted."""
+        return min(self.max_rows, max(self.min_rows, wanted, num_rows))
+
+    def _clamp_window(self, time_window: int) -> int:
+        """Keep a time window within bounds."""
+        return min(self.max_window, max(self.min_window, time_window))
+
+    @staticmethod
+    def _key(station_crs: str, destinations: Sequence[str], wanted: int) -> tuple:
+        """Build the lookup key for a board."""
+        return station_crs.upper(), tuple(sorted(d.upper() for d in destinations)), wanted
 
 
 class DarwinApi:
     """Async client for the National Rail Darwin SOAP API."""
 
-    def __init__(self, api_token: str, session: aiohttp.ClientSession | None = None):
-        """Initialize the Darwin API client."""
+    def __init__(
+        self,
+        api_token: str,
+        session: aiohttp.ClientSession | None = None,
+        hedge: bool = False,
+        endpoint: str = DARWIN_ENDPOINT,
+        metrics=None,
+    ):
+        """Initialize the Darwin API client.
+
+        With hedge=True a second request is sent when the first one runs
+        past the recent p95 latency, and whichever answers first is used.
+        endpoint can point the client at a local simulator. metrics, if
+        given, receives upstream and parse timings and errors (see
+        telemetry.CoordinatorTelemetry).
+        """
         self._api_token = api_token
         self._session = session
+        self._endpoint = endpoint
+        self._metrics = metrics
+        self._details_cache = ServiceDetailsCache()
+        self._breaker = get_circuit_breaker(endpoint)
+        self._latency = get_latency_histogram(endpoint)
+        self._hedge = hedge
 
     def _build_request(self, station_crs: str, num_rows: int,
                        destination_crs: Optional[str] = None,
-                       time_offset: int = 0, time_window: int = 120) -> str:
+                       time_offset: int = 0, time_window: int = 120,
+                       with_details: bool = True) -> str:
         """Build the SOAP request XML."""
         filter_section = ""
         if destination_crs:
@@ -112,6 +701,25 @@ class DarwinApi:
             <ldb:filterCrs>{destination_crs.upper()}</ldb:filterCrs>
             <ldb:filterType>to</ldb:filterType>"""
 
+        operation = "GetDepBoardWithDetailsRequest" if with_details else "GetDepartureBoardRequest"
+
+        return self._build_envelope(f"""
+        <ldb:{operation}>
+            <ldb:numRows>{num_rows}</ldb:numRows>
+            <ldb:crs>{station_crs.upper()}</ldb:crs>{filter_section}
+            <ldb:timeOffset>{time_offset}</ldb:timeOffset>
+            <ldb:timeWindow>{time_window}</ldb:timeWindow>
+        </ldb:{operation}>""")
+
+    def _build_details_request(self, service_id: str) -> str:
+        """Build the SOAP request XML for GetServiceDetails."""
+        return self._build_envelope(f"""
+        <ldb:GetServiceDetailsRequest>
+            <ldb:serviceID>{service_id}</ldb:serviceID>
+        </ldb:GetServiceDetailsRequest>""")
+
+    def _build_envelope(self, body: str) -> str:
+        """Wrap a request body in the SOAP envelope with the access token."""
         return f"""<?xml version="1.0" encoding="utf-8"?>
 <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
                xmlns:typ="http://thalesgroup.com/RTTI/2013-11-28/Token/types"
@@ -121,13 +729,7 @@ class DarwinApi:
             <typ:TokenValue>{self._api_token}</typ:TokenValue>
         </typ:AccessToken>
     </soap:Header>
-    <soap:Body>
-        <ldb:GetDepBoardWithDetailsRequest>
-            <ldb:numRows>{num_rows}</ldb:numRows>
-            <ldb:crs>{station_crs.upper()}</ldb:crs>{filter_section}
-            <ldb:timeOffset>{time_offset}</ldb:timeOffset>
-            <ldb:timeWindow>{time_window}</ldb:timeWindow>
-        </ldb:GetDepBoardWithDetailsRequest>
+    <soap:Body>{body}
     </soap:Body>
 </soap:Envelope>"""
 
@@ -138,35 +740,228 @@ class DarwinApi:
         destination_crs: Optional[str] = None,
         time_offset: int = 0,
         time_window: int = 120,
+        with_details: bool = True,
+        deadline: float | None = None,
     ) -> list[TrainService]:
-        """Get the departure board for a station asynchronously."""
+        """Get the departure board for a station asynchronously.
+
+        With with_details=False the lightweight GetDepartureBoard call is
+        used and calling points are left for async_load_calling_points().
+        deadline is an optional time.monotonic() value by which the call,
+        including retries, must finish.
+        """
+        soap_request = self._build_request(
+            station_crs, num_rows, destination_crs, time_offset, time_window,
+            with_details
+        )
+        soap_action = SOAP_ACTION_DEP_BOARD_WITH_DETAILS if with_details else SOAP_ACTION_DEP_BOARD
+        services = await self._async_call(
+            soap_action, soap_request, self._parse_response, deadline, station_crs.upper()
+        )
+        if not with_details:
+            for service in services:
+                service.details_loaded = False
+        return services
+
+    async def async_get_service_details(
+        self, service_id: str, deadline: float | None = None
+    ) -> list[CallingPoint]:
+        """Get the subsequent calling points for a service, using the cache."""
+        calling_points = self._details_cache.get(service_id)
+        if calling_points is not None:
+            return calling_points
+
+        calling_points = await self._async_call(
+            SOAP_ACTION_SERVICE_DETAILS, self._build_details_request(service_id),
+            self._parse_details_response, deadline
+        )
+        self._details_cache.put(service_id, calling_points)
+        return calling_points
+
+    async def async_load_calling_points(
+        self, services: list[TrainService], deadline: float | None = None
+    ) -> None:
+        """Fill in calling points for services fetched without details."""
+        for service in services:
+            if service.details_loaded:
+                continue
+            try:
+                service.calling_points = await self.async_get_service_details(
+                    service.service_id, deadline
+                )
+                service.details_loaded = True
+            except DarwinApiError as err:
+                _LOGGER.warning(
+                    "Failed to load calling points for %s: %s", service.service_id, err
+                )
+
+    def circuit_state(self) -> dict:
+        """Return the state of the circuit breaker for the Darwin endpoint."""
+        return self._breaker.stats()
+
+    def latency_stats(self) -> dict:
+        """Return recent upstream latency percentiles and hedging counts."""
+        return self._latency.stats()
+
+    async def _async_call(
+        self,
+        soap_action: str,
+        soap_request: str,
+        parser,
+        deadline: float | None = None,
+        station: str = "",
+    ):
+        """Post a request and parse the response, reporting to metrics."""
+        operation = soap_action.rsplit("/", 1)[-1]
+        try:
+            started = time.monotonic()
+            text = await self._async_post(soap_action, soap_request, deadline)
+            received = time.monotonic()
+            result = self._parse(parser, text)
+        except DarwinApiError as err:
+            if self._metrics:
+                self._metrics.record_error(operation, err.kind, str(err))
+            raise
+
+        if self._metrics:
+            self._metrics.observe_upstream(
+                operation, station, received - started, len(text.encode("utf-8"))
+            )
+            self._metrics.observe_parse(operation, time.monotonic() - received)
+        return result
+
+    async def _async_post(
+        self, soap_action: str, soap_request: str, deadline: float | None = None
+    ) -> str:
+        """Send a SOAP request, retrying transient errors with backoff."""
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DarwinApiError("Deadline exceeded before calling Darwin", transient=True,
+                                 kind=ERROR_DEADLINE)
+        allowed, probe = self._breaker.admit()
+        if not allowed:
+            raise CircuitOpenError("Darwin API unavailable - circuit breaker open")
+
+        # A half-open probe gets a single attempt so recovery is detected quickly
+        attempts = 1 if probe else RETRY_ATTEMPTS
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    text = await self._async_post_hedged(
+                        soap_action, soap_request, self._read_timeout(deadline)
+                    )
+                except DarwinApiError as err:
+                    if not err.transient:
+                        # Darwin answered, so the endpoint itself is healthy
+                        self._breaker.record_success()
+                        raise
+                    delay = retry_delay(attempt)
+                    out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                    if attempt == attempts or out_of_time:
+                        self._breaker.record_failure()
+                        raise
+                    _LOGGER.warning(
+                        "Darwin request failed (%s), retry %d/%d in %.1fs",
+                        err, attempt, attempts - 1, delay
+                    )
+                    if self._metrics:
+                        self._metrics.record_retry(soap_action.rsplit("/", 1)[-1], err.kind)
+                    await asyncio.sleep(delay)
+                else:
+                    self._breaker.record_success()
+                    return text
+        finally:
+            if probe:
+                # Cancelled or failed unexpectedly: don't block every later call
+                self._breaker.release_probe()
+
+    def _read_timeout(self, deadline: float | None) -> float:
+        """Return the read timeout for one attempt, capped by the deadline."""
+        if deadline is None:
+            return READ_TIMEOUT
+        return max(0.1, min(READ_TIMEOUT, deadline - time.monotonic()))
+
+    async def _async_post_hedged(
+        self, soap_action: str, soap_request: str, read_timeout: float
+    ) -> str:
+        """Send a request, hedging with a second one if the first runs long."""
+        hedge_after = None
+        if self._hedge and self._latency.count >= HEDGE_MIN_SAMPLES:
+            hedge_after = max(HEDGE_MIN_DELAY, self._latency.percentile(HEDGE_PERCENTILE))
+        if hedge_after is None or hedge_after >= read_timeout:
+            return await self._async_post_once(soap_action, soap_request, read_timeout)
+
+        first = asyncio.ensure_future(
+            self._async_post_once(soap_action, soap_request, read_timeout)
+        )
+        tasks = [first]
         try:
-            soap_request = self._build_request(
-                station_crs, num_rows, destination_crs, time_offset, time_window
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return first.result()
+
+            self._latency.hedges_sent += 1
+            second = asyncio.ensure_future(
+                self._async_post_once(
+                    soap_action, soap_request, max(0.1, read_timeout - hedge_after)
+                )
             )
+            tasks.append(second)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._latency.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Drop the slower request once we have an answer
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
+    async def _async_post_once(
+        self, soap_action: str, soap_request: str, read_timeout: float = READ_TIMEOUT
+    ) -> str:
+        """Send a SOAP request once and return the response body."""
+        try:
             headers = {
                 'Content-Type': 'text/xml; charset=utf-8',
-                'SOAPAction': 'http://thalesgroup.com/RTTI/2015-05-14/ldb/GetDepBoardWithDetails'
+                'SOAPAction': soap_action
             }
 
-            async def do_request(session: aiohttp.ClientSession) -> list[TrainService]:
+            timeout = aiohttp.ClientTimeout(total=read_timeout, sock_connect=CONNECT_TIMEOUT)
+
+            async def do_request(session: aiohttp.ClientSession) -> str:
+                started = time.monotonic()
                 async with session.post(
-                    DARWIN_ENDPOINT,
+                    self._endpoint,
                     data=soap_request,
                     headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
+                    timeout=timeout
                 ) as response:
                     if response.status == 401:
-                        raise DarwinApiError("Invalid API token - authentication failed")
+                        raise DarwinApiError("Invalid API token - authentication failed",
+                                             kind=ERROR_AUTH)
 
                     if response.status != 200:
                         text = await response.text()
                         _LOGGER.error("API error response: %s", text[:500])
-                        raise DarwinApiError(f"API returned status {response.status}")
+                        fault = self._fault_string(text)
+                        if fault:
+                            raise DarwinApiError(fault, kind=ERROR_SOAP_FAULT)
+                        raise DarwinApiError(
+                            f"API returned status {response.status}",
+                            transient=response.status >= 500 or response.status == 429,
+                            kind=ERROR_HTTP,
+                        )
 
                     text = await response.text()
-                    return self._parse_response(text)
+                    self._latency.observe(time.monotonic() - started)
+                    return text
 
             # Use provided session or create a new one
             if self._session:
@@ -177,10 +972,12 @@ class DarwinApi:
 
         except aiohttp.ClientError as e:
             _LOGGER.error("Request error: %s", str(e))
-            raise DarwinApiError(f"Connection error: {str(e)}") from e
-        except ET.ParseError as e:
-            _LOGGER.error("XML parse error: %s", str(e))
-            raise DarwinApiError(f"Failed to parse response: {str(e)}") from e
+            raise DarwinApiError(f"Connection error: {str(e)}", transient=True,
+                                 kind=ERROR_CONNECTION) from e
+        except asyncio.TimeoutError as e:
+            _LOGGER.error("Request timed out")
+            raise DarwinApiError("Connection error: request timed out", transient=True,
+                                 kind=ERROR_TIMEOUT) from e
         except DarwinApiError:
             raise
         except Exception as e:
@@ -198,28 +995,65 @@ class DarwinApi:
             self.async_get_departure_board(station_crs, num_rows, destination_crs)
         )
 
-    def _parse_response(self, xml_text: str) -> list[TrainService]:
-        """Parse the SOAP response XML into TrainService objects."""
+    def _parse(self, parser, xml_text: str):
+        """Run a response parser, turning XML errors into DarwinApiError."""
+        try:
+            return parser(xml_text)
+        except ET.ParseError as e:
+            _LOGGER.error("XML parse error: %s", str(e))
+            raise DarwinApiError(f"Failed to parse response: {str(e)}",
+                                 kind=ERROR_PARSE) from e
+
+    def _fault_string(self, xml_text: str) -> Optional[str]:
+        """Return the SOAP fault message in an error response, if any."""
+        try:
+            fault = ET.fromstring(xml_text).find('.//soap:Fault', NS)
+        except ET.ParseError:
+            return None
+        if fault is None:
+            return None
+        fault_string = fault.find('faultstring')
+        return fault_string.text if fault_string is not None else "Unknown SOAP fault"
+
+    def _parse_root(self, xml_text: str):
+        """Parse the SOAP envelope and raise on a SOAP fault."""
         root = ET.fromstring(xml_text)
 
         # Check for SOAP fault
         fault = root.find('.//soap:Fault', NS)
         if fault is not None:
             fault_string = fault.find('faultstring')
-            raise DarwinApiError(fault_string.text if fault_string is not None else "Unknown SOAP fault")
+            raise DarwinApiError(
+                fault_string.text if fault_string is not None else "Unknown SOAP fault",
+                kind=ERROR_SOAP_FAULT,
+            )
+
+        return root
+
+    def _parse_response(self, xml_text: str) -> list[TrainService]:
+        """Parse the SOAP response XML into TrainService objects."""
+        xml_text, slices, namespaces = _cut_calling_points(xml_text)
+        root = self._parse_root(xml_text)
+        # One decoder shared by every service; it must not hold the response
+        decode = partial(self._decode_calling_points, namespaces)
 
         services = []
 
         # Find all train services in the response
         for service in root.findall('.//lt8:service', NS):
-            train_service = self._parse_service(service)
+            train_service = self._parse_service(service, slices, decode)
             if train_service:
                 services.append(train_service)
 
         return services
 
-    def _parse_service(self, service_elem) -> Optional[TrainService]:
-        """Parse a service element into a TrainService object."""
+    def _parse_service(self, service_elem, slices: Sequence[str] = (),
+                       decode=None) -> Optional[TrainService]:
+        """Parse a service element into a TrainService object.
+
+        slices and decode come from _parse_response when the calling point
+        lists were cut out; without them they are decoded from the element.
+        """
         try:
             # Get basic service info
             service_id = self._get_text(service_elem, 'lt4:serviceID')
@@ -252,22 +1086,15 @@ class DarwinApi:
             cancel_reason = self._get_text(service_elem, 'lt4:cancelReason')
             delay_reason = self._get_text(service_elem, 'lt4:delayReason')
 
-            # Get calling points
-            calling_points = []
-            for cp in service_elem.findall('.//lt8:callingPoint', NS):
-                cp_name = self._get_text(cp, 'lt8:locationName')
-                cp_crs = self._get_text(cp, 'lt8:crs') or ""
-                cp_st = self._get_text(cp, 'lt8:st') or ""
-                cp_et = self._get_text(cp, 'lt8:et') or "On time"
-
-                if cp_name:
-                    calling_points.append(CallingPoint(
-                        station_name=cp_name,
-                        crs=cp_crs,
-                        scheduled_time=cp_st,
-                        expected_time=cp_et,
-                        is_cancelled=cp_et == "Cancelled"
-                    ))
+            # Keep calling points as raw XML until something reads them
+            raw = "".join(slices[int(child.get(_RAW_REF))]
+                          for child in service_elem if child.get(_RAW_REF) is not None)
+            if raw:
+                calling_points = LazyCallingPoints(raw, decode)
+            else:
+                calling_points = self._parse_calling_points(
+                    service_elem.findall('.//lt8:callingPoint', NS)
+                )
 
             return TrainService(
                 service_id=service_id,
@@ -288,6 +1115,42 @@ class DarwinApi:
             _LOGGER.warning("Failed to parse service: %s", str(e))
             return None
 
+    def _parse_details_response(self, xml_text: str) -> list[CallingPoint]:
+        """Parse a GetServiceDetails response into its subsequent calling points."""
+        root = self._parse_root(xml_text)
+        return self._parse_calling_points(
+            root.findall('.//lt8:subsequentCallingPoints//lt8:callingPoint', NS)
+        )
+
+    def _decode_calling_points(self, namespaces: str, raw: str) -> list[CallingPoint]:
+        """Parse calling point lists cut from a response into CallingPoint objects."""
+        try:
+            root = ET.fromstring(f"<callingPoints{namespaces}>{raw}</callingPoints>")
+        except ET.ParseError as e:
+            # Raised on first access, far from the response, so don't propagate
+            _LOGGER.warning("Failed to decode calling points: %s", str(e))
+            return []
+        return self._parse_calling_points(root.iterfind('.//lt8:callingPoint', NS))
+
+    def _parse_calling_points(self, cp_elems) -> list[CallingPoint]:
+        """Parse callingPoint elements into CallingPoint objects."""
+        calling_points = []
+        for cp in cp_elems:
+            cp_name = self._get_text(cp, 'lt8:locationName')
+            cp_crs = self._get_text(cp, 'lt8:crs') or ""
+            cp_st = self._get_text(cp, 'lt8:st') or ""
+            cp_et = self._get_text(cp, 'lt8:et') or "On time"
+
+            if cp_name:
+                calling_points.append(CallingPoint(
+                    station_name=cp_name,
+                    crs=cp_crs,
+                    scheduled_time=cp_st,
+                    expected_time=cp_et,
+                    is_cancelled=cp_et == "Cancelled"
+                ))
+        return calling_points
+
     def _get_text(self, elem, path: str) -> Optional[str]:
         """Get text content from an element by path."""
         # Try with each namespace prefix
@@ -14,6 +14,8 @@ from .api import DarwinApi, DarwinApiError
 from .const import (
     CONF_API_TOKEN,
     CONF_DESTINATION_CRS,
+    CONF_HEDGE_REQUESTS,
+    CONF_LAZY_CALLING_POINTS,
     CONF_NUM_DEPARTURES,
     CONF_STATION_CRS,
     CONF_WATCHED_TRAIN_1_TIME,
@@ -24,8 +26,8 @@ from .const import (
     CONF_WATCHED_TRAIN_3_DEST,
     DEFAULT_NUM_DEPARTURES,
     DOMAIN,
-    STATION_CODES,
 )
+from .stations import StationIndex, get_station_index
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,6 +48,11 @@ class UKTrainDeparturesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors: dict[str, str] = {}
 
         if user_input is not None:
+            # Check the stations locally before spending a Darwin call
+            index = await self.hass.async_add_executor_job(get_station_index)
+            errors = _resolve_stations(index, user_input)
+
+        if user_input is not None and not errors:
             # Validate the API token using HA's shared session
             session = async_get_clientsession(self.hass)
             api = DarwinApi(user_input[CONF_API_TOKEN], session=session)
@@ -85,6 +92,8 @@ class UKTrainDeparturesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 vol.Optional(
                     CONF_NUM_DEPARTURES, default=DEFAULT_NUM_DEPARTURES
                 ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                vol.Optional(CONF_LAZY_CALLING_POINTS, default=False): bool,
+                vol.Optional(CONF_HEDGE_REQUESTS, default=False): bool,
             }
         )
 
@@ -106,7 +115,7 @@ class UKTrainDeparturesConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self._user_input.update(user_input)
 
             station_crs = self._user_input[CONF_STATION_CRS].upper()
-            station_name = STATION_CODES.get(station_crs, station_crs)
+            station_name = get_station_index().name(station_crs) or station_crs
 
             return self.async_create_entry(
                 title=f"Departures from {station_name}",
@@ -146,8 +155,12 @@ class UKTrainDeparturesOptionsFlow(config_entries.OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage the options."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
+            index = await self.hass.async_add_executor_job(get_station_index)
+            errors = _resolve_stations(index, user_input)
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
 
         return self.async_show_form(
             step_id="init",
@@ -165,4 +178,28 @@ class UKTrainDeparturesOptionsFlow(config_entries.OptionsFlow):
                     ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
                 }
             ),
+            errors=errors,
         )
+
+
+def _resolve_stations(index: StationIndex, user_input: dict[str, Any]) -> dict[str, str]:
+    """Replace station names or codes in user_input with CRS codes.
+
+    Returns form errors for any station the index does not accept.
+    """
+    errors: dict[str, str] = {}
+    if CONF_STATION_CRS in user_input:
+        station_crs = index.resolve(user_input[CONF_STATION_CRS])
+        if station_crs is None:
+            errors[CONF_STATION_CRS] = "unknown_station"
+        else:
+            user_input[CONF_STATION_CRS] = station_crs
+    destinations = [
+        d.strip() for d in user_input.get(CONF_DESTINATION_CRS, "").split(",") if d.strip()
+    ]
+    resolved = [index.resolve(d) for d in destinations]
+    if None in resolved:
+        errors[CONF_DESTINATION_CRS] = "unknown_destination"
+    else:
+        user_input[CONF_DESTINATION_CRS] = ",".join(resolved)
+    return errors
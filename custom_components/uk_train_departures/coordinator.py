@@ -1,19 +1,35 @@
 """Data update coordinator for UK Train Departures."""
 
 import logging
-from datetime import timedelta
+import time
+from datetime import datetime, timedelta
 from typing import Any
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
-from .api import DarwinApi, DarwinApiError, TrainService
-from .const import DEFAULT_SCAN_INTERVAL, DOMAIN
+from .api import (
+    AdaptiveQuerySizer,
+    DarwinApi,
+    DarwinApiError,
+    TrainService,
+    minutes_until,
+)
+from .const import DEFAULT_SCAN_INTERVAL, DOMAIN, PUNCTUALITY_SAVE_DELAY, UK_TIME_ZONE
+from .punctuality import PunctualityTracker
+from .telemetry import CoordinatorTelemetry
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def uk_now() -> datetime:
+    """Return the current time in the UK, the time zone of Darwin's times."""
+    return dt_util.now(dt_util.get_time_zone(UK_TIME_ZONE))
+
+
 class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
     """Coordinator to manage fetching train departure data."""
 
@@ -25,6 +41,10 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
         num_departures: int = 3,
         destination_crs: str | None = None,
         watched_trains: list[dict] | None = None,
+        lazy_calling_points: bool = False,
+        telemetry: CoordinatorTelemetry | None = None,
+        punctuality: PunctualityTracker | None = None,
+        punctuality_store: Store | None = None,
     ) -> None:
         """Initialize the coordinator.
 
@@ -35,6 +55,13 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
             num_departures: Number of departures to fetch
             destination_crs: Optional destination filter
             watched_trains: List of watched train configs
+            lazy_calling_points: Fetch the lightweight board and load calling
+                points only for displayed and watched trains
+            telemetry: Fetch telemetry, also passed to the API client as its
+                metrics hook
+            punctuality: Rolling punctuality counters, updated from every
+                fetched board
+            punctuality_store: Where the punctuality counters are saved
         """
         super().__init__(
             hass,
@@ -55,45 +82,87 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
         )
         self.watched_trains = watched_trains or []
         self.watched_train_data: dict[str, TrainService | None] = {}
+        self.lazy_calling_points = lazy_calling_points
+        self.query_sizer = AdaptiveQuerySizer()
+        self.telemetry = telemetry or CoordinatorTelemetry()
+        self._board_rows = 0
+        self.punctuality = punctuality or PunctualityTracker()
+        self._punctuality_store = punctuality_store
+        # Serialized calling points by service ID for the current data, shared
+        # by every sensor showing the service
+        self._calling_points: dict[str, list[dict[str, Any]]] = {}
 
     async def _async_update_data(self) -> list[TrainService]:
-        """Fetch data from the Darwin API."""
+        """Fetch data from the Darwin API, recording fetch telemetry."""
+        self.telemetry.start_refresh()
+        self._board_rows = 0
         try:
-            # Fetch more rows to allow for client-side filtering
-            rows_to_fetch = max(self.num_departures, 20)
+            services = await self._async_fetch()
+        except UpdateFailed as err:
+            self.telemetry.finish_refresh(self._board_rows, err.__cause__ or err)
+            raise
+        self.telemetry.finish_refresh(self._board_rows)
+        self._calling_points = {}
+        return services
 
+    async def _async_fetch(self) -> list[TrainService]:
+        """Fetch data from the Darwin API."""
+        # All Darwin calls for this refresh must finish before the next one
+        deadline = time.monotonic() + DEFAULT_SCAN_INTERVAL
+        try:
             # If multiple destinations, don't use API filter - we'll filter client-side
             api_filter = None
             if len(self.destination_list) == 1:
                 api_filter = self.destination_list[0]
+            multi_filter = len(self.destination_list) > 1
 
             _LOGGER.debug(
                 "Fetching departures: station=%s, api_filter=%s, destination_list=%s",
                 self.station_crs, api_filter, self.destination_list
             )
 
-            all_services = await self.api.async_get_departure_board(
-                station_crs=self.station_crs,
-                num_rows=rows_to_fetch,
-                destination_crs=api_filter,
-            )
+            for _ in range(2):
+                if self._watched_train_due():
+                    # Keep the full board while a watched train could be on it
+                    num_rows, time_window = self.query_sizer.max_size(self.num_departures)
+                else:
+                    num_rows, time_window = self.query_sizer.size_for(
+                        self.station_crs, self.destination_list, self.num_departures
+                    )
 
-            # Client-side filter by destination/calling points if multiple destinations
-            if len(self.destination_list) > 1:
-                filtered = []
+                all_services = await self.api.async_get_departure_board(
+                    station_crs=self.station_crs,
+                    num_rows=num_rows,
+                    destination_crs=api_filter,
+                    time_window=time_window,
+                    with_details=not self.lazy_calling_points,
+                    deadline=deadline,
+                )
+                self._board_rows += len(all_services)
+
+                # Client-side filter by destination/calling points if multiple destinations
+                services = []
+                consumed = 0
                 for service in all_services:
-                    # Check if final destination matches any in list
-                    if service.destination_crs.upper() in self.destination_list:
-                        filtered.append(service)
-                        continue
-                    # Check if any calling point matches
-                    for cp in service.calling_points:
-                        if cp.crs.upper() in self.destination_list:
-                            filtered.append(service)
-                            break
-                services = filtered
-            else:
-                services = all_services
+                    if len(services) >= self.num_departures:
+                        break
+                    consumed += 1
+                    if not multi_filter or await self._async_matches_destinations(service, deadline):
+                        services.append(service)
+
+                # Try once more if the board came back short and the query grew
+                if not self.query_sizer.record(
+                    self.station_crs, self.destination_list, self.num_departures,
+                    all_services, consumed, len(services) >= self.num_departures,
+                ):
+                    break
+
+            # Count services that have left the board since the last refresh
+            if self.punctuality.observe(self.station_crs, all_services, uk_now()):
+                if self._punctuality_store is not None:
+                    self._punctuality_store.async_delay_save(
+                        self.punctuality.as_dict, PUNCTUALITY_SAVE_DELAY
+                    )
 
             # Find watched trains
             self.watched_train_data = {}
@@ -102,7 +171,7 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
                 dest_filter = watched.get("destination", "")
 
                 found_train = None
-                for service in services:
+                for service in all_services:
                     if service.scheduled_time == scheduled_time:
                         # Check destination filter if specified
                         if dest_filter:
@@ -112,11 +181,19 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
                             )
                             if not dest_match:
                                 continue
+                        if multi_filter and not await self._async_matches_destinations(service, deadline):
+                            continue
                         found_train = service
                         break
 
                 self.watched_train_data[scheduled_time] = found_train
 
+            # Only displayed and watched trains need calling points
+            await self.api.async_load_calling_points(
+                services + [s for s in self.watched_train_data.values() if s is not None],
+                deadline,
+            )
+
             _LOGGER.debug(
                 "Fetched %d departures from %s, found %d watched trains",
                 len(services),
@@ -124,11 +201,85 @@ class TrainDeparturesCoordinator(DataUpdateCoordinator[list[TrainService]]):
                 sum(1 for v in self.watched_train_data.values() if v is not None)
             )
 
-            # Return only the requested number of departures
-            return services[:self.num_departures]
+            return services
         except DarwinApiError as err:
             _LOGGER.error("Error fetching departure data: %s", err)
             raise UpdateFailed(f"Error communicating with Darwin API: {err}") from err
         except Exception as err:
             _LOGGER.exception("Unexpected error fetching departure data")
             raise UpdateFailed(f"Unexpected error: {err}") from err
+
+    def route_punctuality(self, service: TrainService) -> dict[str, Any]:
+        """Return the rolling 7 and 30 day on time percentages for a service's route."""
+        stats = self.punctuality.route_stats(
+            self.station_crs, service.destination_crs, service.scheduled_time, uk_now()
+        )
+        return {
+            "punctuality_7d": stats["7d"]["punctuality"] if stats else None,
+            "punctuality_30d": stats["30d"]["punctuality"] if stats else None,
+        }
+
+    def calling_points_as_dicts(self, service: TrainService) -> list[dict[str, Any]]:
+        """Return a service's calling points as shown in attributes.
+
+        Calling points are decoded and converted once per refresh, however
+        many sensors show the service; services fetched but not shown are
+        never decoded at all.
+        """
+        calling_points = self._calling_points.get(service.service_id)
+        if calling_points is None:
+            calling_points = self._calling_points[service.service_id] = [
+                {
+                    "station": cp.station_name,
+                    "crs": cp.crs,
+                    "scheduled": cp.scheduled_time,
+                    "expected": cp.expected_time,
+                }
+                for cp in service.calling_points
+            ]
+        return calling_points
+
+    def departure_as_dict(self, service: TrainService) -> dict[str, Any]:
+        """Return a departure as shown by the summary sensor and the websocket API."""
+        return {
+            "service_id": service.service_id,
+            "destination": service.destination,
+            "destination_crs": service.destination_crs,
+            "scheduled_time": service.scheduled_time,
+            "expected_time": service.expected_time,
+            "platform": service.platform,
+            "operator": service.operator,
+            "status": service.status,
+            "is_cancelled": service.is_cancelled,
+            "cancel_reason": service.cancel_reason,
+            "delay_reason": service.delay_reason,
+            "calling_points": self.calling_points_as_dicts(service),
+            **self.route_punctuality(service),
+        }
+
+    async def async_save_punctuality(self) -> None:
+        """Save the punctuality counters now instead of after the save delay."""
+        if self._punctuality_store is not None:
+            await self._punctuality_store.async_save(self.punctuality.as_dict())
+
+    def _watched_train_due(self) -> bool:
+        """Check if a watched train departs within the longest time window.
+
+        Trains scheduled earlier today have gone and are not due.
+        """
+        for watched in self.watched_trains:
+            minutes = minutes_until(watched.get("scheduled_time", ""), uk_now(), clamp=False)
+            if minutes is not None and 0 <= minutes <= self.query_sizer.max_window:
+                return True
+        return False
+
+    async def _async_matches_destinations(
+        self, service: TrainService, deadline: float | None = None
+    ) -> bool:
+        """Check if a service goes to or calls at any filtered destination."""
+        # Check if final destination matches any in list
+        if service.destination_crs.upper() in self.destination_list:
+            return True
+        # Check if any calling point matches
+        await self.api.async_load_calling_points([service], deadline)
+        return any(cp.crs.upper() in self.destination_list for cp in service.calling_points)
@@ -0,0 +1,36 @@
+"""Diagnostics support for UK Train Departures."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_API_TOKEN, DOMAIN
+from .coordinator import TrainDeparturesCoordinator
+
+TO_REDACT = {CONF_API_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: TrainDeparturesCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "station_crs": coordinator.station_crs,
+        "destinations": coordinator.destination_list,
+        "lazy_calling_points": coordinator.lazy_calling_points,
+        "last_update_success": coordinator.last_update_success,
+        "departures": len(coordinator.data or []),
+        "query_stats": coordinator.query_sizer.stats(),
+        "circuit": coordinator.api.circuit_state(),
+        "latency": coordinator.api.latency_stats(),
+        "telemetry": coordinator.telemetry.as_dict(),
+        "punctuality": {
+            **coordinator.punctuality.info(),
+            "station": coordinator.punctuality.stats(coordinator.station_crs),
+        },
+    }
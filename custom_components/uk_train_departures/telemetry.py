@@ -0,0 +1,177 @@
+"""Fetch telemetry for UK Train Departures coordinators."""
+
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+
+from homeassistant.util import dt as dt_util
+
+from .api import ERROR_CIRCUIT_OPEN, ERROR_DEADLINE
+from .const import TELEMETRY_ERROR_HISTORY, TELEMETRY_HISTORY
+
+# These errors are raised before any request reaches Darwin
+_LOCAL_ERRORS = (ERROR_CIRCUIT_OPEN, ERROR_DEADLINE)
+
+
+@dataclass
+class FetchRecord:
+    """Timings and sizes for one coordinator refresh."""
+
+    started: datetime
+    duration: float = 0.0
+    upstream: float = 0.0
+    parse: float = 0.0
+    bytes_received: int = 0
+    rows: int = 0
+    calls: int = 0
+    retries: int = 0
+    error_kind: str | None = None
+    error: str | None = None
+    calls_by_operation: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ErrorRecord:
+    """A failed Darwin call."""
+
+    time: datetime
+    operation: str
+    kind: str
+    message: str
+
+
+class CoordinatorTelemetry:
+    """Bounded history of fetch performance for one coordinator.
+
+    Receives upstream timings from DarwinApi (as its metrics hook) and
+    groups them into one FetchRecord per coordinator refresh.
+    """
+
+    def __init__(
+        self,
+        history: int = TELEMETRY_HISTORY,
+        error_history: int = TELEMETRY_ERROR_HISTORY,
+    ) -> None:
+        """Initialize the telemetry buffers."""
+        self.records: deque[FetchRecord] = deque(maxlen=history)
+        self.errors: deque[ErrorRecord] = deque(maxlen=error_history)
+        self.errors_by_kind: dict[str, int] = {}
+        self.calls_today = 0
+        self.bytes_today = 0
+        self.errors_today = 0
+        self._day: date | None = None
+        self._current: FetchRecord | None = None
+        self._started = 0.0
+
+    def start_refresh(self) -> None:
+        """Begin recording a coordinator refresh."""
+        self._current = FetchRecord(started=dt_util.utcnow())
+        self._started = time.monotonic()
+
+    def finish_refresh(self, rows: int, error: Exception | None = None) -> FetchRecord:
+        """Finish the current refresh and add it to the history."""
+        record = self._current or FetchRecord(started=dt_util.utcnow())
+        record.duration = time.monotonic() - self._started if self._current else 0.0
+        record.rows = rows
+        if error is not None:
+            record.error_kind = getattr(error, "kind", type(error).__name__)
+            record.error = str(error)
+        self.records.append(record)
+        self._current = None
+        return record
+
+    @property
+    def last(self) -> FetchRecord | None:
+        """Return the most recent refresh, if any."""
+        return self.records[-1] if self.records else None
+
+    def observe_upstream(
+        self, operation: str, station: str, seconds: float, size: int
+    ) -> None:
+        """Record a successful Darwin call."""
+        self._count_call(operation, size)
+        if self._current is not None:
+            self._current.upstream += seconds
+            self._current.bytes_received += size
+
+    def observe_parse(self, operation: str, seconds: float) -> None:
+        """Record the time spent parsing a response."""
+        if self._current is not None:
+            self._current.parse += seconds
+
+    def record_error(self, operation: str, kind: str, message: str) -> None:
+        """Record a failed Darwin call."""
+        self._roll_day()
+        if kind not in _LOCAL_ERRORS:
+            self._count_call(operation, 0)
+        self.errors_today += 1
+        self.errors_by_kind[kind] = self.errors_by_kind.get(kind, 0) + 1
+        self.errors.append(ErrorRecord(dt_util.utcnow(), operation, kind, message))
+
+    def record_retry(self, operation: str, kind: str) -> None:
+        """Record a failed attempt that is being retried."""
+        self._count_call(operation, 0)
+        if self._current is not None:
+            self._current.retries += 1
+
+    def _count_call(self, operation: str, size: int) -> None:
+        """Count a request that reached Darwin against today's totals."""
+        self._roll_day()
+        self.calls_today += 1
+        self.bytes_today += size
+        if self._current is not None:
+            self._current.calls += 1
+            calls = self._current.calls_by_operation
+            calls[operation] = calls.get(operation, 0) + 1
+
+    def _roll_day(self) -> None:
+        """Reset the daily totals at local midnight."""
+        today = dt_util.now().date()
+        if today != self._day:
+            self._day = today
+            self.calls_today = 0
+            self.bytes_today = 0
+            self.errors_today = 0
+
+    def summary(self) -> dict:
+        """Return aggregate figures over the buffered refreshes."""
+        self._roll_day()
+        durations = sorted(r.duration for r in self.records)
+        successful = [r for r in self.records if r.error is None]
+        return {
+            "refreshes": len(self.records),
+            "failed_refreshes": len(self.records) - len(successful),
+            "avg_duration_ms": round(sum(durations) / len(durations) * 1000, 1) if durations else None,
+            "p95_duration_ms": round(_percentile(durations, 95) * 1000, 1) if durations else None,
+            "avg_bytes": round(sum(r.bytes_received for r in successful) / len(successful)) if successful else None,
+            "avg_rows": round(sum(r.rows for r in successful) / len(successful), 1) if successful else None,
+            "calls_today": self.calls_today,
+            "bytes_today": self.bytes_today,
+            "errors_today": self.errors_today,
+            "errors_by_kind": dict(self.errors_by_kind),
+        }
+
+    def as_dict(self) -> dict:
+        """Return the full history for diagnostics."""
+        return {
+            "summary": self.summary(),
+            "records": [_record_dict(r) for r in self.records],
+            "errors": [_record_dict(e) for e in self.errors],
+        }
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Return the pct percentile of a non-empty sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def _record_dict(record) -> dict:
+    """Convert a record dataclass to a JSON-friendly dict."""
+    data = asdict(record)
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = value.isoformat()
+        elif isinstance(value, float):
+            data[key] = round(value, 4)
+    return data
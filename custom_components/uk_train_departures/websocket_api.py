@@ -0,0 +1,204 @@
+"""Websocket API for UK Train Departures.
+
+Frontends subscribe to a station's board with
+
+    {"type": "uk_train_departures/subscribe_board", "entity_id": "sensor.xxx_departures"}
+
+or with "entry_id" instead of "entity_id". The first event is the whole
+board; after that an event is only sent when a coordinator refresh changes
+something, and carries just the services that changed. Cards following a
+board this way never read the summary sensor's departures attribute, so
+they are not woken by every state_changed event and the board does not
+have to go through the recorder.
+
+Events:
+    {"type": "board", "station_crs", "station_name", "available", "departures"}
+    {"type": "diff", "added", "changed", "removed", "order", "available"}
+        added: departures new to the board, in full
+        changed: the service_id and the changed fields of other departures
+        removed: service_ids no longer on the board
+        order: every service_id in board order, when it changed
+        available: only when it changed
+    {"type": "closed"}  the config entry was unloaded; subscribe again
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN
+from .coordinator import TrainDeparturesCoordinator
+from .stations import get_station_index
+
+# Board feeds by config entry ID
+DATA_BOARD_FEEDS = f"{DOMAIN}_board_feeds"
+
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant) -> None:
+    """Register the integration's websocket commands."""
+    websocket_api.async_register_command(hass, websocket_subscribe_board)
+
+
+def _board(coordinator: TrainDeparturesCoordinator) -> dict[str, dict[str, Any]]:
+    """Return the coordinator's departures by service ID, in board order."""
+    return {
+        service.service_id: coordinator.departure_as_dict(service)
+        for service in coordinator.data or []
+    }
+
+
+def board_diff(
+    old: dict[str, dict[str, Any]], new: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """Return the per-service changes from one board to the next."""
+    diff: dict[str, Any] = {}
+    added = [departure for key, departure in new.items() if key not in old]
+    if added:
+        diff["added"] = added
+    changed = []
+    for key, departure in new.items():
+        previous = old.get(key)
+        if previous is None:
+            continue
+        fields = {
+            name: value for name, value in departure.items() if previous.get(name) != value
+        }
+        if fields:
+            changed.append({"service_id": key, **fields})
+    if changed:
+        diff["changed"] = changed
+    removed = [key for key in old if key not in new]
+    if removed:
+        diff["removed"] = removed
+    if list(new) != [key for key in old if key in new] + [d["service_id"] for d in added]:
+        diff["order"] = list(new)
+    return diff
+
+
+class BoardFeed:
+    """Sends one config entry's board to every frontend subscribed to it.
+
+    The board and its diff are built once per refresh and shared by every
+    subscriber. A feed lasts as long as its config entry, which ends every
+    subscription when it unloads.
+    """
+
+    def __init__(self, coordinator: TrainDeparturesCoordinator) -> None:
+        """Initialize the feed with no subscribers."""
+        self.coordinator = coordinator
+        self.board: dict[str, dict[str, Any]] = {}
+        self.available = False
+        # Connection and subscription message ID of every subscriber
+        self._subscribers: set[tuple[websocket_api.ActiveConnection, int]] = set()
+        self._remove_listener: Callable[[], None] | None = None
+
+    @callback
+    def subscribe(self, connection: websocket_api.ActiveConnection, msg_id: int) -> None:
+        """Start sending the board to a subscriber, beginning with the whole board."""
+        if self._remove_listener is None:
+            # Nobody was following the board, so it may be out of date
+            self.board = _board(self.coordinator)
+            self.available = self.coordinator.last_update_success
+            self._remove_listener = self.coordinator.async_add_listener(self._forward_update)
+        self._subscribers.add((connection, msg_id))
+
+        @callback
+        def unsubscribe() -> None:
+            """Stop following the board."""
+            self._subscribers.discard((connection, msg_id))
+            if not self._subscribers and self._remove_listener is not None:
+                self._remove_listener()
+                self._remove_listener = None
+
+        connection.subscriptions[msg_id] = unsubscribe
+        connection.send_result(msg_id)
+        connection.send_message(
+            websocket_api.event_message(
+                msg_id,
+                {
+                    "type": "board",
+                    "station_crs": self.coordinator.station_crs,
+                    "station_name": get_station_index().name(self.coordinator.station_crs)
+                    or self.coordinator.station_crs,
+                    "available": self.available,
+                    "departures": list(self.board.values()),
+                },
+            )
+        )
+
+    @callback
+    def _forward_update(self) -> None:
+        """Send every subscriber the services that changed in the latest refresh."""
+        board = _board(self.coordinator)
+        diff = board_diff(self.board, board)
+        self.board = board
+        if self.coordinator.last_update_success != self.available:
+            self.available = self.coordinator.last_update_success
+            diff["available"] = self.available
+        if diff:
+            self._send({"type": "diff", **diff})
+
+    @callback
+    def _send(self, event: dict[str, Any]) -> None:
+        """Send an event to every subscriber."""
+        for connection, msg_id in list(self._subscribers):
+            connection.send_message(websocket_api.event_message(msg_id, event))
+
+    @callback
+    def async_close(self) -> None:
+        """Tell every subscriber the board has gone with its config entry."""
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        self._send({"type": "closed"})
+        for connection, msg_id in self._subscribers:
+            connection.subscriptions.pop(msg_id, None)
+        self._subscribers.clear()
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/subscribe_board",
+        vol.Exclusive("entity_id", "board"): str,
+        vol.Exclusive("entry_id", "board"): str,
+    }
+)
+@callback
+def websocket_subscribe_board(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Subscribe to the departures of one config entry's station."""
+    entry_id = msg.get("entry_id")
+    if "entity_id" in msg:
+        entity = er.async_get(hass).async_get(msg["entity_id"])
+        entry_id = entity.config_entry_id if entity is not None else None
+    coordinator: TrainDeparturesCoordinator | None = hass.data.get(DOMAIN, {}).get(entry_id)
+    if coordinator is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "No UK Train Departures board found"
+        )
+        return
+
+    feeds: dict[str, BoardFeed] = hass.data.setdefault(DATA_BOARD_FEEDS, {})
+    feed = feeds.get(entry_id)
+    if feed is None:
+        feed = feeds[entry_id] = BoardFeed(coordinator)
+        entry = coordinator.config_entry
+        if entry is not None:
+            # One hook per entry, however many frontends come and go
+            @callback
+            def entry_unloaded() -> None:
+                """Close the entry's feed."""
+                feeds.pop(entry_id, None)
+                feed.async_close()
+
+            entry.async_on_unload(entry_unloaded)
+    feed.subscribe(connection, msg["id"])
@@ -3,10 +3,60 @@
  * A custom Lovelace card that displays train departures in authentic UK station style
  */
 
+// Milliseconds before resubscribing when the integration is reloaded
+const RESUBSCRIBE_DELAY = 5000;
+
+/**
+ * One clock timer shared by every card on the page, so a dashboard with
+ * several cards wakes up once a second rather than once per card.
+ */
+const sharedClock = {
+  cards: new Set(),
+  timer: null,
+  text: '',
+
+  subscribe(card) {
+    this.cards.add(card);
+    if (!this.timer) {
+      this.text = this.now();
+      this.timer = setInterval(() => this.tick(), 1000);
+    }
+    card.updateClock(this.text);
+  },
+
+  unsubscribe(card) {
+    this.cards.delete(card);
+    if (this.cards.size === 0 && this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  },
+
+  now() {
+    return new Date().toLocaleTimeString('en-GB', { hour: '2-digit', minute: '2-digit' });
+  },
+
+  tick() {
+    // The display only changes once a minute
+    const text = this.now();
+    if (text === this.text) return;
+    this.text = text;
+    this.cards.forEach(card => card.updateClock(text));
+  }
+};
+
 class UKDeparturesCard extends HTMLElement {
   constructor() {
     super();
     this.attachShadow({ mode: 'open' });
+    // Rendered rows by service ID; see renderDepartures()
+    this._rows = new Map();
+    this._board = null;
+    this._state = null;
+    // Board pushed by the integration's websocket API; see subscribe()
+    this._live = null;
+    this._subscription = null;
+    this._useAttributes = false;
   }
 
   setConfig(config) {
@@ -22,13 +72,106 @@ class UKDeparturesCard extends HTMLElement {
       num_departures: config.num_departures || 3,
       ...config
     };
+    // The layout depends on the config, so build it again
+    this._board = null;
+    this._state = null;
+    this.unsubscribe();
+    this._useAttributes = false;
+    this.subscribe();
+    this.render();
   }
 
   set hass(hass) {
     this._hass = hass;
+    if (!this.config) return;
+    this.subscribe();
+    // Departures pushed over the websocket don't depend on states at all
+    if (this._live) return;
+    // Home Assistant calls this on every state change in the house. A new
+    // state object with a new last_updated is the only sign this card's
+    // entity has changed; anything else is someone else's update.
+    const state = hass.states[this.config.entity];
+    if (this._board && (state === this._state ||
+        (state && this._state && state.last_updated === this._state.last_updated))) {
+      this._state = state;
+      return;
+    }
+    this._state = state;
+    this.render();
+  }
+
+  connectedCallback() {
+    sharedClock.subscribe(this);
+    this.subscribe();
+  }
+
+  disconnectedCallback() {
+    sharedClock.unsubscribe(this);
+    this.unsubscribe();
+  }
+
+  subscribe() {
+    if (this._subscription || this._useAttributes || !this._hass || !this.config || !this.isConnected) {
+      return;
+    }
+    // The integration sends the whole board once, then only the services
+    // that changed; the summary sensor's attributes are the fallback
+    const subscription = this._hass.connection.subscribeMessage(
+      event => {
+        if (this._subscription === subscription) this.onBoardEvent(event);
+      },
+      { type: 'uk_train_departures/subscribe_board', entity_id: this.config.entity }
+    ).catch(() => {
+      if (this._subscription !== subscription) return;
+      // An older integration without the websocket API
+      this._subscription = null;
+      this._useAttributes = true;
+      this._state = null;
+      this.render();
+    });
+    this._subscription = subscription;
+  }
+
+  unsubscribe() {
+    if (this._subscription) {
+      this._subscription.then(unsubscribe => unsubscribe && unsubscribe());
+      this._subscription = null;
+    }
+    this._live = null;
+  }
+
+  onBoardEvent(event) {
+    if (event.type === 'board') {
+      this._live = { stationName: event.station_name, departures: event.departures };
+    } else if (event.type === 'diff' && this._live) {
+      this._live.departures = this.applyDiff(this._live.departures, event);
+    } else if (event.type === 'closed') {
+      // The config entry was reloaded; read the attributes until it is back
+      this._subscription = null;
+      this._live = null;
+      this._state = null;
+      setTimeout(() => this.subscribe(), RESUBSCRIBE_DELAY);
+    } else {
+      return;
+    }
     this.render();
   }
 
+  applyDiff(departures, diff) {
+    const byId = new Map(departures.map(dep => [dep.service_id, dep]));
+    (diff.removed || []).forEach(id => byId.delete(id));
+    (diff.changed || []).forEach(fields => {
+      const departure = byId.get(fields.service_id);
+      if (departure) {
+        byId.set(fields.service_id, { ...departure, ...fields });
+      }
+    });
+    (diff.added || []).forEach(dep => byId.set(dep.service_id, dep));
+    // Without an order the remaining services keep theirs, new ones last
+    const order = diff.order || [...byId.keys()];
+    return order.map(id => byId.get(id)).filter(Boolean);
+  }
+
   getCardSize() {
     return 4;
   }
@@ -46,8 +189,15 @@ class UKDeparturesCard extends HTMLElement {
   render() {
     if (!this._hass || !this.config) return;
 
-    const entity = this._hass.states[this.config.entity];
+    if (this._live) {
+      this.renderBoard(this._live.stationName, this._live.departures);
+      return;
+    }
+
+    const entity = this._state || this._hass.states[this.config.entity];
+    this._state = entity;
     if (!entity) {
+      this._board = null;
       this.shadowRoot.innerHTML = `
         <ha-card>
           <div style="padding: 16px; color: #ff6b6b;">
@@ -58,11 +208,23 @@ class UKDeparturesCard extends HTMLElement {
       return;
     }
 
-    const departures = entity.attributes.departures || [];
-    const stationName = entity.attributes.station_name || this.config.title;
-    const now = new Date();
-    const timeString = now.toLocaleTimeString('en-GB', { hour: '2-digit', minute: '2-digit' });
+    this.renderBoard(entity.attributes.station_name, entity.attributes.departures || []);
+  }
+
+  renderBoard(stationName, departures) {
+    if (!this._board) {
+      this.buildBoard();
+    }
+
+    const title = stationName || this.config.title;
+    if (this._board.stationName.textContent !== title) {
+      this._board.stationName.textContent = title;
+    }
+    this.renderDepartures(departures.slice(0, this.config.num_departures));
+  }
 
+  buildBoard() {
+    // The static parts of the card are built once; updates only patch rows
     this.shadowRoot.innerHTML = `
       <style>
         ${this.getStyles()}
@@ -70,8 +232,8 @@ class UKDeparturesCard extends HTMLElement {
       <ha-card>
         <div class="departure-board">
           <div class="board-header">
-            <div class="station-name">${stationName}</div>
-            ${this.config.show_clock ? `<div class="clock">${timeString}</div>` : ''}
+            <div class="station-name"></div>
+            ${this.config.show_clock ? `<div class="clock">${sharedClock.now()}</div>` : ''}
           </div>
           <div class="board-content">
             <div class="header-row">
@@ -80,54 +242,116 @@ class UKDeparturesCard extends HTMLElement {
               ${this.config.show_platform ? '<span class="col-plat">Plat</span>' : ''}
               <span class="col-exp">Expected</span>
             </div>
-            ${departures.slice(0, this.config.num_departures).map((dep, i) => this.renderDeparture(dep, i === 0)).join('')}
-            ${departures.length === 0 ? this.renderNoDepartures() : ''}
+            <div class="rows"></div>
+            <div class="no-departures" hidden>
+              <span>No departures scheduled</span>
+            </div>
           </div>
         </div>
       </ha-card>
     `;
+    this._rows.clear();
+    this._board = {
+      stationName: this.shadowRoot.querySelector('.station-name'),
+      clock: this.shadowRoot.querySelector('.clock'),
+      rows: this.shadowRoot.querySelector('.rows'),
+      noDepartures: this.shadowRoot.querySelector('.no-departures')
+    };
+  }
 
-    // Start clock update
-    if (this.config.show_clock) {
-      this.startClockUpdate();
-    }
-
-    // Start calling points animation for first departure
-    if (this.config.show_calling_points && departures.length > 0) {
-      this.animateCallingPoints();
+  updateClock(text) {
+    const clock = this._board && this._board.clock;
+    if (clock && clock.textContent !== text) {
+      clock.textContent = text;
     }
   }
 
-  renderDeparture(departure, isFirst) {
-    const statusClass = this.getStatusClass(departure.status, departure.is_cancelled);
-    const expectedText = departure.is_cancelled ? 'Cancelled' : departure.expected_time;
-    const callingPointsText = departure.calling_points
-      ? departure.calling_points.map(cp => cp.station).join(', ')
-      : '';
+  renderDepartures(departures) {
+    const container = this._board.rows;
+    this._board.noDepartures.hidden = departures.length > 0;
+
+    // Rows are keyed by service so an unchanged train keeps its DOM nodes
+    // (and its calling points animation); only changed cells are written
+    const keys = departures.map(
+      dep => dep.service_id || `${dep.scheduled_time} ${dep.destination}`);
+    const wanted = new Set(keys);
+    this._rows.forEach((row, key) => {
+      if (!wanted.has(key)) {
+        row.element.remove();
+        this._rows.delete(key);
+      }
+    });
+
+    let previous = null;
+    departures.forEach((departure, index) => {
+      let row = this._rows.get(keys[index]);
+      if (!row) {
+        row = this.createDeparture();
+        this._rows.set(keys[index], row);
+      }
+      this.updateDeparture(row, departure, index === 0);
 
-    return `
-      <div class="departure-row ${isFirst ? 'first-departure' : ''}">
-        <span class="col-time">${departure.scheduled_time}</span>
-        <span class="col-dest">
-          <span class="destination">${departure.destination}</span>
-          ${isFirst && this.config.show_calling_points && callingPointsText ? `
-            <span class="calling-points">
-              <span class="calling-text">Calling at: ${callingPointsText}</span>
-            </span>
-          ` : ''}
+      const next = previous ? previous.nextSibling : container.firstChild;
+      if (next !== row.element) {
+        container.insertBefore(row.element, next);
+      }
+      previous = row.element;
+    });
+  }
+
+  createDeparture() {
+    const element = document.createElement('div');
+    element.className = 'departure-row';
+    element.innerHTML = `
+      <span class="col-time"></span>
+      <span class="col-dest">
+        <span class="destination"></span>
+        <span class="calling-points" hidden>
+          <span class="calling-text"></span>
         </span>
-        ${this.config.show_platform ? `<span class="col-plat">${departure.platform || '-'}</span>` : ''}
-        <span class="col-exp ${statusClass}">${expectedText}</span>
-      </div>
+      </span>
+      ${this.config.show_platform ? '<span class="col-plat"></span>' : ''}
+      <span class="col-exp"></span>
     `;
+    return {
+      element,
+      values: {},
+      time: element.querySelector('.col-time'),
+      destination: element.querySelector('.destination'),
+      callingPoints: element.querySelector('.calling-points'),
+      callingText: element.querySelector('.calling-text'),
+      platform: element.querySelector('.col-plat'),
+      expected: element.querySelector('.col-exp')
+    };
   }
 
-  renderNoDepartures() {
-    return `
-      <div class="no-departures">
-        <span>No departures scheduled</span>
-      </div>
-    `;
+  updateDeparture(row, departure, isFirst) {
+    // Calling points scroll under the first departure only
+    const callingPointsText = isFirst && this.config.show_calling_points && departure.calling_points
+      ? departure.calling_points.map(cp => cp.station).join(', ')
+      : '';
+
+    const set = (name, value, apply) => {
+      if (row.values[name] !== value) {
+        row.values[name] = value;
+        apply(value);
+      }
+    };
+    set('first', isFirst, value => row.element.classList.toggle('first-departure', value));
+    set('time', departure.scheduled_time, value => { row.time.textContent = value; });
+    set('destination', departure.destination, value => { row.destination.textContent = value; });
+    set('callingPoints', callingPointsText, value => {
+      row.callingText.textContent = value ? `Calling at: ${value}` : '';
+      row.callingPoints.hidden = !value;
+      row.callingText.style.animation = value ? 'scroll-text 15s linear infinite' : '';
+    });
+    if (row.platform) {
+      set('platform', departure.platform || '-', value => { row.platform.textContent = value; });
+    }
+    set('status', this.getStatusClass(departure.status, departure.is_cancelled),
+        value => { row.expected.className = `col-exp ${value}`; });
+    set('expected', departure.is_cancelled ? 'Cancelled' : departure.expected_time,
+        value => { row.expected.textContent = value; });
   }
 
   getStatusClass(status, isCancelled) {
@@ -139,30 +363,6 @@ class UKDeparturesCard extends HTMLElement {
     }
   }
 
-  startClockUpdate() {
-    if (this._clockInterval) clearInterval(this._clockInterval);
-    this._clockInterval = setInterval(() => {
-      const clockEl = this.shadowRoot.querySelector('.clock');
-      if (clockEl) {
-        const now = new Date();
-        clockEl.textContent = now.toLocaleTimeString('en-GB', { hour: '2-digit', minute: '2-digit' });
-      }
-    }, 1000);
-  }
-
-  animateCallingPoints() {
-    const callingText = this.shadowRoot.querySelector('.calling-text');
-    if (callingText) {
-      callingText.style.animation = 'scroll-text 15s linear infinite';
-    }
-  }
-
-  disconnectedCallback() {
-    if (this._clockInterval) {
-      clearInterval(this._clockInterval);
-    }
-  }
-
   getStyles() {
     return `
       @font-face {
@@ -343,7 +543,7 @@ window.customCards.push({
 });
 
 console.info(
-  '%c UK-DEPARTURES-CARD %c v1.0.0 ',
+  '%c UK-DEPARTURES-CARD %c v1.2.0 ',
   'color: white; background: #ff9900; font-weight: bold;',
   'color: #ff9900; background: white; font-weight: bold;'
 );
@@ -6,12 +6,52 @@ A Flask application that displays live train departures in authentic
 UK station departure board style.
 """
 
+import functools
+import hashlib
+import hmac
+import json
+import math
 import os
+import time
 from datetime import datetime
-
-from flask import Flask, render_template, jsonify, request
-
-from darwin_api import DarwinApi, DarwinApiError
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import Flask, Response, abort, g, render_template, jsonify, request, send_file
+from markupsafe import Markup
+
+from assets import IMMUTABLE, AssetManifest
+from bootstrap import BoardBootstrap
+from darwin_api import DARWIN_ENDPOINT as DEFAULT_DARWIN_ENDPOINT
+from darwin_api import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    DEFAULT_MAX_ROWS,
+    DEFAULT_MAX_WINDOW,
+    DEFAULT_MIN_ROWS,
+    DEFAULT_MIN_WINDOW,
+    AdaptiveQuerySizer,
+    DarwinApi,
+    DarwinApiError,
+    get_circuit_breaker,
+    get_details_cache,
+    get_latency_histogram,
+    minutes_until,
+)
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    FAST_BUCKETS,
+    BoardFreshness,
+    DarwinMetrics,
+    Registry,
+    timed,
+)
+from history import history_from_env, scheduled_datetime
+from profiling import profiler_from_env
+from punctuality import punctuality_from_env
+from screens import screens_from_env
+from stations import get_station_index
+from tracing import tracer_from_env
 
 app = Flask(__name__)
 
@@ -22,55 +62,187 @@ NUM_DEPARTURES = int(os.environ.get('NUM_DEPARTURES', '6'))
 # Support multiple destinations separated by comma
 DESTINATION_CRS = os.environ.get('DESTINATION_CRS', '')
 DESTINATION_LIST = [d.strip().upper() for d in DESTINATION_CRS.split(',') if d.strip()]
-
-# Station names lookup
-STATION_NAMES = {
-    "PAD": "London Paddington",
-    "EUS": "London Euston",
-    "KGX": "London King's Cross",
-    "STP": "London St Pancras International",
-    "VIC": "London Victoria",
-    "WAT": "London Waterloo",
-    "CHX": "London Charing Cross",
-    "LST": "London Liverpool Street",
-    "BHM": "Birmingham New Street",
-    "MAN": "Manchester Piccadilly",
-    "LDS": "Leeds",
-    "EDB": "Edinburgh Waverley",
-    "GLC": "Glasgow Central",
-    "BRI": "Bristol Temple Meads",
-    "RDG": "Reading",
-    "OXF": "Oxford",
-    "CBG": "Cambridge",
-    "NCL": "Newcastle",
-    "LIV": "Liverpool Lime Street",
-    "SHF": "Sheffield",
-    "SVG": "Stevenage",
-    "HIT": "Hitchin",
-    "LET": "Letchworth Garden City",
-    "BDK": "Baldock",
-    "RYS": "Royston",
-}
+# Point at a local Darwin simulator for load and integration testing
+DARWIN_ENDPOINT = os.environ.get('DARWIN_ENDPOINT', DEFAULT_DARWIN_ENDPOINT)
+# Fetch the lightweight board and load calling points only for displayed trains
+LAZY_CALLING_POINTS = os.environ.get('LAZY_CALLING_POINTS', 'false').lower() == 'true'
+# Send a second Darwin request when the first runs past the recent p95 latency
+HEDGE_REQUESTS = os.environ.get('HEDGE_REQUESTS', 'false').lower() == 'true'
+# Time budget for all Darwin calls made by one /api/departures request (seconds)
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '20'))
+# /health fails once a board has been falling back to demo data for this long (seconds)
+HEALTH_STALE_SECONDS = float(os.environ.get('HEALTH_STALE_SECONDS', '300'))
+# Seconds a board waits before refreshing, sent as next_refresh and Cache-Control
+BOARD_REFRESH_SECONDS = int(os.environ.get('BOARD_REFRESH_SECONDS', '30'))
+# Refuse unknown station codes without calling Darwin (see stations.py)
+VALIDATE_STATIONS = os.environ.get('VALIDATE_STATIONS', 'true').lower() == 'true'
+
+# Learns numRows/timeWindow per station and filter within these bounds
+QUERY_SIZER = AdaptiveQuerySizer(
+    min_rows=int(os.environ.get('QUERY_MIN_ROWS', DEFAULT_MIN_ROWS)),
+    max_rows=int(os.environ.get('QUERY_MAX_ROWS', DEFAULT_MAX_ROWS)),
+    min_window=int(os.environ.get('QUERY_MIN_WINDOW', DEFAULT_MIN_WINDOW)),
+    max_window=int(os.environ.get('QUERY_MAX_WINDOW', DEFAULT_MAX_WINDOW)),
+)
+
+# Per-stage request tracing, configured by TRACING_EXPORTER (see tracing.py)
+TRACER = tracer_from_env()
+# Endpoints not worth a trace: static files and Prometheus scrapes
+UNTRACED_ENDPOINTS = {'static', 'asset', 'metrics', 'service_worker'}
+
+# Departure history for /api/stats; None unless HISTORY_DB is set
+HISTORY = history_from_env()
+
+# Last live board per query, embedded in board pages for the first paint
+BOOTSTRAP = BoardBootstrap(max_age=2 * BOARD_REFRESH_SECONDS)
+
+# Rolling 7 and 30 day punctuality per route for /api/punctuality
+PUNCTUALITY = punctuality_from_env()
+
+# Sampled request profiling (see profiling.py); PROFILE_TOKEN enables /admin/profiling
+PROFILER = profiler_from_env()
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+UNPROFILED_ENDPOINTS = {'static', 'asset', 'service_worker', 'profiling_admin',
+                        'profiling_download'}
+
+# Fingerprinted static files served from /assets/; templates link them with asset_path()
+ASSETS = AssetManifest(app.static_folder)
+app.add_template_global(ASSETS.path, 'asset_path')
+
+# Prometheus metrics served at /metrics
+METRICS = Registry()
+DARWIN_METRICS = DarwinMetrics(METRICS)
+BOARD_FRESHNESS = BoardFreshness(HEALTH_STALE_SECONDS)
+SERIALIZE_DURATION = METRICS.histogram(
+    'traintimes_board_serialize_duration_seconds',
+    'Time spent building the /api/departures response.',
+    buckets=FAST_BUCKETS,
+)
+BOARD_FALLBACKS = METRICS.counter(
+    'traintimes_board_fallbacks_total',
+    'Board requests answered with demo data after a Darwin error.',
+    ('station',),
+)
+REQUESTS_IN_FLIGHT = METRICS.gauge(
+    'traintimes_http_requests_in_flight',
+    'HTTP requests currently being served.',
+)
+HTTP_REQUESTS = METRICS.counter(
+    'traintimes_http_requests_total',
+    'HTTP requests served, by route and status code.',
+    ('route', 'status'),
+)
+METRICS.callback(
+    'traintimes_board_age_seconds',
+    'Seconds since each station last had live data.',
+    'gauge', BOARD_FRESHNESS.ages, ('station',),
+)
+METRICS.callback(
+    'traintimes_details_cache_hits_total',
+    'Service details lookups answered from the cache.',
+    'counter', lambda: get_details_cache().hits,
+)
+METRICS.callback(
+    'traintimes_details_cache_misses_total',
+    'Service details lookups that had to call Darwin.',
+    'counter', lambda: get_details_cache().misses,
+)
+METRICS.callback(
+    'traintimes_darwin_hedges_sent_total',
+    'Hedged second requests sent to Darwin.',
+    'counter', lambda: get_latency_histogram(DARWIN_ENDPOINT).hedges_sent,
+)
+METRICS.callback(
+    'traintimes_darwin_hedges_won_total',
+    'Hedged requests that answered before the original.',
+    'counter', lambda: get_latency_histogram(DARWIN_ENDPOINT).hedges_won,
+)
+METRICS.callback(
+    'traintimes_darwin_circuit_state',
+    'Darwin circuit breaker state (1 for the current state).',
+    'gauge', lambda: {
+        (state,): int(get_circuit_breaker(DARWIN_ENDPOINT).stats()['state'] == state)
+        for state in (CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN)
+    },
+    ('state',),
+)
+
+# Darwin times are UK local time, whatever the server's own time zone
+try:
+    UK_TIMEZONE = ZoneInfo('Europe/London')
+except ZoneInfoNotFoundError:  # No time zone database; assume the server keeps UK time
+    UK_TIMEZONE = None
+
+
+def uk_now():
+    """Return the current time in the UK, with its UTC offset."""
+    return datetime.now(UK_TIMEZONE).astimezone(UK_TIMEZONE)
+
+
+def server_time():
+    """Return the current time for a board's server_time, used by browsers to correct skew."""
+    return uk_now().isoformat(timespec='milliseconds')
+
+
+def departure_timestamps(scheduled, expected, now):
+    """Return ISO timestamps for a departure's HH:MM scheduled and expected times.
+
+    The expected timestamp is None when Darwin gives no time, such as
+    "Delayed" or "Cancelled".
+    """
+    scheduled_at = scheduled_datetime(scheduled, now)
+    if scheduled_at is None:
+        return None, None
+    # An expected time belongs to the day that puts it nearest the scheduled one
+    expected_at = scheduled_at if expected == 'On time' else scheduled_datetime(expected, scheduled_at)
+    return (scheduled_at.isoformat(timespec='seconds'),
+            expected_at.isoformat(timespec='seconds') if expected_at else None)
+
+
+# Stations offered in the board's station selector; names come from the station index
+POPULAR_STATIONS = (
+    'PAD', 'EUS', 'KGX', 'STP', 'VIC', 'WAT', 'CHX', 'LST', 'BHM', 'MAN', 'LDS', 'EDB',
+    'GLC', 'BRI', 'RDG', 'OXF', 'CBG', 'NCL', 'LIV', 'SHF', 'SVG', 'HIT', 'LET', 'BDK', 'RYS',
+)
 
 
 def get_station_name(crs: str) -> str:
     """Get the full station name from CRS code."""
-    return STATION_NAMES.get(crs.upper(), crs.upper())
+    return get_station_index().name(crs) or crs.upper()
+
+
+def station_label(crs: str) -> str:
+    """Return a CRS code for use as a metric label, or 'other' for unknown codes."""
+    return crs if get_station_index().name(crs) else 'other'
+
+
+def embed_board(body):
+    """Return a serialized board safe to place in a <script> element, or None."""
+    if body is None:
+        return None
+    # JSON allows \u003c wherever < appears, and it cannot close the script
+    return Markup(body.replace('<', '\\u003c'))
 
 
 @app.route('/')
 def index():
-    """Render the departure board page."""
+    """Render the departure board page with the latest board for its first paint."""
     station = request.args.get('station', STATION_CRS).upper()
-    station_name = get_station_name(station)
-    return render_template('board.html',
-                         station_crs=station,
-                         station_name=station_name)
+    # The query board.js makes first, as /api/departures keys it
+    board_key = (station, tuple(DESTINATION_LIST), NUM_DEPARTURES)
+    version, board = BOOTSTRAP.latest(board_key)
+    return BOOTSTRAP.page(('index', board_key, version), lambda: render_template(
+        'board.html',
+        station_crs=station,
+        station_name=get_station_name(station),
+        screen_id='',
+        num_departures=NUM_DEPARTURES,
+        board=embed_board(board)))
 
 
 def get_demo_departures(station_crs):
     """Return demo departure data for testing the UI."""
-    now = datetime.now()
+    now = uk_now()
 
     demo_data = [
         {
@@ -176,15 +348,144 @@ def get_demo_departures(station_crs):
         },
     ]
 
+    for departure in demo_data:
+        departure['scheduled_at'], departure['expected_at'] = departure_timestamps(
+            departure['scheduled_time'], departure['expected_time'], now)
     return demo_data
 
 
+def fetch_board(api, station, destinations, num_rows, time_window, deadline=None):
+    """Fetch a station's board, filtered by Darwin when calling points are loaded lazily.
+
+    A lazy board has no calling points, so telling whether a train calls at
+    a destination would take a GetServiceDetails call per row. Instead one
+    board is fetched per destination with Darwin's own filter and merged
+    in departure order. Returns the services and, for a lazy filtered
+    board, the destinations each service is known to call at (else None).
+    """
+    if not LAZY_CALLING_POINTS or not destinations:
+        services = api.get_departure_board(
+            station_crs=station,
+            num_rows=num_rows,
+            destination_crs=None,
+            time_window=time_window,
+            with_details=not LAZY_CALLING_POINTS,
+            deadline=deadline
+        )
+        return services, None
+
+    merged = {}
+    reaches = {}
+    for crs in destinations:
+        for service in api.get_departure_board(
+            station_crs=station,
+            num_rows=num_rows,
+            destination_crs=crs,
+            time_window=time_window,
+            with_details=False,
+            deadline=deadline
+        ):
+            merged.setdefault(service.service_id, service)
+            reaches.setdefault(service.service_id, set()).add(crs)
+    services = list(merged.values())
+    if len(destinations) > 1:
+        now = uk_now()
+        services.sort(key=lambda service: minutes_until(service.scheduled_time, now) or 0)
+    return services, reaches
+
+
+def select_departures(api, all_services, destinations, num, deadline=None, reaches=None):
+    """Pick the first `num` services going to or calling at any destination.
+
+    reaches, from fetch_board, says which destinations each service calls
+    at; without it calling points are loaded where the final destination
+    does not match. Returns the services and how many rows of the board had
+    to be scanned.
+    """
+    if not destinations:
+        return all_services[:num], min(num, len(all_services))
+
+    filtered_services = []
+    for index, service in enumerate(all_services):
+        if reaches is not None:
+            if reaches.get(service.service_id, set()).intersection(destinations):
+                filtered_services.append(service)
+        # Check if final destination matches
+        elif service.destination_crs in destinations:
+            filtered_services.append(service)
+        else:
+            # Check if any calling point matches
+            api.load_calling_points([service], deadline)
+            for cp in service.calling_points:
+                if cp.crs in destinations:
+                    filtered_services.append(service)
+                    break
+        if len(filtered_services) >= num:
+            return filtered_services, index + 1
+    return filtered_services, len(all_services)
+
+
+def departure_to_dict(service, now):
+    """Convert a TrainService into the JSON shape used by the board.
+
+    now is the current UK time, which dates the service's HH:MM times.
+    """
+    calling_points = [
+        {
+            'station': cp.station_name,
+            'crs': cp.crs,
+            'scheduled': cp.scheduled_time,
+            'expected': cp.expected_time
+        }
+        for cp in service.calling_points
+    ]
+
+    scheduled_at, expected_at = departure_timestamps(service.scheduled_time,
+                                                     service.expected_time, now)
+    return {
+        'service_id': service.service_id,
+        'destination': service.destination,
+        'scheduled_time': service.scheduled_time,
+        'expected_time': service.expected_time,
+        'platform': service.platform or '-',
+        'operator': service.operator,
+        'status': service.status,
+        'is_cancelled': service.is_cancelled,
+        'cancel_reason': service.cancel_reason,
+        'delay_reason': service.delay_reason,
+        'calling_points': calling_points,
+        'scheduled_at': scheduled_at,
+        'expected_at': expected_at
+    }
+
+
+def paced(response, next_refresh, cacheable=True):
+    """Send a board's next_refresh hint as Cache-Control too.
+
+    Live boards may be reused until they are due for a refresh; fallback
+    boards are never cached.
+    """
+    response.headers['Cache-Control'] = f'max-age={next_refresh}' if cacheable else 'no-store'
+    return response
+
+
+def fallback_refresh_seconds():
+    """Return the refresh hint for a fallback board: when Darwin may be tried again."""
+    retry_in = get_circuit_breaker(DARWIN_ENDPOINT).stats()['retry_in']
+    return max(BOARD_REFRESH_SECONDS, math.ceil(retry_in or 0))
+
+
 @app.route('/api/departures')
 def get_departures():
     """API endpoint to get live departure data."""
     station = request.args.get('station', STATION_CRS).upper()
     destination_param = request.args.get('destination', DESTINATION_CRS).upper()
-    num = int(request.args.get('num', NUM_DEPARTURES))
+    try:
+        num = int(request.args.get('num', NUM_DEPARTURES))
+    except ValueError:
+        return jsonify({'error': 'num must be a number'}), 400
+    if not 1 <= num <= 20:
+        return jsonify({'error': 'num must be between 1 and 20'}), 400
     demo = request.args.get('demo', 'false').lower() == 'true'
 
     # Parse destination list (comma-separated)
@@ -196,107 +497,437 @@ def get_departures():
     else:
         destinations = DESTINATION_LIST
 
+    if VALIDATE_STATIONS:
+        index = get_station_index()
+        unknown = [crs for crs in [station, *destinations] if not index.accepts(crs)]
+        if unknown:
+            return jsonify({'error': f"Unknown station code: {', '.join(unknown)}"}), 400
+
     # Use demo mode if requested or if no valid API token
     if demo or not API_TOKEN or API_TOKEN == "YOUR_API_TOKEN_HERE":
-        return jsonify({
+        return paced(jsonify({
             'departures': get_demo_departures(station)[:num],
             'station_name': get_station_name(station),
             'station_crs': station,
             'time': datetime.now().strftime('%H:%M'),
             'last_updated': datetime.now().isoformat(),
-            'demo_mode': True
-        })
+            'demo_mode': True,
+            'next_refresh': BOARD_REFRESH_SECONDS,
+            'server_time': server_time()
+        }), BOARD_REFRESH_SECONDS)
 
     try:
-        api = DarwinApi(API_TOKEN)
-
-        # Always fetch without API filter - we'll filter client-side by calling points
-        # This ensures we get the correct final destination, not the filter station
-        all_services = api.get_departure_board(
-            station_crs=station,
-            num_rows=20,  # Fetch more to allow for filtering
-            destination_crs=None
-        )
-
-        # Filter by calling points if destinations specified
-        if destinations:
-            filtered_services = []
-            for service in all_services:
-                # Check if final destination matches
-                if service.destination_crs in destinations:
-                    filtered_services.append(service)
-                    continue
-                # Check if any calling point matches
-                for cp in service.calling_points:
-                    if cp.crs in destinations:
-                        filtered_services.append(service)
-                        break
-            services = filtered_services[:num]
-        else:
-            services = all_services[:num]
-
-        departures = []
-        for service in services:
-            calling_points = [
-                {
-                    'station': cp.station_name,
-                    'crs': cp.crs,
-                    'scheduled': cp.scheduled_time,
-                    'expected': cp.expected_time
-                }
-                for cp in service.calling_points
-            ]
-
-            departures.append({
-                'destination': service.destination,
-                'scheduled_time': service.scheduled_time,
-                'expected_time': service.expected_time,
-                'platform': service.platform or '-',
-                'operator': service.operator,
-                'status': service.status,
-                'is_cancelled': service.is_cancelled,
-                'cancel_reason': service.cancel_reason,
-                'delay_reason': service.delay_reason,
-                'calling_points': calling_points
+        api = DarwinApi(API_TOKEN, hedge=HEDGE_REQUESTS, endpoint=DARWIN_ENDPOINT,
+                        metrics=DARWIN_METRICS, tracer=TRACER)
+        deadline = time.monotonic() + REQUEST_DEADLINE
+        TRACER.current_span().set_attribute('board.station', station)
+
+        # Without lazy calling points the board is fetched unfiltered and
+        # filtered here by calling points, which come with every row
+        for _ in range(2):
+            num_rows, time_window = QUERY_SIZER.size_for(station, destinations, num)
+            with TRACER.span('board.fetch', {'board.num_rows': num_rows,
+                                             'board.time_window': time_window}):
+                all_services, reaches = fetch_board(api, station, destinations, num_rows,
+                                                    time_window, deadline)
+            with TRACER.span('board.filter', {'board.destinations': ','.join(destinations)}):
+                services, consumed = select_departures(api, all_services, destinations, num,
+                                                       deadline, reaches)
+            # Try once more if the board came back short and the query grew
+            if not QUERY_SIZER.record(station, destinations, num, all_services,
+                                      consumed, len(services) >= num):
+                break
+
+        # Only the displayed services need calling points
+        with TRACER.span('board.load_calling_points'):
+            api.load_calling_points(services, deadline)
+        BOARD_FRESHNESS.record_success(station)
+        if HISTORY is not None:
+            HISTORY.record(station, all_services, uk_now())
+        PUNCTUALITY.observe(station, all_services, uk_now())
+
+        with timed(SERIALIZE_DURATION), TRACER.span('board.serialize'):
+            uk_time = uk_now()
+            body = app.json.dumps({
+                'departures': [departure_to_dict(service, uk_time) for service in services],
+                'station_name': get_station_name(station),
+                'station_crs': station,
+                'time': datetime.now().strftime('%H:%M'),
+                'last_updated': datetime.now().isoformat(),
+                'demo_mode': False,
+                'next_refresh': BOARD_REFRESH_SECONDS,
+                'server_time': server_time()
             })
-
-        return jsonify({
-            'departures': departures,
-            'station_name': get_station_name(station),
-            'station_crs': station,
-            'time': datetime.now().strftime('%H:%M'),
-            'last_updated': datetime.now().isoformat(),
-            'demo_mode': False
-        })
+        BOOTSTRAP.record((station, tuple(destinations), num), body)
+        return paced(Response(body, mimetype='application/json'), BOARD_REFRESH_SECONDS)
 
     except DarwinApiError as e:
+        BOARD_FRESHNESS.record_failure(station, str(e))
+        BOARD_FALLBACKS.inc(station=station_label(station))
         # Fall back to demo mode on API error
-        return jsonify({
+        next_refresh = fallback_refresh_seconds()
+        return paced(jsonify({
             'departures': get_demo_departures(station)[:num],
             'station_name': get_station_name(station),
             'station_crs': station,
             'time': datetime.now().strftime('%H:%M'),
             'last_updated': datetime.now().isoformat(),
             'demo_mode': True,
-            'api_error': str(e)
-        })
+            'api_error': str(e),
+            'next_refresh': next_refresh,
+            'server_time': server_time()
+        }), next_refresh, cacheable=False)
+
+
+def refresh_screen_board(station, screens):
+    """Fetch one board for every screen on a station and build each screen's view.
+
+    Screens with the same destination filter share one selection. Returns
+    each screen's response body, already serialized.
+    """
+    api = DarwinApi(API_TOKEN, hedge=HEDGE_REQUESTS, endpoint=DARWIN_ENDPOINT,
+                    metrics=DARWIN_METRICS, tracer=TRACER)
+    deadline = time.monotonic() + REQUEST_DEADLINE
+    # Rows wanted per distinct filter; the query is sized for all of them
+    wanted = {}
+    for screen in screens:
+        wanted[screen.destinations] = max(wanted.get(screen.destinations, 0), screen.num)
+    destinations = sorted({crs for screen in screens for crs in screen.destinations})
+    num = max(wanted.values())
+
+    with TRACER.span('screens.poll', {'board.station': station, 'screens.count': len(screens)}):
+        try:
+            for _ in range(2):
+                num_rows, time_window = QUERY_SIZER.size_for(station, destinations, num)
+                with TRACER.span('board.fetch', {'board.num_rows': num_rows,
+                                                 'board.time_window': time_window}):
+                    all_services, reaches = fetch_board(api, station, destinations, num_rows,
+                                                        time_window, deadline)
+                with TRACER.span('board.filter', {'screens.filters': len(wanted)}):
+                    selections = {}
+                    consumed = 0
+                    for filter_crs, rows in wanted.items():
+                        services, used = select_departures(api, all_services, list(filter_crs),
+                                                           rows, deadline, reaches)
+                        selections[filter_crs] = services
+                        consumed = max(consumed, used)
+                complete = all(len(selections[s.destinations]) >= s.num for s in screens)
+                if not QUERY_SIZER.record(station, destinations, num, all_services,
+                                          consumed, complete):
+                    break
+
+            shown = {id(service): service
+                     for services in selections.values() for service in services}
+            with TRACER.span('board.load_calling_points'):
+                api.load_calling_points(list(shown.values()), deadline)
+        except DarwinApiError as e:
+            BOARD_FRESHNESS.record_failure(station, str(e))
+            raise
+        BOARD_FRESHNESS.record_success(station)
+        if HISTORY is not None:
+            HISTORY.record(station, all_services, uk_now())
+        PUNCTUALITY.observe(station, all_services, uk_now())
+
+        with timed(SERIALIZE_DURATION), TRACER.span('board.serialize'):
+            # Each shown service is converted once, whichever screens show it
+            uk_time = uk_now()
+            rows = {key: departure_to_dict(service, uk_time) for key, service in shown.items()}
+            now = datetime.now()
+            return {
+                screen.id: app.json.dumps({
+                    'departures': [rows[id(service)]
+                                   for service in selections[screen.destinations][:screen.num]],
+                    'station_name': screen.name or get_station_name(station),
+                    'station_crs': station,
+                    'screen': screen.id,
+                    'time': now.strftime('%H:%M'),
+                    'last_updated': now.isoformat(),
+                    'demo_mode': False,
+                    # When the shared board was built; browsers allow for its age
+                    'server_time': uk_time.isoformat(timespec='milliseconds')
+                })
+                for screen in screens
+            }
+
+
+# Multi-screen mode: shared per-station pollers for the screens in SCREENS_FILE
+SCREEN_HUB = screens_from_env(refresh_screen_board)
+
+
+@app.route('/screen/<screen_id>')
+def screen_board(screen_id):
+    """Render the departure board for a configured screen."""
+    if SCREEN_HUB is None or screen_id not in SCREEN_HUB.screens:
+        abort(404)
+    screen = SCREEN_HUB.screens[screen_id]
+    # Don't wait for a poll; an idle station is woken up for the browser's fetch
+    board, _ = SCREEN_HUB.view(screen_id, 0)
+    # Every poll makes a new body, so the body itself versions the page
+    return BOOTSTRAP.page(('screen', screen_id, board), lambda: render_template(
+        'board.html',
+        station_crs=screen.station,
+        station_name=screen.name or get_station_name(screen.station),
+        screen_id=screen.id,
+        num_departures=screen.num,
+        board=embed_board(board)))
+
+
+@app.route('/api/screens')
+def get_screens():
+    """API endpoint listing the configured screens and their stations' poll state."""
+    if SCREEN_HUB is None:
+        return jsonify({'error': 'Multi-screen mode is disabled; set SCREENS_FILE'}), 404
+    return jsonify({
+        'screens': [
+            {'id': s.id, 'station': s.station, 'destinations': list(s.destinations),
+             'num': s.num, 'name': s.name}
+            for s in SCREEN_HUB.screens.values()
+        ],
+        **SCREEN_HUB.stats()
+    })
+
+
+@app.route('/api/screens/<screen_id>')
+def get_screen_departures(screen_id):
+    """API endpoint with a screen's departures, served from its station's shared board."""
+    if SCREEN_HUB is None or screen_id not in SCREEN_HUB.screens:
+        return jsonify({'error': f'Unknown screen {screen_id}'}), 404
+    body, error = SCREEN_HUB.view(screen_id, REQUEST_DEADLINE)
+    # Come back just after the station's next poll should have finished
+    next_refresh = math.ceil(SCREEN_HUB.refresh_in(screen_id)) + 1
+    if body is None:
+        screen = SCREEN_HUB.screens[screen_id]
+        BOARD_FALLBACKS.inc(station=screen.station)
+        return paced(jsonify({
+            'departures': get_demo_departures(screen.station)[:screen.num],
+            'station_name': screen.name or get_station_name(screen.station),
+            'station_crs': screen.station,
+            'screen': screen.id,
+            'time': datetime.now().strftime('%H:%M'),
+            'last_updated': datetime.now().isoformat(),
+            'demo_mode': True,
+            'api_error': error or 'Board not available yet',
+            'next_refresh': next_refresh,
+            'server_time': server_time()
+        }), next_refresh, cacheable=False)
+    if error:
+        # Last good board, flagged with the error that stopped it updating
+        return paced(jsonify({**json.loads(body), 'api_error': error,
+                              'next_refresh': next_refresh}), next_refresh, cacheable=False)
+    # The shared body has no next_refresh; Cache-Control carries the hint
+    return paced(Response(body, mimetype='application/json'), next_refresh)
+
+
+# Cached by the service worker when it installs
+PRECACHE_ASSETS = ('css/departure-board.css', 'js/board.js')
+
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Serve a fingerprinted static file, precompressed and cached for a year."""
+    static_asset = ASSETS.get(filename)
+    if static_asset is None:
+        abort(404)
+    encoding, body = static_asset.body(lambda name: request.accept_encodings[name] > 0)
+    response = Response(body, mimetype=static_asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{static_asset.digest[:16]}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+
+@functools.lru_cache(maxsize=1)
+def service_worker_script():
+    """Render the service worker once, versioned by the files it caches."""
+    digest = hashlib.sha256(ASSETS.version.encode())
+    with open(os.path.join(app.root_path, app.template_folder, 'sw.js'), 'rb') as source:
+        digest.update(source.read())
+    # Relative to the worker's URL, so they resolve under ingress too
+    precache = ['./'] + [f'assets/{ASSETS.path(name)}' for name in PRECACHE_ASSETS]
+    return render_template('sw.js', version=digest.hexdigest()[:12], precache=precache)
+
+
+@app.route('/sw.js')
+def service_worker():
+    """Serve the offline service worker from the root so it controls every board page."""
+    response = Response(service_worker_script(), mimetype='text/javascript')
+    # Browsers look for a new worker on each visit; make sure they see it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@functools.lru_cache(maxsize=1)
+def popular_stations():
+    """Return the station selector's stations sorted by name (built once)."""
+    return sorted(({'crs': crs, 'name': get_station_name(crs)} for crs in POPULAR_STATIONS),
+                  key=lambda station: station['name'])
 
 
 @app.route('/api/stations')
 def get_stations():
-    """API endpoint to get list of common stations."""
-    return jsonify({
-        'stations': [
-            {'crs': crs, 'name': name}
-            for crs, name in sorted(STATION_NAMES.items(), key=lambda x: x[1])
-        ]
-    })
+    """API endpoint for station autocomplete (?q=) or the list of common stations."""
+    query = request.args.get('q', '')
+    if query:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+        return jsonify({'stations': get_station_index().search(query, limit)})
+    return jsonify({'stations': popular_stations()})
+
+
+@app.route('/api/query-stats')
+def get_query_stats():
+    """API endpoint with the learned board sizes and their hit rates."""
+    return jsonify({'boards': QUERY_SIZER.stats()})
+
+
+@app.route('/api/stats')
+def get_stats():
+    """API endpoint with per-train punctuality from the departure history."""
+    if HISTORY is None:
+        return jsonify({'error': 'Departure history is disabled; set HISTORY_DB'}), 404
+    station = request.args.get('station', STATION_CRS).upper()
+    destination = request.args.get('destination', '').upper() or None
+    days = max(1, min(int(request.args.get('days', 30)), HISTORY.retention_months * 31))
+    stats = HISTORY.stats(station, days, destination, uk_now())
+    stats['station_name'] = get_station_name(station)
+    stats['history'] = HISTORY.info()
+    return jsonify(stats)
+
+
+@app.route('/api/punctuality')
+def get_punctuality():
+    """API endpoint with rolling 7 and 30 day punctuality per route."""
+    station = request.args.get('station', STATION_CRS).upper()
+    destination = request.args.get('destination', '').upper() or None
+    stats = PUNCTUALITY.stats(station, destination, uk_now())
+    stats['station_name'] = get_station_name(station)
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route('/health')
 def health():
-    """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'time': datetime.now().isoformat()})
+    """Readiness check: 503 once a live board has gone stale."""
+    stale = BOARD_FRESHNESS.stale_boards()
+    return jsonify({
+        'status': 'stale' if stale else 'healthy',
+        'time': datetime.now().isoformat(),
+        'stale_boards': stale,
+        'boards': BOARD_FRESHNESS.stats(),
+        'darwin_circuit': get_circuit_breaker(DARWIN_ENDPOINT).stats(),
+        'darwin_latency': get_latency_histogram(DARWIN_ENDPOINT).stats()
+    }), 503 if stale else 200
+
+
+def require_admin_token():
+    """Abort unless the request carries PROFILE_TOKEN (404 when no token is set)."""
+    if not PROFILE_TOKEN:
+        abort(404)
+    token = request.headers.get('X-Admin-Token') or request.args.get('token', '')
+    if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        abort(403)
+
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_admin():
+    """Show or change the profiling settings.
+
+    POST enabled, mode and/or sample_rate as JSON or form fields.
+    """
+    require_admin_token()
+    if request.method == 'POST':
+        settings = request.get_json(silent=True) or request.form
+        enabled = settings.get('enabled')
+        if isinstance(enabled, str):
+            enabled = enabled.lower() == 'true'
+        try:
+            sample_rate = settings.get('sample_rate')
+            PROFILER.configure(
+                enabled=enabled,
+                mode=settings.get('mode'),
+                sample_rate=float(sample_rate) if sample_rate is not None else None,
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(PROFILER.stats())
+
+
+@app.route('/admin/profiling/<endpoint>/<name>')
+def profiling_download(endpoint, name):
+    """Download a stored profile."""
+    require_admin_token()
+    path = PROFILER.path_for(endpoint, name)
+    if path is None:
+        abort(404)
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+
+@app.before_request
+def track_request_start():
+    """Count the request as in flight and start its trace."""
+    REQUESTS_IN_FLIGHT.inc()
+    if TRACER.enabled and request.endpoint not in UNTRACED_ENDPOINTS:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.trace_span = TRACER.start_span(f'{request.method} {route}', {
+            'http.method': request.method,
+            'http.route': route,
+            'http.target': request.full_path.rstrip('?'),
+        })
+        g.trace_token = TRACER.activate(g.trace_span)
+    if PROFILER.enabled and request.endpoint not in UNPROFILED_ENDPOINTS:
+        g.profile = PROFILER.start(request.endpoint or 'unmatched')
+
+
+@app.after_request
+def track_request_status(response):
+    """Count the response by route and status code."""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(route=route, status=response.status_code)
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        response.call_on_close(_response_written(span, time.time_ns()))
+    return response
+
+
+def _response_written(span, started_ns):
+    """Return a callback that ends the request trace once the body is sent."""
+    def close():
+        TRACER.record_span('http.response_write', started_ns, time.time_ns(), parent=span)
+        span.end()
+    return close
+
+
+@app.teardown_request
+def track_request_end(exc):
+    """Stop counting the request as in flight, save its profile and detach its trace."""
+    REQUESTS_IN_FLIGHT.dec()
+    PROFILER.stop(g.pop('profile', None))
+    token = g.pop('trace_token', None)
+    if token is not None:
+        TRACER.deactivate(token)
+    # No response was produced, so nothing else will end the trace
+    span = g.pop('trace_span', None)
+    if span is not None:
+        if exc is not None:
+            span.record_exception(exc)
+        span.end()
+
+
+# Startup notes, printed on import so gunicorn (which never runs __main__) shows them too
+if not API_TOKEN:
+    print("⚠️  WARNING: No DARWIN_API_TOKEN set. Set this environment variable.")
+    print("   Get your token from: https://opendata.nationalrail.co.uk/")
+
+if VALIDATE_STATIONS and not get_station_index().complete:
+    print("Note: stations.csv is a partial list, so only malformed station codes are refused.")
+    print("   Rebuild it with tools/build_station_index.py to refuse unknown codes too.")
 
 
 if __name__ == '__main__':
@@ -313,8 +944,4 @@ if __name__ == '__main__':
 ╚════════════════════════════════════════════════════════════════╝
     """)
 
-    if not API_TOKEN:
-        print("⚠️  WARNING: No DARWIN_API_TOKEN set. Set this environment variable.")
-        print("   Get your token from: https://opendata.nationalrail.co.uk/")
-
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,100 @@
+"""
+Fingerprinted static assets for the standalone board
+
+Every file under the static folder is read, hashed and compressed once
+when the app starts, so pages can link to content-addressed names such as
+assets/css/departure-board.1a2b3c4d5e.css. A name only ever refers to one
+version of a file, so these are served with a year-long immutable
+Cache-Control and a kiosk reload never asks for them again; a new release
+links to new names instead. Nothing has to be built before deploying.
+
+Each text asset is kept gzip-compressed, and brotli-compressed too when
+the brotli package is installed, and the smallest encoding the browser
+accepts is sent.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 10
+
+# Preferred first
+ENCODINGS = ('br', 'gzip')
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def fingerprint(name: str, digest: str) -> str:
+    """Return name with a content hash before its extension."""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+class Asset:
+    """One static file with its hash and precompressed variants."""
+
+    __slots__ = ('name', 'mimetype', 'digest', 'bodies')
+
+    def __init__(self, name: str, data: bytes):
+        """Hash and compress the file's contents."""
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(data).hexdigest()
+        # Body by content encoding; '' is the file as it is
+        self.bodies = {'': data}
+        if self.mimetype.startswith(_COMPRESSIBLE):
+            # mtime=0 keeps the gzip bytes the same from one start to the next
+            variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data)
+            self.bodies.update((encoding, body) for encoding, body in variants.items()
+                               if len(body) < len(data))
+
+    def body(self, accepts) -> tuple[str, bytes]:
+        """Return the best encoding for an Accept-Encoding check and its body.
+
+        accepts(encoding) says whether the client takes an encoding.
+        """
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and accepts(encoding):
+                return encoding, self.bodies[encoding]
+        return '', self.bodies['']
+
+
+class AssetManifest:
+    """The fingerprinted name of every file in a static folder."""
+
+    def __init__(self, folder: str):
+        """Read every file under folder."""
+        self.paths: dict[str, str] = {}
+        self._assets: dict[str, Asset] = {}
+        combined = hashlib.sha256()
+        for directory, subdirectories, files in os.walk(folder):
+            subdirectories.sort()
+            for file_name in sorted(files):
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, folder).replace(os.sep, '/')
+                with open(path, 'rb') as source:
+                    asset = Asset(name, source.read())
+                hashed = fingerprint(name, asset.digest)
+                self.paths[name] = hashed
+                self._assets[hashed] = asset
+                combined.update(f"{hashed}\n".encode())
+        # Changes whenever any asset does
+        self.version = combined.hexdigest()[:12]
+
+    def path(self, name: str) -> str:
+        """Return the fingerprinted path of a static file, such as js/board.js."""
+        return self.paths[name]
+
+    def get(self, hashed: str) -> Optional[Asset]:
+        """Return the asset for a fingerprinted path, or None if there is none."""
+        return self._assets.get(hashed)
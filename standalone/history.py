@@ -0,0 +1,404 @@
+"""
+Departure history and punctuality statistics for the standalone board
+
+When HISTORY_DB is set, every service seen on a live board is stored in a
+SQLite database. Each service is kept once per station and scheduled
+departure, updated on every poll with its latest expected time, status and
+reason, so the stored row ends up as the last state seen before the train
+left.
+
+Rows are partitioned into one table per month of scheduled departure
+(departures_YYYYMM). Retention drops whole months, which is instant and
+leaves no fragmentation. Writes happen on a background thread so a board
+request never waits for the disk.
+
+Statistics are aggregated per train, meaning the same timetable slot
+(station, scheduled time and destination) across days. Dates are UK dates,
+like the departures they partition.
+
+Configuration (environment):
+    HISTORY_DB                path of the SQLite database (unset: disabled)
+    HISTORY_RETENTION_MONTHS  months of history kept (default 6)
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Departures are stamped in UK time, so months and retention follow UK dates
+try:
+    _UK_TIMEZONE = ZoneInfo('Europe/London')
+except ZoneInfoNotFoundError:  # No time zone database; assume the server keeps UK time
+    _UK_TIMEZONE = None
+
+DEFAULT_RETENTION_MONTHS = 6
+# A train counts as on time if it left within this many minutes of schedule
+ON_TIME_MINUTES = 5
+# Expected times that are not clock times
+_UNKNOWN_DELAY = ("Delayed",)
+
+_TABLE_PREFIX = "departures_"
+_COLUMNS = (
+    "station", "service_id", "scheduled_ts", "scheduled_time", "expected_time",
+    "delay_minutes", "cancelled", "status", "reason", "operator", "operator_code",
+    "destination", "destination_crs", "platform", "first_seen", "last_seen",
+)
+_UPSERT = """
+INSERT INTO {table} ({columns}) VALUES ({placeholders})
+ON CONFLICT (station, scheduled_ts, service_id) DO UPDATE SET
+    expected_time = excluded.expected_time,
+    delay_minutes = excluded.delay_minutes,
+    cancelled = excluded.cancelled,
+    status = excluded.status,
+    reason = COALESCE(excluded.reason, reason),
+    platform = COALESCE(excluded.platform, platform),
+    last_seen = excluded.last_seen
+""".format(
+    table="{table}",
+    columns=", ".join(_COLUMNS),
+    placeholders=", ".join("?" * len(_COLUMNS)),
+)
+
+
+def delay_minutes(scheduled: str, expected: str) -> Optional[int]:
+    """Return minutes late, 0 for on time, or None if unknown or not a time."""
+    if expected == "On time":
+        return 0
+    if not scheduled or not expected or expected in _UNKNOWN_DELAY:
+        return None
+    try:
+        sch_h, sch_m = map(int, scheduled.split(":"))
+        exp_h, exp_m = map(int, expected.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    diff = exp_h * 60 + exp_m - (sch_h * 60 + sch_m)
+    if diff < -720:  # More than 12 hours negative = next day
+        diff += 1440
+    return max(0, diff)
+
+
+def scheduled_datetime(scheduled: str, now: datetime) -> Optional[datetime]:
+    """Return the datetime of an HH:MM departure nearest to now."""
+    try:
+        hours, minutes = map(int, scheduled.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    when = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if when - now > timedelta(hours=12):
+        when -= timedelta(days=1)
+    elif now - when > timedelta(hours=12):
+        when += timedelta(days=1)
+    return when
+
+
+def _month_table(when: datetime) -> str:
+    """Return the partition table name for a departure time."""
+    return f"{_TABLE_PREFIX}{when:%Y%m}"
+
+
+def _uk_now() -> datetime:
+    """Return the current time in the UK."""
+    return datetime.now(_UK_TIMEZONE)
+
+
+def _month_index(day: date) -> int:
+    """Return a month number that can be compared and subtracted."""
+    return day.year * 12 + day.month - 1
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    """Return the q quantile (0-1) of a non-empty sorted list, interpolated."""
+    pos = q * (len(sorted_values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class DepartureHistory:
+    """Store of observed departures, one row per train per day, partitioned by month."""
+
+    def __init__(self, path: str, retention_months: int = DEFAULT_RETENTION_MONTHS):
+        """Open (creating if needed) the database at path."""
+        self.path = path
+        self.retention_months = retention_months
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._tables: set[str] = set()
+        self._pruned_on: Optional[date] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the settings every connection needs."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, station: str, services: list, now: Optional[datetime] = None) -> None:
+        """Queue a board's services to be stored; never blocks the caller."""
+        now = now or _uk_now()
+        rows = []
+        for service in services:
+            when = scheduled_datetime(service.scheduled_time, now)
+            if when is None or not service.service_id:
+                continue
+            cancelled = bool(service.is_cancelled)
+            rows.append((_month_table(when), (
+                station, service.service_id, int(when.timestamp()), service.scheduled_time,
+                service.expected_time,
+                None if cancelled else delay_minutes(service.scheduled_time, service.expected_time),
+                int(cancelled), service.status,
+                service.cancel_reason if cancelled else service.delay_reason,
+                service.operator, service.operator_code, service.destination,
+                service.destination_crs, service.platform,
+                int(now.timestamp()), int(now.timestamp()),
+            )))
+        if not rows:
+            return
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='history-writer',
+                                                daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait until queued boards have been written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        """Write queued boards in batches."""
+        conn = self._connect()
+        while True:
+            batches = [self._queue.get()]
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, [row for rows in batches for row in rows])
+            except sqlite3.Error as e:
+                _LOGGER.warning("Failed to write departure history: %s", str(e))
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+    def _write(self, conn: sqlite3.Connection, rows: list) -> None:
+        """Upsert rows into their month tables and apply retention once a day."""
+        by_table: dict[str, list] = {}
+        for table, values in rows:
+            by_table.setdefault(table, []).append(values)
+        with conn:
+            for table, values in by_table.items():
+                self._ensure_table(conn, table)
+                conn.executemany(_UPSERT.format(table=table), values)
+        self.written += len(rows)
+        today = _uk_now().date()
+        if self._pruned_on != today:
+            self._pruned_on = today
+            self.prune(conn, today)
+
+    def _ensure_table(self, conn: sqlite3.Connection, table: str) -> None:
+        """Create a month table and its indexes if it does not exist."""
+        if table in self._tables:
+            return
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                station TEXT NOT NULL,
+                service_id TEXT NOT NULL,
+                scheduled_ts INTEGER NOT NULL,
+                scheduled_time TEXT NOT NULL,
+                expected_time TEXT,
+                delay_minutes INTEGER,
+                cancelled INTEGER NOT NULL DEFAULT 0,
+                status TEXT,
+                reason TEXT,
+                operator TEXT,
+                operator_code TEXT,
+                destination TEXT,
+                destination_crs TEXT,
+                platform TEXT,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                PRIMARY KEY (station, scheduled_ts, service_id)
+            ) WITHOUT ROWID""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_operator "
+                     f"ON {table} (operator_code, scheduled_ts)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_scheduled "
+                     f"ON {table} (scheduled_ts)")
+        # Covers query() in train order, so statistics are grouped from the
+        # index alone without a sort
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_trains ON {table} "
+                     f"(station, scheduled_time, destination_crs, scheduled_ts, cancelled, "
+                     f"delay_minutes, destination, operator)")
+        self._tables.add(table)
+
+    def _month_tables(self, conn: sqlite3.Connection) -> list[str]:
+        """Return the existing month tables, oldest first."""
+        names = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+            (_TABLE_PREFIX + '%',),
+        ).fetchall()
+        return sorted(name for (name,) in names if name[len(_TABLE_PREFIX):].isdigit())
+
+    def prune(self, conn: Optional[sqlite3.Connection] = None,
+              today: Optional[date] = None) -> list[str]:
+        """Drop month tables older than the retention period; returns their names."""
+        own = conn is None
+        conn = conn or self._connect()
+        cutoff = _month_index(today or _uk_now().date()) - self.retention_months
+        dropped = []
+        try:
+            for table in self._month_tables(conn):
+                month = table[len(_TABLE_PREFIX):]
+                if int(month[:4]) * 12 + int(month[4:]) - 1 < cutoff:
+                    conn.execute(f"DROP TABLE {table}")
+                    self._tables.discard(table)
+                    dropped.append(table)
+            conn.commit()
+        finally:
+            if own:
+                conn.close()
+        if dropped:
+            _LOGGER.info("Dropped departure history for %s", ", ".join(dropped))
+        return dropped
+
+    def query(self, station: str, since: datetime, destination: Optional[str] = None) -> list:
+        """Return per-train partial aggregates for a station since a time.
+
+        One row per train and month table: (scheduled_time, destination_crs,
+        destination, operator, count, cancelled, delays), where delays is a
+        comma-separated string of the known delays of trains that ran.
+        """
+        conn = self._connect()
+        try:
+            first = _month_table(since)
+            tables = [t for t in self._month_tables(conn) if t >= first]
+            if not tables:
+                return []
+            where = "station = ? AND scheduled_ts >= ?"
+            params = [station, int(since.timestamp())]
+            if destination:
+                where += " AND destination_crs = ?"
+                params.append(destination)
+            # Grouping in SQLite along the _trains index keeps row traffic to
+            # one row per train per month
+            sql = " UNION ALL ".join(
+                f"SELECT scheduled_time, destination_crs, MAX(destination), MAX(operator), "
+                f"COUNT(*), SUM(cancelled), "
+                f"GROUP_CONCAT(CASE WHEN cancelled = 0 THEN delay_minutes END) "
+                f"FROM {table} WHERE {where} GROUP BY scheduled_time, destination_crs"
+                for table in tables
+            )
+            return conn.execute(sql, params * len(tables)).fetchall()
+        finally:
+            conn.close()
+
+    def stats(self, station: str, days: int = 30, destination: Optional[str] = None,
+              now: Optional[datetime] = None) -> dict:
+        """Return per-train punctuality over the last days for a station."""
+        started = time.perf_counter()
+        now = now or _uk_now()
+        trains = _merge(self.query(station, now - timedelta(days=days), destination))
+        stats = aggregate(trains)
+        return {
+            'station': station,
+            'days': days,
+            'destination': destination,
+            'services': sum(train['count'] for train in stats),
+            'trains': stats,
+            'query_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def info(self) -> dict:
+        """Return storage figures for diagnostics."""
+        return {
+            'path': os.path.abspath(self.path),
+            'retention_months': self.retention_months,
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+        }
+
+
+def _merge(rows: list) -> list[list]:
+    """Combine query() rows for the same train across month tables.
+
+    Returns [key, count, cancelled, [delay strings]] per train, sorted by
+    scheduled time and destination.
+    """
+    trains: dict[tuple, list] = {}
+    for scheduled_time, destination_crs, destination, operator, count, cancelled, delays in rows:
+        train = trains.get((scheduled_time, destination_crs))
+        if train is None:
+            train = trains[scheduled_time, destination_crs] = [
+                (scheduled_time, destination_crs, destination, operator), 0, 0, []
+            ]
+        train[1] += count
+        train[2] += cancelled
+        if delays:
+            train[3].append(delays)
+    return [trains[key] for key in sorted(trains)]
+
+
+def _train_dict(key: tuple, count: int, cancelled: int, known: int, p50, p90,
+                total: float, on_time: int) -> dict:
+    """Build the stats entry for one train."""
+    scheduled_time, destination_crs, destination, operator = key
+    return {
+        'scheduled_time': scheduled_time,
+        'destination': destination,
+        'destination_crs': destination_crs,
+        'operator': operator,
+        'count': count,
+        'cancelled': cancelled,
+        'cancellation_rate': round(cancelled / count, 3),
+        'p50_delay': round(p50, 1) if known else None,
+        'p90_delay': round(p90, 1) if known else None,
+        'avg_delay': round(total / known, 1) if known else None,
+        'on_time_rate': round(on_time / count, 3),
+    }
+
+
+def aggregate(trains: list) -> list[dict]:
+    """Compute per-train statistics from _merge() output."""
+    result = []
+    for key, count, cancelled, parts in trains:
+        delays = sorted(int(d) for part in parts for d in part.split(','))
+        known = len(delays)
+        result.append(_train_dict(
+            key, count, cancelled, known,
+            _percentile(delays, 0.5) if known else None,
+            _percentile(delays, 0.9) if known else None,
+            sum(delays), sum(1 for d in delays if d <= ON_TIME_MINUTES),
+        ))
+    return result
+
+
+def history_from_env() -> Optional[DepartureHistory]:
+    """Return the history store configured by HISTORY_DB, or None if unset."""
+    path = os.environ.get('HISTORY_DB', '')
+    if not path:
+        return None
+    return DepartureHistory(
+        path, int(os.environ.get('HISTORY_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS))
+    )
@@ -0,0 +1,407 @@
+"""
+Prometheus metrics for the standalone departure board
+
+A minimal, dependency-free implementation of the Prometheus text
+exposition format, plus the board freshness tracking used by /health.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upstream calls take tens of milliseconds to tens of seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Parsing and serialization are sub-millisecond to tens of milliseconds
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# Boards BoardFreshness forgets once nobody has asked for them this long
+BOARD_FORGET_SECONDS = 3600
+# Most boards BoardFreshness keeps; the least recently requested go first
+BOARD_MAX_TRACKED = 256
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, including the special float values."""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    """Format a label set as {a="1",b="2"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class for a metric family with optional labels."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """Initialize the metric."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        """Return the label values in declaration order."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        """Return the HELP and TYPE lines."""
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> list[str]:
+        """Return the exposition lines for this family."""
+        with self._lock:
+            samples = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in samples
+        ]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Add to the counter."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        """Initialize the histogram."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        """Return bucket, sum and count lines for every label set."""
+        with self._lock:
+            samples = sorted((key, (list(counts), total))
+                             for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """A counter or gauge whose values are read from a function at scrape time.
+
+    The function returns a number, or a dict of label value tuples to numbers.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 fn: Callable, labelnames: tuple = ()):
+        """Initialize the metric."""
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> list[str]:
+        """Call the function and return its samples."""
+        values = self._fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    """A set of metric families rendered together."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric family and return it."""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """Create and register a counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        """Create and register a gauge."""
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        """Create and register a histogram."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, fn: Callable,
+                 labelnames: tuple = ()) -> CallbackMetric:
+        """Create and register a metric read from fn at scrape time."""
+        return self.register(CallbackMetric(name, documentation, kind, fn, labelnames))
+
+    def render(self) -> str:
+        """Return every family in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class DarwinMetrics:
+    """Receives upstream timings and errors from DarwinApi."""
+
+    def __init__(self, registry: Registry):
+        """Create the Darwin metric families in registry."""
+        self.request_duration = registry.histogram(
+            'traintimes_darwin_request_duration_seconds',
+            'Darwin call latency including retries, by operation.',
+            ('operation',),
+        )
+        self.parse_duration = registry.histogram(
+            'traintimes_darwin_parse_duration_seconds',
+            'Time spent parsing Darwin responses.',
+            ('operation',), FAST_BUCKETS,
+        )
+        self.response_bytes = registry.counter(
+            'traintimes_darwin_response_bytes_total',
+            'Bytes received from Darwin, by operation.',
+            ('operation',),
+        )
+        self.errors = registry.counter(
+            'traintimes_darwin_errors_total',
+            'Failed Darwin calls by operation and error kind.',
+            ('operation', 'kind'),
+        )
+        self.retries = registry.counter(
+            'traintimes_darwin_retries_total',
+            'Darwin attempts retried after a transient error, by error kind.',
+            ('operation', 'kind'),
+        )
+
+    def observe_upstream(self, operation: str, station: str, seconds: float,
+                         size: int) -> None:
+        """Record a successful upstream call and its response size in bytes.
+
+        station comes from the request, so it is not a label: each value would
+        add a full set of buckets.
+        """
+        self.request_duration.observe(seconds, operation=operation)
+        self.response_bytes.inc(size, operation=operation)
+
+    def observe_parse(self, operation: str, seconds: float) -> None:
+        """Record the time taken to parse a response."""
+        self.parse_duration.observe(seconds, operation=operation)
+
+    def record_error(self, operation: str, kind: str, message: str) -> None:
+        """Record a call that failed."""
+        self.errors.inc(operation=operation, kind=kind)
+
+    def record_retry(self, operation: str, kind: str) -> None:
+        """Record an attempt that failed and will be retried."""
+        self.retries.inc(operation=operation, kind=kind)
+
+
+class BoardFreshness:
+    """Tracks when each station's live board was last fetched successfully.
+
+    A board is stale when its most recent fetch failed and its last good
+    data, or its first request if it never had any, is older than
+    stale_after seconds. Boards nobody has asked for within stale_after
+    seconds never go stale, so a failed request for a bad station code or
+    a screen station that has gone idle does not fail /health for good.
+    Boards not asked for within forget_after seconds are dropped, as are
+    the least recently requested beyond max_boards, since any client can
+    add one.
+    """
+
+    def __init__(self, stale_after: float, forget_after: float = BOARD_FORGET_SECONDS,
+                 max_boards: int = BOARD_MAX_TRACKED):
+        """Initialize the tracker."""
+        self.stale_after = stale_after
+        self.forget_after = max(forget_after, stale_after)
+        self.max_boards = max_boards
+        self._boards = {}
+        self._lock = threading.Lock()
+
+    def _board(self, station: str) -> dict:
+        """Return the state dict for a station, creating it if needed.
+
+        Every fetch is made for a request, so this also notes the request.
+        """
+        now = time.time()
+        board = self._boards.get(station)
+        if board is None:
+            self._forget(now)
+            board = self._boards[station] = {
+                'first_request': now,
+                'last_request': now,
+                'last_success': None,
+                'last_failure': None,
+                'last_error': None,
+                'failures': 0,
+            }
+        board['last_request'] = now
+        return board
+
+    def record_success(self, station: str) -> None:
+        """Note a successful live fetch."""
+        with self._lock:
+            board = self._board(station)
+            board['last_success'] = time.time()
+            board['failures'] = 0
+
+    def record_failure(self, station: str, error: str) -> None:
+        """Note a failed fetch (the board fell back to demo data)."""
+        with self._lock:
+            board = self._board(station)
+            board['last_failure'] = time.time()
+            board['last_error'] = error
+            board['failures'] += 1
+
+    def ages(self) -> dict:
+        """Return seconds since each requested station's last good data, keyed by (station,)."""
+        now = time.time()
+        with self._lock:
+            return {
+                (station,): self._age(board, now)
+                for station, board in self._boards.items()
+                if self._requested(board, now)
+            }
+
+    def stats(self) -> dict:
+        """Return the state of every board, with an age and stale flag."""
+        now = time.time()
+        with self._lock:
+            boards = {station: dict(board) for station, board in self._boards.items()}
+        for board in boards.values():
+            age = self._age(board, now)
+            board['age_seconds'] = round(age, 1)
+            board['stale'] = self._requested(board, now) and self._is_stale(board, age)
+            for key in ('first_request', 'last_request', 'last_success', 'last_failure'):
+                if board[key] is not None:
+                    board[key] = datetime.fromtimestamp(board[key]).isoformat(timespec='seconds')
+        return boards
+
+    def stale_boards(self) -> list[str]:
+        """Return the stations whose boards are stale."""
+        return [station for station, board in self.stats().items() if board['stale']]
+
+    def _forget(self, now: float) -> None:
+        """Make room for a new board by dropping idle and least recently requested ones."""
+        for station in [station for station, board in self._boards.items()
+                        if now - board['last_request'] > self.forget_after]:
+            del self._boards[station]
+        excess = len(self._boards) - self.max_boards + 1
+        if excess > 0:
+            by_request = sorted(self._boards, key=lambda s: self._boards[s]['last_request'])
+            for station in by_request[:excess]:
+                del self._boards[station]
+
+    @staticmethod
+    def _age(board: dict, now: float) -> float:
+        """Return seconds since a board's last good data or, failing that, its first request."""
+        return now - (board['last_success'] or board['first_request'])
+
+    def _requested(self, board: dict, now: float) -> bool:
+        """Return True if a board was asked for within stale_after seconds."""
+        return now - board['last_request'] <= self.stale_after
+
+    def _is_stale(self, board: dict, age: float) -> bool:
+        """Return True if the last fetch failed and good data is too old."""
+        failed_last = board['last_failure'] is not None and (
+            board['last_success'] is None or board['last_failure'] > board['last_success']
+        )
+        return failed_last and age > self.stale_after
+
+
+def timed(histogram: Histogram, **labels):
+    """Context manager that observes the elapsed time into histogram."""
+    return _Timer(histogram, labels)
+
+
+class _Timer:
+    """Context manager behind timed()."""
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        """Initialize the timer."""
+        self._histogram = histogram
+        self._labels = labels
+        self._started: Optional[float] = None
+
+    def __enter__(self):
+        """Start timing."""
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        """Observe the elapsed time."""
+        self._histogram.observe(time.perf_counter() - self._started, **self._labels)
+        return False
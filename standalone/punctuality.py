@@ -0,0 +1,457 @@
+"""
+Rolling punctuality counters per route for the standalone departure board
+
+A route is a (station, destination CRS, scheduled time) triple, which
+identifies the same timetabled train from day to day. Each route keeps one
+bucket per day for the last 30 days in fixed-size arrays, so memory does not
+grow with history and the 7 and 30 day figures are a sum over at most 30
+buckets. Buckets are filled incrementally from each board refresh: a service
+is counted once, with its last seen state, when it leaves the board after
+its departure time.
+
+Configuration (environment):
+    PUNCTUALITY_FILE           JSON file the counters are saved to and
+                               restored from (default: memory only)
+    PUNCTUALITY_SAVE_INTERVAL  minimum seconds between saves (default 300)
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional
+
+# A departure within this many minutes of schedule counts as on time, as in
+# the public performance measure for commuter services
+ON_TIME_MINUTES = 5
+WINDOW_DAYS = (7, 30)
+BUCKET_DAYS = max(WINDOW_DAYS)
+
+# Slots in each bucket: runs, on time, cancelled, late, unknown delay,
+# known delay total and worst delay in minutes
+_RUNS, _ON_TIME, _CANCELLED, _LATE, _UNKNOWN, _DELAY_TOTAL, _MAX_DELAY = range(7)
+_FIELDS = 7
+_COUNTER_MAX = 65535  # array('H')
+
+# A service that vanishes more than this long before its departure time has
+# probably just fallen off the end of the board, so it is not counted yet
+_DEPARTED_GRACE = timedelta(minutes=2)
+# Pending services not seen again for this long are dropped uncounted
+_PENDING_TTL = timedelta(hours=3)
+_RECENT_FINALIZED = 4096
+
+STORAGE_VERSION = 1
+DEFAULT_SAVE_INTERVAL = 300  # seconds
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _minutes(value: str) -> Optional[int]:
+    """Return minutes past midnight for an HH:MM time, or None."""
+    try:
+        hours, minutes = map(int, value.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    return hours * 60 + minutes
+
+
+def _delay(scheduled: str, expected: str) -> Optional[int]:
+    """Return minutes late, 0 for on time, or None if unknown."""
+    if expected == "On time":
+        return 0
+    sch, exp = _minutes(scheduled), _minutes(expected)
+    if sch is None or exp is None:
+        return None
+    diff = exp - sch
+    if diff < -720:  # More than 12 hours negative = next day
+        diff += 1440
+    return max(0, diff)
+
+
+def _scheduled_datetime(scheduled: str, now: datetime) -> Optional[datetime]:
+    """Return the datetime of an HH:MM departure nearest to now."""
+    minutes = _minutes(scheduled)
+    if minutes is None or not 0 <= minutes < 1440:
+        return None
+    when = now.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+    if when - now > timedelta(hours=12):
+        when -= timedelta(days=1)
+    elif now - when > timedelta(hours=12):
+        when += timedelta(days=1)
+    return when
+
+
+class RouteCounters:
+    """Daily outcome buckets for one route over the last BUCKET_DAYS days."""
+
+    __slots__ = ("days", "counts")
+
+    def __init__(self) -> None:
+        """Initialize empty buckets."""
+        # Day ordinal held in each slot, 0 for an unused slot
+        self.days = array("l", bytes(BUCKET_DAYS * array("l").itemsize))
+        self.counts = array("H", bytes(BUCKET_DAYS * _FIELDS * 2))
+
+    def add(self, day: int, cancelled: bool, delay: Optional[int]) -> None:
+        """Count one departure on the given day ordinal."""
+        slot = day % BUCKET_DAYS
+        base = slot * _FIELDS
+        counts = self.counts
+        if self.days[slot] != day:
+            # Reuse the bucket of the day that fell out of the window
+            self.days[slot] = day
+            counts[base:base + _FIELDS] = array("H", bytes(_FIELDS * 2))
+        counts[base + _RUNS] = min(counts[base + _RUNS] + 1, _COUNTER_MAX)
+        if cancelled:
+            field = _CANCELLED
+        elif delay is None:
+            field = _UNKNOWN
+        else:
+            field = _ON_TIME if delay <= ON_TIME_MINUTES else _LATE
+            counts[base + _DELAY_TOTAL] = min(counts[base + _DELAY_TOTAL] + delay, _COUNTER_MAX)
+            counts[base + _MAX_DELAY] = max(counts[base + _MAX_DELAY], min(delay, _COUNTER_MAX))
+        counts[base + field] = min(counts[base + field] + 1, _COUNTER_MAX)
+
+    def add_counters(self, other: "RouteCounters") -> None:
+        """Add every bucket of other into this one."""
+        for slot, day in enumerate(other.days):
+            if not day:
+                continue
+            base = slot * _FIELDS
+            if self.days[slot] < day:
+                self.days[slot] = day
+                self.counts[base:base + _FIELDS] = other.counts[base:base + _FIELDS]
+            elif self.days[slot] == day:
+                for field in range(_FIELDS):
+                    if field == _MAX_DELAY:
+                        value = max(self.counts[base + field], other.counts[base + field])
+                    else:
+                        value = self.counts[base + field] + other.counts[base + field]
+                    self.counts[base + field] = min(value, _COUNTER_MAX)
+
+    def last_day(self) -> int:
+        """Return the newest day ordinal with a count, or 0."""
+        return max(self.days)
+
+    def window(self, today: int, days: int) -> dict[str, Any]:
+        """Return totals for the days days ending with today."""
+        totals = [0] * _FIELDS
+        first = today - days + 1
+        for slot, day in enumerate(self.days):
+            if first <= day <= today:
+                base = slot * _FIELDS
+                for field in range(_MAX_DELAY):
+                    totals[field] += self.counts[base + field]
+                totals[_MAX_DELAY] = max(totals[_MAX_DELAY], self.counts[base + _MAX_DELAY])
+        return _summary(totals)
+
+
+def _summary(totals: list[int]) -> dict[str, Any]:
+    """Return the public form of a window's totals."""
+    runs = totals[_RUNS]
+    known = totals[_ON_TIME] + totals[_LATE]
+    return {
+        "runs": runs,
+        "on_time": totals[_ON_TIME],
+        "late": totals[_LATE],
+        "cancelled": totals[_CANCELLED],
+        "unknown": totals[_UNKNOWN],
+        # Cancellations count against punctuality
+        "punctuality": round(100 * totals[_ON_TIME] / runs, 1) if runs else None,
+        "average_delay": round(totals[_DELAY_TOTAL] / known, 1) if known else None,
+        "max_delay": totals[_MAX_DELAY] if known else None,
+    }
+
+
+class _Pending:
+    """The last seen state of a service still on, or just off, the board."""
+
+    __slots__ = ("route", "day", "departs", "cancelled", "delay", "seen")
+
+    def __init__(self, route: tuple, day: int) -> None:
+        """Initialize the pending entry."""
+        self.route = route
+        self.day = day
+        self.departs: Optional[datetime] = None
+        self.cancelled = False
+        self.delay: Optional[int] = None
+        self.seen: Optional[datetime] = None
+
+
+class PunctualityTracker:
+    """Keeps rolling punctuality for every route seen on observed boards."""
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        self._routes: dict[tuple, RouteCounters] = {}
+        self._stations: dict[str, RouteCounters] = {}
+        self._pending: dict[str, _Pending] = {}
+        self._finalized: set[str] = set()
+        self._finalized_order: deque[str] = deque()
+        self._pruned_day = 0
+        self._lock = threading.Lock()
+
+    def observe(self, station_crs: str, services: Iterable, now: datetime) -> int:
+        """Update from one fetched board; returns the number of services counted.
+
+        Services are TrainService objects from a single station's board.
+        """
+        station = station_crs.upper()
+        on_board = set()
+        with self._lock:
+            for service in services:
+                service_id = service.service_id
+                if not service_id or service_id in self._finalized:
+                    continue
+                pending = self._pending.get(service_id)
+                if pending is None:
+                    scheduled = _scheduled_datetime(service.scheduled_time, now)
+                    if scheduled is None:
+                        continue
+                    route = (station, service.destination_crs.upper(), service.scheduled_time)
+                    pending = self._pending[service_id] = _Pending(route, scheduled.toordinal())
+                    pending.departs = scheduled
+                on_board.add(service_id)
+                pending.seen = now
+                pending.cancelled = service.is_cancelled
+                pending.delay = _delay(service.scheduled_time, service.expected_time)
+                if pending.delay:
+                    pending.departs = _scheduled_datetime(service.expected_time, now) or pending.departs
+
+            counted = 0
+            for service_id, pending in list(self._pending.items()):
+                if pending.route[0] != station or service_id in on_board:
+                    continue
+                if pending.departs - _DEPARTED_GRACE <= pending.seen:
+                    # Last seen around its departure time and now gone
+                    self._count(pending)
+                    self._mark_finalized(service_id)
+                    counted += 1
+                elif now - pending.seen > _PENDING_TTL:
+                    del self._pending[service_id]
+
+            today = now.toordinal()
+            if self._pruned_day != today:
+                self._prune(today)
+            return counted
+
+    def _count(self, pending: _Pending) -> None:
+        """Add a departed service to its route and station counters."""
+        route = pending.route
+        counters = self._routes.get(route)
+        if counters is None:
+            counters = self._routes[route] = RouteCounters()
+        counters.add(pending.day, pending.cancelled, pending.delay)
+        station = self._stations.get(route[0])
+        if station is None:
+            station = self._stations[route[0]] = RouteCounters()
+        station.add(pending.day, pending.cancelled, pending.delay)
+
+    def _mark_finalized(self, service_id: str) -> None:
+        """Remember a counted service so a reappearance is not counted twice."""
+        del self._pending[service_id]
+        self._finalized.add(service_id)
+        self._finalized_order.append(service_id)
+        if len(self._finalized_order) > _RECENT_FINALIZED:
+            self._finalized.discard(self._finalized_order.popleft())
+
+    def _prune(self, today: int) -> None:
+        """Drop routes and stations with nothing inside the longest window."""
+        oldest = today - BUCKET_DAYS
+        for table in (self._routes, self._stations):
+            for key in [key for key, counters in table.items() if counters.last_day() <= oldest]:
+                del table[key]
+        self._pruned_day = today
+
+    def route_stats(
+        self, station_crs: str, destination_crs: str, scheduled_time: str,
+        now: Optional[datetime] = None,
+    ) -> Optional[dict[str, Any]]:
+        """Return the 7 and 30 day figures for one route, or None if unseen."""
+        counters = self._routes.get(
+            (station_crs.upper(), (destination_crs or "").upper(), scheduled_time)
+        )
+        if counters is None:
+            return None
+        return _windows(counters, (now or datetime.now()).toordinal())
+
+    def punctuality(
+        self, station_crs: str, destination_crs: str, scheduled_time: str,
+        days: int, now: Optional[datetime] = None,
+    ) -> Optional[float]:
+        """Return the on time percentage of one route over days days."""
+        stats = self.route_stats(station_crs, destination_crs, scheduled_time, now)
+        return stats[f"{days}d"]["punctuality"] if stats else None
+
+    def station_stats(
+        self, station_crs: str, now: Optional[datetime] = None
+    ) -> Optional[dict[str, Any]]:
+        """Return the 7 and 30 day totals over every route of a station."""
+        counters = self._stations.get(station_crs.upper())
+        if counters is None:
+            return None
+        return _windows(counters, (now or datetime.now()).toordinal())
+
+    def stats(
+        self, station_crs: str, destination_crs: Optional[str] = None,
+        now: Optional[datetime] = None,
+    ) -> dict[str, Any]:
+        """Return station totals and per-route figures for a station."""
+        station = station_crs.upper()
+        destination = destination_crs.upper() if destination_crs else None
+        today = (now or datetime.now()).toordinal()
+        with self._lock:
+            routes = sorted(
+                (key, counters) for key, counters in self._routes.items()
+                if key[0] == station and (destination is None or key[1] == destination)
+            )
+            station_counters = self._stations.get(station)
+            totals = (
+                _windows(station_counters, today)
+                if destination is None and station_counters is not None
+                else None
+            )
+            result = {
+                "station_crs": station,
+                "destination_crs": destination,
+                "on_time_minutes": ON_TIME_MINUTES,
+                "routes": [
+                    {"destination_crs": key[1], "scheduled_time": key[2],
+                     **_windows(counters, today)}
+                    for key, counters in routes
+                ],
+            }
+        if totals is None:
+            combined = RouteCounters()
+            for _, counters in routes:
+                combined.add_counters(counters)
+            totals = _windows(combined, today)
+        result["totals"] = totals
+        return result
+
+    def info(self) -> dict[str, Any]:
+        """Return the tracker's size."""
+        return {
+            "routes": len(self._routes),
+            "stations": sorted(self._stations),
+            "pending": len(self._pending),
+            "bytes": sum(
+                c.days.itemsize * len(c.days) + c.counts.itemsize * len(c.counts)
+                for table in (self._routes, self._stations) for c in table.values()
+            ),
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters in a JSON serializable form for storage."""
+        with self._lock:
+            return {
+                "version": STORAGE_VERSION,
+                "routes": [
+                    [*key, counters.days.tolist(), counters.counts.tolist()]
+                    for key, counters in self._routes.items()
+                ],
+            }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict[str, Any]]) -> "PunctualityTracker":
+        """Rebuild a tracker from as_dict output."""
+        tracker = cls()
+        tracker.restore(data)
+        return tracker
+
+    def restore(self, data: Optional[dict[str, Any]]) -> None:
+        """Load counters from as_dict output, skipping malformed routes."""
+        if not data or data.get("version") != STORAGE_VERSION:
+            return
+        for row in data.get("routes", []):
+            try:
+                station, destination, scheduled, days, counts = row
+                if len(days) != BUCKET_DAYS or len(counts) != BUCKET_DAYS * _FIELDS:
+                    continue
+                counters = RouteCounters()
+                counters.days = array("l", days)
+                counters.counts = array("H", counts)
+            except (TypeError, ValueError, OverflowError):
+                continue
+            self._routes[(station, destination, scheduled)] = counters
+            station_counters = self._stations.get(station)
+            if station_counters is None:
+                station_counters = self._stations[station] = RouteCounters()
+            station_counters.add_counters(counters)
+
+
+def _windows(counters: RouteCounters, today: int) -> dict[str, Any]:
+    """Return every rolling window of a route keyed like "7d"."""
+    return {f"{days}d": counters.window(today, days) for days in WINDOW_DAYS}
+
+
+class PersistentPunctualityTracker(PunctualityTracker):
+    """A tracker that saves itself to a JSON file after counting departures."""
+
+    def __init__(self, path: str, save_interval: float = DEFAULT_SAVE_INTERVAL):
+        """Initialize the tracker."""
+        super().__init__()
+        self.path = path
+        self.save_interval = save_interval
+        self._saved = time.monotonic()
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: str, save_interval: float = DEFAULT_SAVE_INTERVAL
+             ) -> "PersistentPunctualityTracker":
+        """Restore a tracker from path, starting empty if it is missing or unreadable."""
+        try:
+            with open(path, encoding="utf-8") as source:
+                data = json.load(source)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Ignoring unreadable punctuality file %s: %s", path, str(e))
+            data = None
+        tracker = cls(path, save_interval)
+        tracker.restore(data)
+        return tracker
+
+    def observe(self, station_crs: str, services: Iterable, now: datetime) -> int:
+        """Update from one fetched board, saving if anything was counted."""
+        counted = super().observe(station_crs, services, now)
+        if counted:
+            self._dirty = True
+            if time.monotonic() - self._saved >= self.save_interval:
+                self.save()
+        return counted
+
+    def save(self) -> None:
+        """Write the counters to the file, replacing it atomically.
+
+        Does nothing until a departure has been counted, so a preloading
+        gunicorn master never overwrites the file its workers saved.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._saved = time.monotonic()
+        temp = f"{self.path}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as out:
+                json.dump(self.as_dict(), out, separators=(",", ":"))
+            os.replace(temp, self.path)
+        except OSError as e:
+            _LOGGER.warning("Failed to save punctuality counters: %s", str(e))
+
+
+def punctuality_from_env() -> PunctualityTracker:
+    """Build the tracker configured by the PUNCTUALITY_* environment variables."""
+    path = os.environ.get("PUNCTUALITY_FILE", "")
+    if not path:
+        return PunctualityTracker()
+    tracker = PersistentPunctualityTracker.load(
+        path, float(os.environ.get("PUNCTUALITY_SAVE_INTERVAL", DEFAULT_SAVE_INTERVAL))
+    )
+    atexit.register(tracker.save)
+    return tracker
@@ -5,11 +5,26 @@
  * for the departure board display.
  */
 
+// Never refresh sooner than this, whatever the server suggests (ms)
+const MIN_REFRESH = 5000;
+// Longest wait between retries while the server is unhealthy (ms)
+const MAX_BACKOFF = 300000;
+// Where the service worker keeps saved boards (templates/sw.js)
+const BOARD_CACHE = 'traintimes-boards';
+// Trains leave the board this long after their expected time (ms)
+const DEPARTED_GRACE = 60000;
+// Recent server clock readings kept for skew correction
+const CLOCK_SAMPLES = 10;
+
 class DepartureBoard {
   constructor(options = {}) {
     this.stationCrs = options.stationCrs || 'PAD';
+    // A configured screen (multi-screen mode) fixes station, filter and rows
+    this.screenId = options.screenId || '';
+    // Used until the server sends a next_refresh hint
     this.refreshInterval = options.refreshInterval || 30000; // 30 seconds
     this.numDepartures = options.numDepartures || 6;
+    this.boardElement = document.querySelector('.departure-board');
     this.container = document.getElementById('departures-container');
     this.clockElement = document.getElementById('clock');
     this.dateElement = document.getElementById('date');
@@ -17,22 +32,43 @@ class DepartureBoard {
     this.stationNameElement = document.getElementById('station-name');
 
     this.departures = [];
+    // Rendered rows by service ID; see patchDepartures()
+    this.rows = new Map();
+    this.renderFrame = null;
     this.isLoading = false;
     this.error = null;
 
+    // Refreshes are chained: the next one is scheduled when a fetch finishes
+    this.refreshTimer = null;
+    this.refreshDue = 0;
+    this.refetch = false;
+    this.failures = 0;
+
+    // Server clock minus ours (ms), from the boards' server_time
+    this.clockSamples = [];
+    this.clockOffset = 0;
+
     this.init();
   }
 
   init() {
-    // Start clock
+    // Start clock; countdowns and order follow it between polls
     this.updateClock();
-    setInterval(() => this.updateClock(), 1000);
+    setInterval(() => {
+      this.updateClock();
+      this.tick();
+    }, 1000);
+
+    // Paint the board embedded in the page, then bring it up to date
+    this.showEmbeddedBoard();
 
-    // Initial fetch
+    // Initial fetch; later ones are scheduled by scheduleRefresh()
     this.fetchDepartures();
+    this.showSavedBoard();
+    this.registerServiceWorker();
 
-    // Set up auto-refresh
-    setInterval(() => this.fetchDepartures(), this.refreshInterval);
+    // Hidden tabs stop polling and catch up when shown again
+    document.addEventListener('visibilitychange', () => this.onVisibilityChange());
 
     // Set up station selector if present
     const stationSelect = document.getElementById('station-select');
@@ -46,7 +82,7 @@ class DepartureBoard {
   }
 
   updateClock() {
-    const now = new Date();
+    const now = new Date(this.serverNow());
 
     if (this.clockElement) {
       this.clockElement.textContent = now.toLocaleTimeString('en-GB', {
@@ -85,38 +121,190 @@ class DepartureBoard {
   }
 
   async fetchDepartures() {
-    if (this.isLoading) return;
+    clearTimeout(this.refreshTimer);
+    this.refreshTimer = null;
+    if (this.isLoading) {
+      // Fetch again as soon as the current request finishes
+      this.refetch = true;
+      return;
+    }
 
     this.isLoading = true;
     this.showLoading();
+    let healthy = false;
+    let hint = null;
 
     try {
-      const url = `/api/departures?station=${this.stationCrs}&num=${this.numDepartures}`;
-      const response = await fetch(url);
+      const sent = Date.now();
+      const response = await fetch(this.boardUrl());
       const data = await response.json();
+      hint = this.refreshHint(response, data);
+      this.recordServerTime(data.server_time, sent);
 
       if (data.error) {
         this.showError(data.error);
         return;
       }
 
-      this.departures = data.departures;
-      this.renderDepartures();
-
-      if (this.stationNameElement) {
-        this.stationNameElement.textContent = data.station_name;
-      }
-
-      if (this.lastUpdatedElement) {
-        this.lastUpdatedElement.textContent = `Last updated: ${data.time}`;
-      }
+      // The service worker's saved board, served while the network is down
+      const stale = response.headers.get('X-Board-Stale') === '1';
+      this.showBoard(data, stale);
 
       this.error = null;
+      // A demo board standing in for Darwin counts as a failure for backoff
+      healthy = response.ok && !data.api_error && !stale;
     } catch (error) {
       console.error('Failed to fetch departures:', error);
       this.showError('Failed to connect to departure service');
     } finally {
       this.isLoading = false;
+      this.failures = healthy ? 0 : this.failures + 1;
+      if (this.refetch) {
+        this.refetch = false;
+        this.fetchDepartures();
+      } else {
+        this.scheduleRefresh(this.nextDelay(hint));
+      }
+    }
+  }
+
+  boardUrl() {
+    return this.screenId
+      ? `/api/screens/${encodeURIComponent(this.screenId)}`
+      : `/api/departures?station=${this.stationCrs}&num=${this.numDepartures}`;
+  }
+
+  showBoard(data, stale) {
+    this.departures = data.departures;
+    this.renderDepartures();
+
+    if (this.stationNameElement) {
+      this.stationNameElement.textContent = data.station_name;
+    }
+
+    if (this.boardElement) {
+      this.boardElement.classList.toggle('stale', stale);
+    }
+
+    if (this.lastUpdatedElement) {
+      this.lastUpdatedElement.textContent = stale
+        ? `Offline - showing board from ${data.time}`
+        : `Last updated: ${data.time}`;
+    }
+  }
+
+  showEmbeddedBoard() {
+    const embedded = document.getElementById('board-data');
+    if (!embedded) return;
+    try {
+      const data = JSON.parse(embedded.textContent);
+      // A page served from the offline cache may carry an old board
+      const age = Date.now() - Date.parse(data.server_time || data.last_updated);
+      this.showBoard(data, age > 2 * this.refreshInterval);
+    } catch (error) {
+      console.error('Failed to read embedded board:', error);
+    }
+  }
+
+  recordServerTime(serverTime, sent) {
+    const server = Date.parse(serverTime);
+    if (Number.isNaN(server)) return;
+    // A reading can only be late (network, caches, a shared screen board),
+    // which makes the server look behind, so the largest recent one wins
+    this.clockSamples.push(server - (sent + Date.now()) / 2);
+    if (this.clockSamples.length > CLOCK_SAMPLES) {
+      this.clockSamples.shift();
+    }
+    this.clockOffset = Math.max(...this.clockSamples);
+  }
+
+  serverNow() {
+    return Date.now() + this.clockOffset;
+  }
+
+  departsAt(departure) {
+    // Trains without an expected time ("Delayed") keep their scheduled place
+    return Date.parse(departure.expected_at || departure.scheduled_at);
+  }
+
+  tick() {
+    // Boards from older servers have no timestamps to count down from
+    if (this.departures.length === 0 ||
+        this.departures.some(dep => Number.isNaN(this.departsAt(dep)))) {
+      return;
+    }
+    const now = this.serverNow();
+    this.departures = this.departures
+      .filter(dep => !dep.expected_at || this.departsAt(dep) >= now - DEPARTED_GRACE)
+      .sort((a, b) => this.departsAt(a) - this.departsAt(b));
+    // Only countdowns that changed are written
+    this.renderDepartures();
+  }
+
+  countdownText(departure) {
+    if (departure.is_cancelled || !departure.expected_at) return '';
+    const minutes = Math.floor((this.departsAt(departure) - this.serverNow()) / 60000);
+    return minutes < 1 ? 'Due' : `${minutes} min`;
+  }
+
+  async showSavedBoard() {
+    // Paint the last saved board straight away; the live fetch replaces it
+    if (!('caches' in window)) return;
+    try {
+      const saved = await caches.match(this.boardUrl(), { cacheName: BOARD_CACHE });
+      if (saved && this.isLoading && this.departures.length === 0) {
+        this.showBoard(await saved.json(), true);
+      }
+    } catch (error) {
+      // No saved board to show
+    }
+  }
+
+  registerServiceWorker() {
+    // Browsers only allow service workers over HTTPS and on localhost
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.register('/sw.js').catch((error) => {
+      console.error('Failed to register service worker:', error);
+    });
+  }
+
+  refreshHint(response, data) {
+    // The server says when its board will next change: next_refresh in the
+    // body, or Cache-Control max-age where the body is shared
+    let seconds = data.next_refresh;
+    if (typeof seconds !== 'number') {
+      const match = /max-age=(\d+)/.exec(response.headers.get('Cache-Control') || '');
+      seconds = match ? Number(match[1]) : null;
+    }
+    return seconds == null ? null : Math.max(MIN_REFRESH, seconds * 1000);
+  }
+
+  nextDelay(hint) {
+    if (this.failures === 0) {
+      // Up to 10% late, so boards started together (after a power cut,
+      // say) drift apart instead of polling in lockstep
+      return (hint ?? this.refreshInterval) * (1 + Math.random() * 0.1);
+    }
+    // Exponential backoff with jitter, never sooner than the server asked
+    const ceiling = Math.min(MAX_BACKOFF, this.refreshInterval * 2 ** (this.failures - 1));
+    return Math.max(hint ?? MIN_REFRESH, ceiling / 2 + Math.random() * ceiling / 2);
+  }
+
+  scheduleRefresh(delay) {
+    clearTimeout(this.refreshTimer);
+    this.refreshDue = Date.now() + delay;
+    // While hidden no timer runs; onVisibilityChange() picks up the due time
+    this.refreshTimer = document.hidden
+      ? null
+      : setTimeout(() => this.fetchDepartures(), delay);
+  }
+
+  onVisibilityChange() {
+    if (document.hidden) {
+      clearTimeout(this.refreshTimer);
+      this.refreshTimer = null;
+    } else if (!this.isLoading) {
+      this.scheduleRefresh(Math.max(0, this.refreshDue - Date.now()));
     }
   }
 
@@ -125,73 +313,156 @@ class DepartureBoard {
 
     // Only show loading on initial load
     if (this.departures.length === 0) {
-      this.container.innerHTML = `
-        <div class="loading">
-          Loading departures<span class="loading-dots"></span>
-        </div>
-      `;
+      this.showMessage('loading', 'Loading departures<span class="loading-dots"></span>');
     }
   }
 
   showError(message) {
     if (!this.container) return;
 
-    this.container.innerHTML = `
-      <div class="error-message">
-        <strong>Error:</strong> ${this.escapeHtml(message)}
-      </div>
-    `;
+    this.showMessage('error-message', `<strong>Error:</strong> ${this.escapeHtml(message)}`);
+  }
+
+  showMessage(className, html) {
+    // Replaces the rows; the next board is rendered from scratch
+    cancelAnimationFrame(this.renderFrame);
+    this.renderFrame = null;
+    this.rows.clear();
+    this.container.innerHTML = `<div class="${className}">${html}</div>`;
   }
 
   renderDepartures() {
     if (!this.container) return;
 
+    // Coalesce updates into one DOM write per frame
+    if (this.renderFrame == null) {
+      this.renderFrame = requestAnimationFrame(() => {
+        this.renderFrame = null;
+        this.patchDepartures();
+      });
+    }
+  }
+
+  patchDepartures() {
     if (this.departures.length === 0) {
-      this.container.innerHTML = `
-        <div class="no-departures">
-          No departures currently scheduled
-        </div>
-      `;
+      this.showMessage('no-departures', 'No departures currently scheduled');
       return;
     }
 
-    const html = this.departures.map((dep, index) => this.renderDepartureRow(dep, index)).join('');
-    this.container.innerHTML = html;
+    // Rows are keyed by service so an unchanged train keeps its DOM nodes
+    // (and its calling points animation); only changed cells are written
+    const keys = this.departures.map(
+      dep => dep.service_id || `${dep.scheduled_time} ${dep.destination}`);
+    const wanted = new Set(keys);
+    this.rows.forEach((row, key) => {
+      if (!wanted.has(key)) {
+        row.element.remove();
+        this.rows.delete(key);
+      }
+    });
 
-    // Start calling points animations
-    this.animateCallingPoints();
-  }
+    let previous = null;
+    this.departures.forEach((departure, index) => {
+      const key = keys[index];
+      let row = this.rows.get(key);
+      if (!row) {
+        row = this.createDepartureRow();
+        this.rows.set(key, row);
+      }
+      this.updateDepartureRow(row, departure, index);
 
-  renderDepartureRow(departure, index) {
-    const statusClass = this.getStatusClass(departure.status, departure.is_cancelled);
-    const expectedText = departure.is_cancelled ? 'Cancelled' : departure.expected_time;
-    const callingPoints = departure.calling_points || [];
-    const callingPointsText = callingPoints.map(cp => cp.station).join('  •  ');
+      const next = previous ? previous.nextSibling : this.container.firstChild;
+      if (next !== row.element) {
+        this.container.insertBefore(row.element, next);
+      }
+      previous = row.element;
+    });
 
-    const cancelledClass = departure.is_cancelled ? 'cancelled' : '';
-    const reason = departure.cancel_reason || departure.delay_reason || '';
+    // Anything left after the rows is an old message
+    while (previous.nextSibling) {
+      previous.nextSibling.remove();
+    }
+  }
 
-    return `
-      <div class="departure-row ${cancelledClass}" data-time="${departure.scheduled_time}">
-        <div class="time">${departure.scheduled_time}</div>
-        <div class="destination-col">
-          <div class="destination">${this.escapeHtml(departure.destination)}</div>
-          <div class="operator">${this.escapeHtml(departure.operator)}</div>
-          ${callingPointsText ? `
-            <div class="calling-points-container">
-              <span class="calling-points ${index === 0 ? 'scrolling' : ''}" data-text="${this.escapeHtml(callingPointsText)}">
-                <span class="calling-label">Calling at: </span>${this.escapeHtml(callingPointsText)}
-              </span>
-            </div>
-          ` : ''}
-        </div>
-        <div class="platform">${departure.platform}</div>
-        <div class="expected ${statusClass}">
-          ${expectedText}
-          ${reason ? `<div class="reason">${this.escapeHtml(reason)}</div>` : ''}
+  createDepartureRow() {
+    const element = document.createElement('div');
+    element.className = 'departure-row';
+    element.innerHTML = `
+      <div class="time-col">
+        <div class="time"></div>
+        <div class="countdown"></div>
+      </div>
+      <div class="destination-col">
+        <div class="destination"></div>
+        <div class="operator"></div>
+        <div class="calling-points-container" hidden>
+          <span class="calling-points"><span class="calling-label">Calling at: </span><span class="calling-text"></span></span>
         </div>
       </div>
+      <div class="platform"></div>
+      <div class="expected"><span class="expected-text"></span><div class="reason" hidden></div></div>
     `;
+    const cell = (selector) => element.querySelector(selector);
+    return {
+      element,
+      values: {},
+      time: cell('.time'),
+      countdown: cell('.countdown'),
+      destination: cell('.destination'),
+      operator: cell('.operator'),
+      callingContainer: cell('.calling-points-container'),
+      callingPoints: cell('.calling-points'),
+      callingText: cell('.calling-text'),
+      platform: cell('.platform'),
+      expected: cell('.expected'),
+      expectedText: cell('.expected-text'),
+      reason: cell('.reason')
+    };
+  }
+
+  updateDepartureRow(row, departure, index) {
+    const callingPoints = departure.calling_points || [];
+    const callingPointsText = callingPoints.map(cp => cp.station).join('  •  ');
+    const reason = departure.cancel_reason || departure.delay_reason || '';
+
+    // Only the first departure scrolls its calling points, and only long lists
+    const scrolling = index === 0 && callingPointsText.length > 50;
+
+    const set = (name, value, apply) => {
+      if (row.values[name] !== value) {
+        row.values[name] = value;
+        apply(value);
+      }
+    };
+    set('cancelled', departure.is_cancelled,
+        value => row.element.classList.toggle('cancelled', Boolean(value)));
+    set('time', departure.scheduled_time, value => {
+      row.time.textContent = value;
+      // Narrow screens show the time from this attribute
+      row.element.dataset.time = value;
+    });
+    set('countdown', this.countdownText(departure), value => { row.countdown.textContent = value; });
+    set('destination', departure.destination, value => { row.destination.textContent = value; });
+    set('operator', departure.operator, value => { row.operator.textContent = value; });
+    set('platform', departure.platform, value => { row.platform.textContent = value; });
+    set('callingPoints', callingPointsText, value => {
+      row.callingText.textContent = value;
+      row.callingContainer.hidden = !value;
+    });
+    set('scrolling', scrolling, value => {
+      row.callingPoints.classList.toggle('scrolling', value);
+      row.callingPoints.style.animationDuration = value
+        ? `${Math.max(15, callingPointsText.length / 5)}s`
+        : '';
+    });
+    set('status', this.getStatusClass(departure.status, departure.is_cancelled),
+        value => { row.expected.className = `expected ${value}`; });
+    set('expected', departure.is_cancelled ? 'Cancelled' : departure.expected_time,
+        value => { row.expectedText.textContent = value; });
+    set('reason', reason, value => {
+      row.reason.textContent = value;
+      row.reason.hidden = !value;
+    });
   }
 
   getStatusClass(status, isCancelled) {
@@ -207,21 +478,6 @@ class DepartureBoard {
     }
   }
 
-  animateCallingPoints() {
-    // The first departure has scrolling calling points
-    const scrollingElements = this.container.querySelectorAll('.calling-points.scrolling');
-    scrollingElements.forEach(el => {
-      const text = el.getAttribute('data-text');
-      if (text && text.length > 50) {
-        // Long text gets animation
-        el.style.animationDuration = `${Math.max(15, text.length / 5)}s`;
-      } else {
-        // Short text doesn't scroll
-        el.classList.remove('scrolling');
-      }
-    });
-  }
-
   escapeHtml(text) {
     if (!text) return '';
     const div = document.createElement('div');
@@ -240,7 +496,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
   window.departureBoard = new DepartureBoard({
     stationCrs: stationCrs,
+    screenId: boardElement?.dataset.screen || '',
     refreshInterval: 30000,
-    numDepartures: 6
+    numDepartures: Number(boardElement?.dataset.num) || 6
   });
 });
@@ -0,0 +1,142 @@
+/**
+ * UK Train Departure Board - Service Worker
+ *
+ * Keeps the board usable on flaky Wi-Fi:
+ *   - fingerprinted assets (assets/) never change, so once cached they
+ *     are served from the cache alone
+ *   - board pages and unversioned static files are served from the cache
+ *     straight away and refreshed in the background (stale-while-revalidate)
+ *   - board data goes to the network first; if it fails or is slow the
+ *     last saved board is served, marked with an X-Board-Stale header, and
+ *     the network answer still updates the cache when it arrives
+ *
+ * Served at /sw.js by app.py, which fills in the version and asset list.
+ */
+
+const VERSION = {{ version|tojson }};
+const STATIC_CACHE = `traintimes-static-${VERSION}`;
+const BOARD_CACHE = 'traintimes-boards';
+// Relative to this script, so the add-on works under Home Assistant ingress
+const PRECACHE = {{ precache|tojson }};
+// Serve the saved board once the network has taken this long (ms)
+const NETWORK_TIMEOUT = 4000;
+// Saved boards kept, oldest dropped first
+const MAX_BOARDS = 20;
+
+const SCOPE_PATH = new URL(self.registration.scope).pathname;
+const BOARD_API = /^api\/(departures|screens\/[^/]+)$/;
+const BOARD_PAGE = /^(screen\/[^/]+)?$/;
+
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(STATIC_CACHE)
+      .then(cache => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', (event) => {
+  // Drop the assets of previous versions; saved boards are kept
+  event.waitUntil(
+    caches.keys()
+      .then(names => Promise.all(names
+        .filter(name => name.startsWith('traintimes-static-') && name !== STATIC_CACHE)
+        .map(name => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin ||
+      !url.pathname.startsWith(SCOPE_PATH)) {
+    return;
+  }
+
+  const path = url.pathname.slice(SCOPE_PATH.length);
+  if (BOARD_API.test(path)) {
+    event.respondWith(networkFirst(event));
+  } else if (path.startsWith('assets/')) {
+    event.respondWith(cacheFirst(event));
+  } else if (path.startsWith('static/') ||
+             (request.mode === 'navigate' && BOARD_PAGE.test(path))) {
+    event.respondWith(staleWhileRevalidate(event));
+  }
+});
+
+function cacheable(response) {
+  // Fallback boards are sent no-store and must not replace a real one
+  return response.ok && !/no-store/.test(response.headers.get('Cache-Control') || '');
+}
+
+async function cacheFirst(event) {
+  const cache = await caches.open(STATIC_CACHE);
+  const cached = await cache.match(event.request);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(event.request);
+  if (cacheable(response)) {
+    await cache.put(event.request, response.clone());
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(STATIC_CACHE);
+  const cached = await cache.match(event.request);
+  const network = fetch(event.request).then((response) => {
+    if (cacheable(response)) {
+      return cache.put(event.request, response.clone()).then(() => response);
+    }
+    return response;
+  });
+  if (!cached) {
+    return network;
+  }
+  event.waitUntil(network.catch(() => {}));
+  return cached;
+}
+
+async function networkFirst(event) {
+  const cache = await caches.open(BOARD_CACHE);
+  const network = fetch(event.request).then(async (response) => {
+    if (cacheable(response)) {
+      await cache.put(event.request, response.clone());
+      trim(cache);
+    }
+    return response;
+  });
+  // Let a slow answer finish and refresh the saved board
+  event.waitUntil(network.catch(() => {}));
+
+  let timer;
+  const timeout = new Promise((resolve, reject) => {
+    timer = setTimeout(() => reject(new Error('timeout')), NETWORK_TIMEOUT);
+  });
+  try {
+    return await Promise.race([network, timeout]);
+  } catch (error) {
+    const cached = await cache.match(event.request);
+    // Nothing saved yet: keep waiting for the network after all
+    return cached ? markStale(cached) : network;
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+function markStale(response) {
+  const headers = new Headers(response.headers);
+  headers.set('X-Board-Stale', '1');
+  return new Response(response.body, {
+    status: response.status,
+    statusText: response.statusText,
+    headers
+  });
+}
+
+async function trim(cache) {
+  const keys = await cache.keys();
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - MAX_BOARDS)).map(key => cache.delete(key)));
+}
@@ -48,6 +48,10 @@ if [ -f "$CONFIG_FILE" ]; then
         export STATION_CRS=$(python3 -c "import yaml; print(yaml.safe_load(open('$CONFIG_FILE'))['station_crs'])" 2>/dev/null || echo "PAD")
         export NUM_DEPARTURES=$(python3 -c "import yaml; print(yaml.safe_load(open('$CONFIG_FILE')).get('num_departures', 6))" 2>/dev/null || echo "6")
         export DESTINATION_CRS=$(python3 -c "import yaml; print(yaml.safe_load(open('$CONFIG_FILE')).get('destination_crs', ''))" 2>/dev/null || echo "")
+        # A screens list in config.yaml turns on multi-screen mode
+        if python3 -c "import yaml, sys; sys.exit(0 if yaml.safe_load(open('$CONFIG_FILE')).get('screens') else 1)" 2>/dev/null; then
+            export SCREENS_FILE="$CONFIG_FILE"
+        fi
     fi
 else
     echo -e "${YELLOW}⚠️  No config.yaml found. Using environment variables.${NC}"
@@ -100,7 +104,12 @@ echo -e "${GREEN}✓ Dependencies OK${NC}"
 echo ""
 echo "Starting server on port $PORT..."
 cd "$SCRIPT_DIR/standalone"
-python3 app.py > "$LOG_FILE" 2>&1 &
+# Prefer gunicorn (settings in standalone/gunicorn.conf.py), else Flask's server
+if command -v gunicorn > /dev/null 2>&1; then
+    gunicorn app:app > "$LOG_FILE" 2>&1 &
+else
+    python3 app.py > "$LOG_FILE" 2>&1 &
+fi
 SERVER_PID=$!
 echo $SERVER_PID > "$PID_FILE"
 
@@ -0,0 +1,23 @@
+"""
+Shared setup for the standalone board's tests
+
+The standalone modules import each other by bare name, as they do when
+app.py is run from standalone/, so that directory goes on sys.path.
+
+Run with:
+    python3 -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'standalone'))
+
+
+@pytest.fixture
+def board_xml() -> str:
+    """Return a recorded GetDepBoardWithDetails response for 20 services."""
+    return (ROOT / 'benchmarks' / 'fixtures' / 'pad_with_details_20.xml').read_text(encoding='utf-8')
@@ -0,0 +1,96 @@
+"""Tests for the Darwin circuit breaker."""
+
+import threading
+
+import pytest
+
+from darwin_api import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN,
+    CircuitBreaker, CircuitOpenError, DarwinApi,
+)
+
+
+def _opened(reset_timeout: float) -> CircuitBreaker:
+    """Return a breaker that has just opened."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    return breaker
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.admit() == (True, False)
+    breaker.record_failure()
+    assert breaker.admit() == (False, False)
+    assert breaker.stats()['times_opened'] == 1
+    assert breaker.stats()['rejected_calls'] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+def test_only_one_concurrent_caller_is_the_probe():
+    for _ in range(50):
+        breaker = _opened(reset_timeout=0)
+        barrier = threading.Barrier(16)
+        results = []
+
+        def admit():
+            barrier.wait()
+            results.append(breaker.admit())
+
+        threads = [threading.Thread(target=admit) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results.count((True, True)) == 1
+        assert results.count((False, False)) == 15
+        assert breaker.state == CIRCUIT_HALF_OPEN
+
+
+def test_probe_result_closes_or_reopens():
+    breaker = _opened(reset_timeout=0)
+    assert breaker.admit() == (True, True)
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.stats()['times_opened'] == 2
+
+    assert breaker.admit() == (True, True)
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.admit() == (True, False)
+
+
+def test_post_releases_the_probe_on_unexpected_errors():
+    api = DarwinApi('test')
+    api._breaker = _opened(reset_timeout=0)
+
+    def explode(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    api._post_hedged = explode
+    with pytest.raises(RuntimeError):
+        api._post('GetDepartureBoard', '<soap/>')
+
+    # Still half-open, but the next caller gets to probe
+    assert api._breaker.state == CIRCUIT_HALF_OPEN
+    assert api._breaker.admit() == (True, True)
+
+
+def test_post_fails_fast_while_open():
+    api = DarwinApi('test')
+    api._breaker = _opened(reset_timeout=60)
+    api._post_hedged = lambda *args, **kwargs: pytest.fail('called Darwin while open')
+    with pytest.raises(CircuitOpenError):
+        api._post('GetDepartureBoard', '<soap/>')
@@ -0,0 +1,154 @@
+"""Tests for hedged requests and the end-to-end attempt deadline."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import darwin_api
+from darwin_api import ERROR_TIMEOUT, DarwinApi, DarwinApiError, LatencyHistogram
+
+BODY = b'<ok/>' * 200
+
+
+def _hedging_api(monkeypatch, slots: int) -> DarwinApi:
+    """Return a hedging client whose hedge_after is HEDGE_MIN_DELAY, with slots workers free."""
+    monkeypatch.setattr(darwin_api, '_hedge_slots', threading.BoundedSemaphore(slots))
+    api = DarwinApi('test', hedge=True)
+    api._latency = LatencyHistogram()
+    for _ in range(darwin_api.HEDGE_MIN_SAMPLES):
+        api._latency.observe(0.01)
+    return api
+
+
+def _all_slots_free(slots: int) -> bool:
+    """Return whether every hedge slot can be taken, handing them back after."""
+    taken = 0
+    while taken < slots and darwin_api._hedge_slots.acquire(timeout=2):
+        taken += 1
+    for _ in range(taken):
+        darwin_api._hedge_slots.release()
+    return taken == slots
+
+
+def test_slow_first_attempt_is_hedged(monkeypatch):
+    api = _hedging_api(monkeypatch, slots=4)
+    release = threading.Event()
+    calls = []
+
+    def post_once(soap_action, soap_request, read_timeout):
+        calls.append(read_timeout)
+        if len(calls) == 1:
+            release.wait(5)
+            return 'first'
+        return 'second'
+
+    api._post_once = post_once
+    assert api._post_hedged('GetDepartureBoard', '<soap/>', 10) == 'second'
+    assert len(calls) == 2
+    # The hedge only gets what is left of the attempt's time
+    assert calls[1] == pytest.approx(10 - darwin_api.HEDGE_MIN_DELAY)
+    assert (api._latency.hedges_sent, api._latency.hedges_won) == (1, 1)
+
+    release.set()
+    assert _all_slots_free(4)
+
+
+def test_saturated_pool_sends_without_a_hedge(monkeypatch):
+    api = _hedging_api(monkeypatch, slots=0)
+    threads = []
+
+    def post_once(soap_action, soap_request, read_timeout):
+        threads.append(threading.current_thread())
+        return 'answer'
+
+    api._post_once = post_once
+    assert api._post_hedged('GetDepartureBoard', '<soap/>', 10) == 'answer'
+    assert threads == [threading.current_thread()]
+    assert api._latency.hedges_sent == 0
+
+
+def test_no_slot_for_the_hedge_waits_for_the_first(monkeypatch):
+    api = _hedging_api(monkeypatch, slots=1)
+    calls = []
+
+    def post_once(soap_action, soap_request, read_timeout):
+        calls.append(read_timeout)
+        time.sleep(darwin_api.HEDGE_MIN_DELAY * 2)
+        return 'first'
+
+    api._post_once = post_once
+    assert api._post_hedged('GetDepartureBoard', '<soap/>', 10) == 'first'
+    assert len(calls) == 1
+    assert api._latency.hedges_sent == 0
+    assert _all_slots_free(1)
+
+
+def test_hedge_counters_are_exact_under_contention():
+    histogram = LatencyHistogram()
+    barrier = threading.Barrier(8)
+
+    def count():
+        barrier.wait()
+        for _ in range(5000):
+            histogram.record_hedge()
+            histogram.record_hedge_won()
+
+    threads = [threading.Thread(target=count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (histogram.hedges_sent, histogram.hedges_won) == (40000, 40000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers /fast at once and trickles /slow for several seconds."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        if self.path == '/fast':
+            self.wfile.write(BODY)
+            return
+        try:
+            # Every byte arrives well inside the socket read timeout
+            for i in range(len(BODY) // 20):
+                self.wfile.write(BODY[i * 20:(i + 1) * 20])
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_send_reads_the_whole_body(server):
+    api = DarwinApi('test', endpoint=f'{server}/fast')
+    assert api._send('GetDepartureBoard', '<soap/>', 5) == BODY.decode()
+
+
+def test_send_stops_a_trickling_body_at_the_deadline(server):
+    api = DarwinApi('test', endpoint=f'{server}/slow')
+    started = time.monotonic()
+    with pytest.raises(DarwinApiError) as excinfo:
+        api._send('GetDepartureBoard', '<soap/>', 1)
+    assert time.monotonic() - started < 2
+    assert excinfo.value.kind == ERROR_TIMEOUT
+    assert excinfo.value.transient
@@ -0,0 +1,98 @@
+"""Tests for the month-partitioned departure history store."""
+
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import history
+from history import DepartureHistory
+
+UK = ZoneInfo('Europe/London')
+
+
+def _service(service_id: str, scheduled: str, expected: str = 'On time',
+             cancelled: bool = False, destination_crs: str = 'RDG') -> SimpleNamespace:
+    """Return the fields of a TrainService that history stores."""
+    return SimpleNamespace(
+        service_id=service_id, scheduled_time=scheduled, expected_time=expected,
+        is_cancelled=cancelled, status='Cancelled' if cancelled else 'On time',
+        cancel_reason='Fault' if cancelled else None, delay_reason=None,
+        operator='GWR', operator_code='GW', destination='Reading',
+        destination_crs=destination_crs, platform='1',
+    )
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Return a store whose idea of now can be set through store.now."""
+    store = DepartureHistory(str(tmp_path / 'history.db'), retention_months=2)
+    store.now = datetime(2026, 2, 1, 12, 0, tzinfo=UK)
+    monkeypatch.setattr(history, '_uk_now', lambda: store.now)
+    return store
+
+
+def _record(store: DepartureHistory, now: datetime, *services) -> None:
+    """Record a board as seen at now and wait for it to be written."""
+    store.now = now
+    store.record('PAD', list(services), now=now)
+    store.flush()
+
+
+def _tables(store: DepartureHistory) -> list[str]:
+    """Return the month tables in the store."""
+    with closing(sqlite3.connect(store.path)) as conn:
+        return store._month_tables(conn)
+
+
+def test_rows_go_to_the_month_of_their_departure(store):
+    # Just before midnight at the end of January, a 00:10 departure is in February
+    _record(store, datetime(2026, 1, 31, 23, 50, tzinfo=UK),
+            _service('A', '23:45'), _service('B', '00:10'))
+    assert _tables(store) == ['departures_202601', 'departures_202602']
+    assert store.written == 2
+
+
+def test_repeated_polls_keep_one_row_with_the_latest_state(store):
+    first = datetime(2026, 2, 1, 7, 50, tzinfo=UK)
+    _record(store, first, _service('A', '08:00'))
+    _record(store, datetime(2026, 2, 1, 8, 5, tzinfo=UK), _service('A', '08:00', '08:07'))
+
+    with closing(sqlite3.connect(store.path)) as conn:
+        rows = conn.execute('SELECT expected_time, delay_minutes, first_seen '
+                            'FROM departures_202602').fetchall()
+    assert rows == [('08:07', 7, int(first.timestamp()))]
+
+
+def test_stats_combine_a_train_across_months(store):
+    _record(store, datetime(2026, 1, 31, 7, 55, tzinfo=UK), _service('A', '08:00', '08:10'))
+    _record(store, datetime(2026, 2, 1, 7, 55, tzinfo=UK), _service('B', '08:00', 'On time'))
+    _record(store, datetime(2026, 2, 2, 7, 55, tzinfo=UK), _service('C', '08:00', cancelled=True))
+
+    stats = store.stats('PAD', days=30, now=datetime(2026, 2, 3, 12, 0, tzinfo=UK))
+    train, = stats['trains']
+    assert stats['services'] == 3
+    assert (train['count'], train['cancelled']) == (3, 1)
+    assert (train['p50_delay'], train['avg_delay']) == (5.0, 5.0)
+    assert train['on_time_rate'] == round(1 / 3, 3)
+
+
+def test_prune_drops_whole_months_past_retention(store):
+    for month in (10, 11, 12):
+        _record(store, datetime(2025, month, 15, 7, 55, tzinfo=UK), _service('A', '08:00'))
+    assert store.prune(today=date(2026, 2, 1)) == ['departures_202510', 'departures_202511']
+    assert _tables(store) == ['departures_202512']
+
+    # The writer re-creates a dropped month if a late row for it arrives
+    _record(store, datetime(2025, 11, 30, 7, 55, tzinfo=UK), _service('B', '08:00'))
+    assert 'departures_202511' in _tables(store)
+
+
+def test_writer_prunes_when_the_day_changes(store):
+    _record(store, datetime(2025, 11, 15, 7, 55, tzinfo=UK), _service('A', '08:00'))
+    assert _tables(store) == ['departures_202511']
+    _record(store, datetime(2026, 2, 1, 7, 55, tzinfo=UK), _service('B', '08:00'))
+    assert _tables(store) == ['departures_202602']
@@ -0,0 +1,105 @@
+"""Tests for calling points kept as raw XML until first read."""
+
+import threading
+from functools import partial
+
+import darwin_api
+from darwin_api import NS, DarwinApi, LazyCallingPoints
+
+
+def _services(api, xml_text):
+    """Parse a response and return its services."""
+    return api._parse_response(xml_text)
+
+
+def test_lazy_matches_eager_decoding(board_xml):
+    api = DarwinApi('test')
+    lazy = _services(api, board_xml)
+    # Parsing the element tree directly decodes every list eagerly
+    root = api._parse_root(board_xml)
+    eager = [api._parse_service(elem) for elem in root.findall('.//lt8:service', NS)]
+
+    assert all(isinstance(s.calling_points, LazyCallingPoints) for s in lazy)
+    assert not any(s.calling_points.is_materialized for s in lazy)
+    assert [list(s.calling_points) for s in lazy] == [s.calling_points for s in eager]
+
+
+def test_concurrent_first_reads_decode_once():
+    calls = []
+    started = threading.Event()
+
+    def decode(raw):
+        calls.append(raw)
+        started.wait(1)
+        return [raw]
+
+    for _ in range(50):
+        calls.clear()
+        started.clear()
+        points = LazyCallingPoints('<x/>', decode)
+        barrier = threading.Barrier(8)
+        results, errors = [], []
+
+        def read():
+            barrier.wait()
+            try:
+                results.append(list(points))
+            except Exception as e:  # Any exception here is the race
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert len(calls) == 1
+        assert results == [['<x/>']] * 8
+
+
+def _board(declarations: str, prefix: str) -> str:
+    """Return a one-service board whose calling points use prefix."""
+    p = f'{prefix}:' if prefix else ''
+    return f'''<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"{declarations}>
+<soap:Body><lt8:GetDepBoardWithDetailsResponse><lt8:trainServices><lt8:service>
+<lt4:serviceID>S1</lt4:serviceID><lt4:std>10:00</lt4:std>
+<{p}subsequentCallingPoints><{p}callingPointList><{p}callingPoint>
+<{p}locationName>Reading</{p}locationName><{p}crs>RDG</{p}crs><{p}st>10:25</{p}st>
+</{p}callingPoint></{p}callingPointList></{p}subsequentCallingPoints>
+</lt8:service></lt8:trainServices></lt8:GetDepBoardWithDetailsResponse></soap:Body>
+</soap:Envelope>'''
+
+
+_LT = f' xmlns:lt8="{NS["lt8"]}" xmlns:lt4="{NS["lt4"]}"'
+
+
+def test_default_namespace_slices_decode():
+    xml_text = _board(_LT + f' xmlns="{NS["lt8"]}"', '')
+    service, = DarwinApi('test')._parse_response(xml_text)
+    assert isinstance(service.calling_points, LazyCallingPoints)
+    assert [cp.crs for cp in service.calling_points] == ['RDG']
+
+
+def test_single_quoted_declarations_decode():
+    xml_text = _board(_LT.replace(f'"{NS["lt8"]}"', f"'{NS['lt8']}'"), 'lt8')
+    service, = DarwinApi('test')._parse_response(xml_text)
+    assert [cp.crs for cp in service.calling_points] == ['RDG']
+
+
+def test_redeclared_prefix_is_parsed_eagerly():
+    xml_text = _board(_LT + f' xmlns:x="{NS["lt8"]}"', 'x').replace(
+        '<lt8:trainServices>', '<lt8:trainServices xmlns:x="urn:other">')
+    cut, slices, _ = darwin_api._cut_calling_points(xml_text)
+    assert cut == xml_text and slices == []
+    service, = DarwinApi('test')._parse_response(xml_text)
+    # x: is urn:other where the list sits, so it holds no Darwin calling points
+    assert service.calling_points == []
+
+
+def test_unparseable_slice_decodes_to_nothing(caplog):
+    api = DarwinApi('test')
+    points = LazyCallingPoints('<y:callingPoint/>', partial(api._decode_calling_points, ''))
+    assert len(points) == 0
+    assert 'Failed to decode calling points' in caplog.text
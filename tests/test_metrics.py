@@ -0,0 +1,140 @@
+"""Tests for the Prometheus text exposition and board freshness tracking."""
+
+import math
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from metrics import BoardFreshness, Registry
+
+
+def test_counter_and_gauge_exposition():
+    registry = Registry()
+    requests = registry.counter('app_requests_total', 'Requests served.', ('route', 'status'))
+    in_flight = registry.gauge('app_in_flight', 'Requests in progress.')
+    requests.inc(route='/api', status='200')
+    requests.inc(2, route='/api', status='200')
+    requests.inc(route='/', status='500')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render() == (
+        '# HELP app_requests_total Requests served.\n'
+        '# TYPE app_requests_total counter\n'
+        'app_requests_total{route="/",status="500"} 1\n'
+        'app_requests_total{route="/api",status="200"} 3\n'
+        '# HELP app_in_flight Requests in progress.\n'
+        '# TYPE app_in_flight gauge\n'
+        'app_in_flight 1\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    duration = registry.histogram('op_seconds', 'Operation time.', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        duration.observe(value, op='parse')
+
+    assert registry.render().splitlines() == [
+        '# HELP op_seconds Operation time.',
+        '# TYPE op_seconds histogram',
+        'op_seconds_bucket{op="parse",le="0.1"} 2',
+        'op_seconds_bucket{op="parse",le="1"} 3',
+        'op_seconds_bucket{op="parse",le="+Inf"} 4',
+        'op_seconds_sum{op="parse"} 3.65',
+        'op_seconds_count{op="parse"} 4',
+    ]
+
+
+def test_label_values_and_special_floats_are_escaped():
+    registry = Registry()
+    registry.callback('odd', 'Odd values.', 'gauge', lambda: {
+        ('a"b',): math.inf,
+        ('c\\d\ne',): math.nan,
+        ('f',): -math.inf,
+    }, ('name',))
+
+    assert registry.render().splitlines()[2:] == [
+        'odd{name="a\\"b"} +Inf',
+        'odd{name="c\\\\d\\ne"} NaN',
+        'odd{name="f"} -Inf',
+    ]
+
+
+def test_labels_must_match_the_declaration():
+    counter = Registry().counter('c_total', 'C.', ('kind',))
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(kind='x', extra='y')
+
+
+def test_concurrent_updates_are_not_lost():
+    registry = Registry()
+    counter = registry.counter('c_total', 'C.', ('kind',))
+    histogram = registry.histogram('h_seconds', 'H.', buckets=(1.0,))
+    barrier = threading.Barrier(8)
+
+    def update():
+        barrier.wait()
+        for _ in range(2000):
+            counter.inc(kind='a')
+            histogram.observe(0.5)
+
+    threads = [threading.Thread(target=update) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rendered = registry.render()
+    assert 'c_total{kind="a"} 16000\n' in rendered
+    assert 'h_seconds_bucket{le="1"} 16000\n' in rendered
+    assert 'h_seconds_count 16000\n' in rendered
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the time BoardFreshness sees with a settable one."""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(metrics, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_board_goes_stale_only_while_requested(clock):
+    freshness = BoardFreshness(stale_after=60)
+    freshness.record_success('PAD')
+    clock.value += 30
+    freshness.record_failure('PAD', 'timeout')
+    assert freshness.stale_boards() == []
+
+    clock.value += 31
+    freshness.record_failure('PAD', 'timeout')
+    assert freshness.stale_boards() == ['PAD']
+
+    # Nobody has asked for it since
+    clock.value += 61
+    assert freshness.stale_boards() == []
+    assert freshness.ages() == {}
+
+
+def test_idle_boards_are_forgotten(clock):
+    freshness = BoardFreshness(stale_after=60, forget_after=600)
+    freshness.record_failure('XYZ', 'unknown station')
+    clock.value += 601
+    freshness.record_success('PAD')
+    assert set(freshness.stats()) == {'PAD'}
+
+
+def test_least_recently_requested_boards_are_dropped(clock):
+    freshness = BoardFreshness(stale_after=60, max_boards=3)
+    for station in ('AAA', 'BBB', 'CCC'):
+        freshness.record_success(station)
+        clock.value += 1
+    freshness.record_success('AAA')
+    clock.value += 1
+    freshness.record_success('DDD')
+    assert set(freshness.stats()) == {'AAA', 'CCC', 'DDD'}
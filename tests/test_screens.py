@@ -0,0 +1,133 @@
+"""Tests for the screen registry and the shared per-station poller."""
+
+import threading
+import time
+
+import pytest
+
+from screens import Screen, ScreenHub, parse_screens
+
+SCREENS = {
+    'concourse': Screen('concourse', 'PAD', (), 10),
+    'platform-1': Screen('platform-1', 'PAD', ('RDG', 'OXF'), 3),
+    'platform-2': Screen('platform-2', 'PAD', ('RDG',), 2),
+    'kings-cross': Screen('kings-cross', 'KGX', (), 6),
+}
+
+
+def test_parse_screens():
+    screens = parse_screens({'screens': [
+        {'id': 'pad', 'station': 'pad', 'destination': 'rdg, oxf', 'num': '3'},
+        {'id': 'kgx', 'station': 'KGX', 'destination': ['YRK'], 'name': 'North'},
+    ]})
+    assert screens == {
+        'pad': Screen('pad', 'PAD', ('RDG', 'OXF'), 3),
+        'kgx': Screen('kgx', 'KGX', ('YRK',), 6, 'North'),
+    }
+
+
+@pytest.mark.parametrize('entry, message', [
+    ({'id': 'a b', 'station': 'PAD'}, 'id must be'),
+    ({'id': 'a', 'station': 'ZZZZ'}, 'unknown station'),
+    ({'id': 'a', 'station': 'PAD', 'destination': 'RDG,??'}, 'unknown destination'),
+    ({'id': 'a', 'station': 'PAD', 'num': 'ten'}, 'num must be a number'),
+    ({'id': 'a', 'station': 'PAD', 'num': 21}, 'between 1 and 20'),
+])
+def test_parse_screens_rejects_bad_entries(entry, message):
+    with pytest.raises(ValueError, match=message):
+        parse_screens([entry])
+
+
+def test_parse_screens_rejects_duplicate_ids():
+    with pytest.raises(ValueError, match='duplicate id'):
+        parse_screens([{'id': 'a', 'station': 'PAD'}, {'id': 'a', 'station': 'KGX'}])
+
+
+class Refresher:
+    """A refresh function that counts its calls and can be made to fail."""
+
+    def __init__(self, delay: float = 0.0):
+        """Answer each poll after delay seconds."""
+        self.delay = delay
+        self.error = None
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, station, screens):
+        """Return a view per screen tagged with the poll number."""
+        with self._lock:
+            self.calls.append(station)
+            poll = len(self.calls)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {screen.id: (screen.station, screen.num, poll) for screen in screens}
+
+
+def _station(hub: ScreenHub, station: str) -> dict:
+    """Return one station's entry from the hub's stats."""
+    return next(s for s in hub.stats()['stations'] if s['station'] == station)
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    """Poll until condition() is true, failing after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_screens_on_a_station_share_one_poll():
+    refresh = Refresher(delay=0.2)
+    hub = ScreenHub(SCREENS, refresh, interval=60)
+    barrier = threading.Barrier(16)
+    results = {}
+
+    def view(screen_id):
+        barrier.wait()
+        results.setdefault(screen_id, []).append(hub.view(screen_id, timeout=5))
+
+    threads = [threading.Thread(target=view, args=(screen_id,))
+               for screen_id in SCREENS for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(refresh.calls) == ['KGX', 'PAD']
+    for screen_id, screen in SCREENS.items():
+        view, error = results[screen_id][0]
+        assert view[:2] == (screen.station, screen.num) and error is None
+        assert len(set(results[screen_id])) == 1
+
+
+def test_failed_poll_keeps_the_last_views():
+    refresh = Refresher()
+    hub = ScreenHub(SCREENS, refresh, interval=0.05)
+    first, _ = hub.view('concourse', timeout=5)
+
+    refresh.error = RuntimeError('Darwin down')
+    _wait_for(lambda: _station(hub, 'PAD')['failures'] > 0)
+    view, error = hub.view('concourse', timeout=5)
+    assert view == first
+    assert error == 'Darwin down'
+
+    refresh.error = None
+    _wait_for(lambda: hub.view('concourse', timeout=5)[1] is None)
+    assert hub.view('concourse', timeout=5)[0] != first
+
+
+def test_idle_stations_stop_polling():
+    refresh = Refresher()
+    hub = ScreenHub(SCREENS, refresh, interval=0.02, idle=0.1)
+    hub.view('kings-cross', timeout=5)
+    time.sleep(0.3)
+    polls = len(refresh.calls)
+    time.sleep(0.3)
+    assert len(refresh.calls) == polls
+    assert refresh.calls and set(refresh.calls) == {'KGX'}
+    assert hub.stats()['active_stations'] == 0
+
+    # Asking again polls straight away rather than waiting for the schedule
+    view, _ = hub.view('kings-cross', timeout=5)
+    assert view[2] > polls
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Build the bundled station list (stations.csv) from an open data export
+
+Accepts either of:
+    NaPTAN RailReferences.csv  columns CrsCode and StationName, from
+                               https://beta-naptan.dft.gov.uk/download
+    National Rail station list columns "Station Name" and "CRS Code"
+
+and writes "CRS,Name" rows, sorted by code, marked "# complete" so unknown
+CRS codes are rejected before they reach Darwin. By default every copy of
+stations.csv in the repository is rewritten.
+
+Usage:
+    python3 tools/build_station_index.py RailReferences.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUTS = [
+    os.path.join(ROOT, 'standalone', 'stations.csv'),
+    os.path.join(ROOT, 'custom_components', 'uk_train_departures', 'stations.csv'),
+    os.path.join(ROOT, 'traintimes-addon', 'stations.csv'),
+    os.path.join(ROOT, 'traintimes-addon', 'custom_components', 'uk_train_departures',
+                 'stations.csv'),
+]
+
+_CODE_COLUMNS = ('CrsCode', 'CRS Code', 'CRS')
+_NAME_COLUMNS = ('StationName', 'Station Name', 'Name')
+# NaPTAN names carry a suffix National Rail does not use
+_SUFFIX = re.compile(r'\s+(Rail|Railway)\s+Station$', re.IGNORECASE)
+
+
+def read_stations(path: str) -> dict[str, str]:
+    """Return station names by CRS code from a NaPTAN or National Rail CSV."""
+    with open(path, encoding='utf-8-sig', newline='') as source:
+        reader = csv.DictReader(source)
+        fields = reader.fieldnames or []
+        code_column = next((c for c in _CODE_COLUMNS if c in fields), None)
+        name_column = next((c for c in _NAME_COLUMNS if c in fields), None)
+        if code_column is None or name_column is None:
+            raise SystemExit(f"{path}: expected a CRS code and a station name column, got {fields}")
+        stations = {}
+        for row in reader:
+            code = (row[code_column] or '').strip().upper()
+            name = _SUFFIX.sub('', (row[name_column] or '').strip()).replace(',', ' ')
+            if re.fullmatch(r'[A-Z]{3}', code) and name:
+                # The first name wins where a station has several entries
+                stations.setdefault(code, name)
+    return stations
+
+
+def write_stations(stations: dict[str, str], path: str, source: str) -> None:
+    """Write stations as a complete "CRS,Name" file."""
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write("# UK stations by CRS code: CRS,Name\n")
+        out.write(f"# Built by tools/build_station_index.py from {os.path.basename(source)}\n")
+        out.write("# complete\n")
+        for code in sorted(stations):
+            out.write(f"{code},{stations[code]}\n")
+
+
+def main() -> None:
+    """Build stations.csv from the given export."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('source', help='RailReferences.csv or a National Rail station list')
+    parser.add_argument('--output', action='append',
+                        help='file to write (repeatable; default: every bundled copy)')
+    args = parser.parse_args()
+
+    stations = read_stations(args.source)
+    if len(stations) < 2000:
+        print(f"Warning: only {len(stations)} stations found; is this the full export?",
+              file=sys.stderr)
+    for path in args.output or OUTPUTS:
+        write_stations(stations, path, args.source)
+        print(f"Wrote {len(stations)} stations to {os.path.relpath(path, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
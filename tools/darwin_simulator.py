@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+Local Darwin OpenLDBWS simulator
+
+A small SOAP server that answers GetDepBoardWithDetails, GetDepartureBoard
+and GetServiceDetails with synthetic but well-formed ldb12 responses, so
+both DarwinApi clients can be load and integration tested without a real
+token or National Rail's rate limits.
+
+Usage:
+    python3 tools/darwin_simulator.py --port 8081 --services 20 --latency-ms 150
+    DARWIN_ENDPOINT=http://localhost:8081/OpenLDBWS/ldb12.asmx python3 standalone/app.py
+
+GET /stats returns per-operation call counters as JSON; POST /stats/reset
+clears them.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from xml.sax.saxutils import escape
+
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+LDB_NS = 'http://thalesgroup.com/RTTI/2021-11-01/ldb/'
+TOKEN_NS = 'http://thalesgroup.com/RTTI/2013-11-28/Token/types'
+
+RESULT_NAMESPACES = (
+    'xmlns:lt="http://thalesgroup.com/RTTI/2012-01-13/ldb/types" '
+    'xmlns:lt8="http://thalesgroup.com/RTTI/2021-11-01/ldb/types" '
+    'xmlns:lt6="http://thalesgroup.com/RTTI/2017-02-02/ldb/types" '
+    'xmlns:lt7="http://thalesgroup.com/RTTI/2017-10-01/ldb/types" '
+    'xmlns:lt4="http://thalesgroup.com/RTTI/2015-11-27/ldb/types" '
+    'xmlns:lt5="http://thalesgroup.com/RTTI/2016-02-16/ldb/types"'
+)
+
+OPERATIONS = (
+    'GetDepBoardWithDetails',
+    'GetDepartureBoard',
+    'GetServiceDetails',
+)
+
+# Real stations first so the default board looks familiar, then synthetic ones
+KNOWN_STATIONS = [
+    ('PAD', 'London Paddington'),
+    ('RDG', 'Reading'),
+    ('SWI', 'Swindon'),
+    ('BTH', 'Bath Spa'),
+    ('BRI', 'Bristol Temple Meads'),
+    ('OXF', 'Oxford'),
+    ('DID', 'Didcot Parkway'),
+    ('SLO', 'Slough'),
+    ('MAI', 'Maidenhead'),
+    ('TWY', 'Twyford'),
+    ('NWP', 'Newport'),
+    ('CDF', 'Cardiff Central'),
+    ('EXD', 'Exeter St Davids'),
+    ('PLY', 'Plymouth'),
+    ('CHI', 'Chippenham'),
+    ('WOS', 'Worcester Shrub Hill'),
+]
+
+OPERATORS = [
+    ('GW', 'Great Western Railway'),
+    ('XR', 'Elizabeth line'),
+    ('XC', 'CrossCountry'),
+    ('SW', 'South Western Railway'),
+]
+
+DELAY_REASONS = [
+    'This train has been delayed by a signalling fault',
+    'This train has been delayed by a late running train ahead',
+    'This train has been delayed by a shortage of train crew',
+]
+
+CANCEL_REASONS = [
+    'This train has been cancelled because of a fault on this train',
+    'This train has been cancelled because of a shortage of train crew',
+]
+
+
+@dataclass
+class SimulatorConfig:
+    """Shape of the simulated network and the faults to inject."""
+
+    stations: int = 16
+    services: int = 20
+    calling_points: int = 8
+    window: int = 120
+    delay_rate: float = 0.15
+    cancel_rate: float = 0.03
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    fault_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_s: float = 60.0
+    token: Optional[str] = None
+    seed: int = 0
+
+
+@dataclass
+class SimulatorStats:
+    """Call counters, safe to update from handler threads."""
+
+    calls: dict = field(default_factory=lambda: {op: 0 for op in OPERATIONS})
+    errors: int = 0
+    faults: int = 0
+    timeouts: int = 0
+    unauthorized: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, name: str) -> None:
+        """Increment a call or failure counter."""
+        with self._lock:
+            if name in self.calls:
+                self.calls[name] += 1
+            else:
+                setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        """Return the counters as a plain dict."""
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                'errors': self.errors,
+                'faults': self.faults,
+                'timeouts': self.timeouts,
+                'unauthorized': self.unauthorized,
+            }
+
+    def reset(self) -> None:
+        """Clear all counters."""
+        with self._lock:
+            self.calls = {op: 0 for op in OPERATIONS}
+            self.errors = self.faults = self.timeouts = self.unauthorized = 0
+
+
+class Network:
+    """Deterministic synthetic timetable.
+
+    Services depart every window/services minutes from each station. A
+    service ID encodes its station and departure slot, so GetServiceDetails
+    can rebuild the same service the board returned.
+    """
+
+    def __init__(self, config: SimulatorConfig):
+        """Initialize the network."""
+        self._config = config
+        self.stations = self._build_stations(config.stations)
+        self._names = dict(self.stations)
+        self._codes = [crs for crs, _ in self.stations]
+        self._headway = max(1, config.window // max(1, config.services))
+
+    @staticmethod
+    def _build_stations(count: int) -> list[tuple[str, str]]:
+        """Return (crs, name) pairs, padding the known list with synthetic stations."""
+        stations = KNOWN_STATIONS[:count]
+        for i in range(len(stations), count):
+            crs = f"Z{i // 26 % 26 + 65:c}{i % 26 + 65:c}"
+            stations.append((crs, f"Simulated {crs}"))
+        return stations
+
+    def name(self, crs: str) -> str:
+        """Return the station name for a CRS code."""
+        return self._names.get(crs, f"Simulated {crs}")
+
+    def board(self, crs: str, num_rows: int, time_offset: int = 0,
+              time_window: int = 120, filter_crs: Optional[str] = None,
+              now: Optional[datetime] = None) -> list[dict]:
+        """Return the services departing crs within the requested window."""
+        now = now or datetime.now()
+        start = now + timedelta(minutes=time_offset)
+        first_slot = int(start.timestamp() // 60) // self._headway + 1
+        end = start + timedelta(minutes=min(time_window, self._config.window))
+
+        services = []
+        slot = first_slot
+        while len(services) < num_rows:
+            service = self.service(crs, slot)
+            if service['departure'] > end:
+                break
+            slot += 1
+            if filter_crs and filter_crs not in [cp['crs'] for cp in service['calling_points']]:
+                continue
+            services.append(service)
+        return services
+
+    def service(self, crs: str, slot: int) -> dict:
+        """Build the service leaving crs in the given departure slot."""
+        config = self._config
+        rng = random.Random(f"{config.seed}:{crs}:{slot}")
+        departure = datetime.fromtimestamp(slot * self._headway * 60)
+
+        others = [c for c in self._codes if c != crs] or [crs]
+        stops = rng.sample(others, min(config.calling_points, len(others)))
+
+        roll = rng.random()
+        cancelled = roll < config.cancel_rate
+        delay = rng.randint(2, 25) if not cancelled and roll < config.cancel_rate + config.delay_rate else 0
+
+        calling_points = []
+        at = departure
+        for stop in stops:
+            at += timedelta(minutes=rng.randint(3, 15))
+            if cancelled:
+                et = 'Cancelled'
+            elif delay:
+                et = (at + timedelta(minutes=delay)).strftime('%H:%M')
+            else:
+                et = 'On time'
+            calling_points.append({
+                'crs': stop,
+                'name': self.name(stop),
+                'st': at.strftime('%H:%M'),
+                'et': et,
+            })
+
+        if cancelled:
+            etd = 'Cancelled'
+        elif delay:
+            etd = (departure + timedelta(minutes=delay)).strftime('%H:%M')
+        else:
+            etd = 'On time'
+
+        operator_code, operator = rng.choice(OPERATORS)
+        destination = stops[-1] if stops else crs
+        return {
+            'service_id': f"{crs}{slot:010d}",
+            'crs': crs,
+            'departure': departure,
+            'std': departure.strftime('%H:%M'),
+            'etd': etd,
+            'platform': str(rng.randint(1, 14)),
+            'operator': operator,
+            'operator_code': operator_code,
+            'origin': crs,
+            'destination': destination,
+            'cancel_reason': rng.choice(CANCEL_REASONS) if cancelled else None,
+            'delay_reason': rng.choice(DELAY_REASONS) if delay else None,
+            'calling_points': calling_points,
+        }
+
+    def lookup(self, service_id: str) -> Optional[dict]:
+        """Rebuild a service from its ID, or None if it is not one of ours."""
+        crs, slot = service_id[:3], service_id[3:]
+        if crs not in self._names or not slot.isdigit():
+            return None
+        return self.service(crs, int(slot))
+
+
+def _location(network: Network, crs: str) -> str:
+    """Render an lt4:location element."""
+    return (f"<lt4:location><lt4:locationName>{escape(network.name(crs))}</lt4:locationName>"
+            f"<lt4:crs>{crs}</lt4:crs></lt4:location>")
+
+
+def _calling_points(points: list[dict]) -> str:
+    """Render an lt8:callingPointList."""
+    rows = ''.join(
+        f"<lt8:callingPoint><lt8:locationName>{escape(cp['name'])}</lt8:locationName>"
+        f"<lt8:crs>{cp['crs']}</lt8:crs><lt8:st>{cp['st']}</lt8:st>"
+        f"<lt8:et>{cp['et']}</lt8:et></lt8:callingPoint>"
+        for cp in points
+    )
+    return f"<lt8:callingPointList>{rows}</lt8:callingPointList>"
+
+
+def _reasons(service: dict) -> str:
+    """Render cancel and delay reasons if the service has them."""
+    xml = ''
+    if service['cancel_reason']:
+        xml += f"<lt4:cancelReason>{escape(service['cancel_reason'])}</lt4:cancelReason>"
+    if service['delay_reason']:
+        xml += f"<lt4:delayReason>{escape(service['delay_reason'])}</lt4:delayReason>"
+    return xml
+
+
+def _envelope(body: str) -> str:
+    """Wrap a response body in a SOAP envelope."""
+    return ('<?xml version="1.0" encoding="utf-8"?>'
+            f'<soap:Envelope xmlns:soap="{SOAP_NS}" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xmlns:xsd="http://www.w3.org/2001/XMLSchema">'
+            f'<soap:Body>{body}</soap:Body></soap:Envelope>')
+
+
+def render_board(network: Network, operation: str, crs: str, services: list[dict],
+                 with_details: bool, now: Optional[datetime] = None) -> str:
+    """Render a GetDepBoardWithDetails or GetDepartureBoard response."""
+    now = now or datetime.now()
+    rows = []
+    for service in services:
+        details = ''
+        if with_details and service['calling_points']:
+            details = ("<lt8:subsequentCallingPoints>"
+                       f"{_calling_points(service['calling_points'])}"
+                       "</lt8:subsequentCallingPoints>")
+        rows.append(
+            "<lt8:service>"
+            f"<lt4:std>{service['std']}</lt4:std><lt4:etd>{service['etd']}</lt4:etd>"
+            f"<lt4:platform>{service['platform']}</lt4:platform>"
+            f"<lt4:operator>{escape(service['operator'])}</lt4:operator>"
+            f"<lt4:operatorCode>{service['operator_code']}</lt4:operatorCode>"
+            "<lt4:serviceType>train</lt4:serviceType>"
+            f"<lt4:serviceID>{service['service_id']}</lt4:serviceID>"
+            f"{_reasons(service)}"
+            f"<lt5:origin>{_location(network, service['origin'])}</lt5:origin>"
+            f"<lt5:destination>{_location(network, service['destination'])}</lt5:destination>"
+            f"{details}"
+            "</lt8:service>"
+        )
+    train_services = f"<lt8:trainServices>{''.join(rows)}</lt8:trainServices>" if rows else ''
+    return _envelope(
+        f'<{operation}Response xmlns="{LDB_NS}">'
+        f'<GetStationBoardResult {RESULT_NAMESPACES}>'
+        f"<lt4:generatedAt>{now.isoformat()}</lt4:generatedAt>"
+        f"<lt4:locationName>{escape(network.name(crs))}</lt4:locationName>"
+        f"<lt4:crs>{crs}</lt4:crs><lt4:platformAvailable>true</lt4:platformAvailable>"
+        f"{train_services}"
+        f"</GetStationBoardResult></{operation}Response>"
+    )
+
+
+def render_service_details(network: Network, service: dict,
+                           now: Optional[datetime] = None) -> str:
+    """Render a GetServiceDetails response."""
+    now = now or datetime.now()
+    origin = _calling_points([{
+        'crs': service['crs'],
+        'name': network.name(service['crs']),
+        'st': service['std'],
+        'et': service['etd'],
+    }])
+    return _envelope(
+        f'<GetServiceDetailsResponse xmlns="{LDB_NS}">'
+        f'<GetServiceDetailsResult {RESULT_NAMESPACES}>'
+        f"<lt4:generatedAt>{now.isoformat()}</lt4:generatedAt>"
+        "<lt4:serviceType>train</lt4:serviceType>"
+        f"<lt4:locationName>{escape(network.name(service['crs']))}</lt4:locationName>"
+        f"<lt4:crs>{service['crs']}</lt4:crs>"
+        f"<lt4:operator>{escape(service['operator'])}</lt4:operator>"
+        f"<lt4:operatorCode>{service['operator_code']}</lt4:operatorCode>"
+        f"{_reasons(service)}"
+        f"<lt4:platform>{service['platform']}</lt4:platform>"
+        f"<lt4:std>{service['std']}</lt4:std><lt4:etd>{service['etd']}</lt4:etd>"
+        f"<lt8:previousCallingPoints>{origin}</lt8:previousCallingPoints>"
+        f"<lt8:subsequentCallingPoints>{_calling_points(service['calling_points'])}"
+        "</lt8:subsequentCallingPoints>"
+        "</GetServiceDetailsResult></GetServiceDetailsResponse>"
+    )
+
+
+def render_fault(message: str) -> str:
+    """Render a SOAP fault like the ones OpenLDBWS returns on bad input."""
+    return _envelope(
+        "<soap:Fault><faultcode>soap:Client</faultcode>"
+        f"<faultstring>{escape(message)}</faultstring></soap:Fault>"
+    )
+
+
+class DarwinSimulator:
+    """Request handling shared by every connection of one server."""
+
+    def __init__(self, config: SimulatorConfig):
+        """Initialize the simulator."""
+        self.config = config
+        self.network = Network(config)
+        self.stats = SimulatorStats()
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+
+    def _roll(self) -> float:
+        """Return a random number from the shared failure-injection stream."""
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _delay(self) -> float:
+        """Return the injected latency for one call, in seconds."""
+        config = self.config
+        with self._rng_lock:
+            jitter = self._rng.uniform(-config.jitter_ms, config.jitter_ms)
+        return max(0.0, config.latency_ms + jitter) / 1000
+
+    def handle(self, body: bytes) -> tuple[int, str]:
+        """Answer one SOAP request with (status, xml)."""
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return 500, render_fault('Request body is not valid XML')
+
+        request_elem = root.find(f'{{{SOAP_NS}}}Body/*')
+        if request_elem is None:
+            return 500, render_fault('Missing SOAP body')
+        operation = request_elem.tag.split('}')[-1].removesuffix('Request')
+        if operation not in OPERATIONS:
+            return 500, render_fault(f'Unknown operation {operation}')
+
+        config = self.config
+        if config.token is not None:
+            token = root.findtext(f'.//{{{TOKEN_NS}}}TokenValue')
+            if token != config.token:
+                self.stats.count('unauthorized')
+                return 401, 'Unauthorized'
+
+        self.stats.count(operation)
+        time.sleep(self._delay())
+
+        roll = self._roll()
+        if roll < config.timeout_rate:
+            self.stats.count('timeouts')
+            time.sleep(config.timeout_s)
+            return 504, 'Gateway Timeout'
+        roll -= config.timeout_rate
+        if roll < config.error_rate:
+            self.stats.count('errors')
+            return 503, 'Service Unavailable'
+        roll -= config.error_rate
+        if roll < config.fault_rate:
+            self.stats.count('faults')
+            return 500, render_fault('Simulated server fault')
+
+        def field_text(name: str, default: str = '') -> str:
+            return (request_elem.findtext(f'{{{LDB_NS}}}{name}') or default).strip()
+
+        if operation == 'GetServiceDetails':
+            service = self.network.lookup(field_text('serviceID'))
+            if service is None:
+                return 500, render_fault('Invalid Service ID')
+            return 200, render_service_details(self.network, service)
+
+        crs = field_text('crs').upper()
+        try:
+            num_rows = int(field_text('numRows', '10'))
+            time_offset = int(field_text('timeOffset', '0'))
+            time_window = int(field_text('timeWindow', '120'))
+        except ValueError:
+            return 500, render_fault('Invalid numeric parameter')
+        services = self.network.board(
+            crs, num_rows, time_offset, time_window,
+            filter_crs=field_text('filterCrs').upper() or None,
+        )
+        return 200, render_board(
+            self.network, operation, crs, services,
+            with_details=operation == 'GetDepBoardWithDetails',
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP front end for DarwinSimulator."""
+
+    server_version = 'DarwinSimulator/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        """Handle SOAP calls and counter resets."""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.path == '/stats/reset':
+            self.server.simulator.stats.reset()
+            self._send(200, 'application/json', '{}')
+            return
+        status, xml = self.server.simulator.handle(body)
+        self._send(status, 'text/xml; charset=utf-8', xml)
+
+    def do_GET(self):
+        """Serve the call counters."""
+        if self.path != '/stats':
+            self._send(404, 'text/plain', 'Not Found')
+            return
+        stats = self.server.simulator.stats.snapshot()
+        self._send(200, 'application/json', json.dumps(stats))
+
+    def _send(self, status: int, content_type: str, text: str) -> None:
+        """Write a complete response."""
+        payload = text.encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. its own timeout) before we answered
+            pass
+
+    def log_message(self, format, *args):
+        """Keep the console quiet under load."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(config: Optional[SimulatorConfig] = None, host: str = '127.0.0.1',
+                port: int = 0, verbose: bool = False) -> ThreadingHTTPServer:
+    """Create a simulator server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.simulator = DarwinSimulator(config or SimulatorConfig())
+    server.verbose = verbose
+    return server
+
+
+def endpoint_url(server: ThreadingHTTPServer) -> str:
+    """Return the ldb12.asmx URL a DarwinApi client should use."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/OpenLDBWS/ldb12.asmx"
+
+
+def start_in_thread(config: Optional[SimulatorConfig] = None,
+                    **kwargs) -> ThreadingHTTPServer:
+    """Start a simulator on a background thread and return its server."""
+    server = make_server(config, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    """Run the simulator from the command line."""
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description='Local Darwin OpenLDBWS simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--stations', type=int, default=defaults.stations,
+                        help='number of stations in the network')
+    parser.add_argument('--services', type=int, default=defaults.services,
+                        help='departures per station in the simulated window')
+    parser.add_argument('--calling-points', type=int, default=defaults.calling_points,
+                        help='calling points per service')
+    parser.add_argument('--window', type=int, default=defaults.window,
+                        help='simulated timetable window in minutes')
+    parser.add_argument('--delay-rate', type=float, default=defaults.delay_rate)
+    parser.add_argument('--cancel-rate', type=float, default=defaults.cancel_rate)
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms,
+                        help='added latency per call')
+    parser.add_argument('--jitter-ms', type=float, default=defaults.jitter_ms,
+                        help='uniform +/- jitter on the added latency')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate,
+                        help='fraction of calls answered with HTTP 503')
+    parser.add_argument('--fault-rate', type=float, default=defaults.fault_rate,
+                        help='fraction of calls answered with a SOAP fault')
+    parser.add_argument('--timeout-rate', type=float, default=defaults.timeout_rate,
+                        help='fraction of calls that hang for --timeout-s')
+    parser.add_argument('--timeout-s', type=float, default=defaults.timeout_s)
+    parser.add_argument('--token', default=None,
+                        help='reject calls whose access token differs (HTTP 401)')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        stations=args.stations,
+        services=args.services,
+        calling_points=args.calling_points,
+        window=args.window,
+        delay_rate=args.delay_rate,
+        cancel_rate=args.cancel_rate,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        fault_rate=args.fault_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_s=args.timeout_s,
+        token=args.token,
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port, args.verbose)
+    stations = ', '.join(crs for crs, _ in server.simulator.network.stations)
+
+    print(f"Darwin simulator listening on {endpoint_url(server)}")
+    print(f"Stations: {stations}")
+    print(f"Set DARWIN_ENDPOINT={endpoint_url(server)} to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
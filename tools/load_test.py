@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Load test for the standalone departure board
+
+Drives /api/departures, /api/stations and / at one or more concurrency
+levels and reports requests per second, p50/p95/p99 latency, Darwin calls
+made per board request and the server's RSS. By default it starts the
+Darwin simulator and standalone/app.py itself, so runs are reproducible.
+
+Usage:
+    python3 tools/load_test.py --concurrency 1,4,16 --duration 20
+    python3 tools/load_test.py --latency-ms 300 --env LAZY_CALLING_POINTS=true
+    python3 tools/load_test.py --target http://pi.local:5000 --concurrency 2
+
+The "screens" column estimates how many kiosk screens the server could
+feed: each board polls /api/departures every 30 seconds.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BOARD_REFRESH_SECONDS = 30
+# Request mix: mostly board polls, with the odd page load and station lookup
+DEFAULT_MIX = '/api/departures:90,/api/stations:5,/:5'
+STARTUP_TIMEOUT = 15.0
+
+
+@dataclass
+class RunResult:
+    """Figures for one concurrency level."""
+
+    concurrency: int
+    duration: float
+    requests: int = 0
+    errors: int = 0
+    rps: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    paths: dict = field(default_factory=dict)
+    upstream_calls: Optional[dict] = None
+    upstream_per_board: Optional[float] = None
+    rss_mib: Optional[float] = None
+    peak_rss_mib: Optional[float] = None
+    screens: Optional[int] = None
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Return the pct percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    """Return a TCP port that is free right now."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = STARTUP_TIMEOUT) -> None:
+    """Poll a URL until it answers or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            time.sleep(0.2)
+
+
+def read_rss(pid: int) -> tuple[Optional[float], Optional[float]]:
+    """Return (current, peak) resident memory of a process in MiB (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            fields = dict(line.split(':', 1) for line in status if ':' in line)
+    except OSError:
+        return None, None
+
+    def mib(key):
+        value = fields.get(key)
+        return int(value.split()[0]) / 1024 if value else None
+
+    return mib('VmRSS'), mib('VmHWM')
+
+
+def parse_mix(mix: str) -> list[tuple[str, int]]:
+    """Parse 'path:weight,path:weight' into a list of pairs."""
+    pairs = []
+    for item in mix.split(','):
+        path, _, weight = item.strip().rpartition(':')
+        pairs.append((path, int(weight)))
+    return pairs
+
+
+class Servers:
+    """Darwin simulator and standalone app started as child processes."""
+
+    def __init__(self, args):
+        """Start both processes and wait for them to answer."""
+        self.processes = []
+        sim_port = free_port()
+        app_port = free_port()
+        self.simulator_url = f'http://127.0.0.1:{sim_port}'
+        self.app_url = f'http://127.0.0.1:{app_port}'
+
+        self._spawn([
+            sys.executable, str(ROOT / 'tools' / 'darwin_simulator.py'),
+            '--port', str(sim_port),
+            '--services', str(args.services),
+            '--calling-points', str(args.calling_points),
+            '--latency-ms', str(args.latency_ms),
+            '--jitter-ms', str(args.jitter_ms),
+            '--error-rate', str(args.error_rate),
+        ], cwd=ROOT)
+        wait_for(f'{self.simulator_url}/stats')
+
+        env = dict(os.environ)
+        env.update({
+            'DARWIN_API_TOKEN': 'load-test',
+            'DARWIN_ENDPOINT': f'{self.simulator_url}/OpenLDBWS/ldb12.asmx',
+            'STATION_CRS': args.station,
+            'DESTINATION_CRS': args.destinations,
+            'PORT': str(app_port),
+            'DEBUG': 'false',
+        })
+        env.update(dict(item.split('=', 1) for item in args.env))
+        self.app = self._spawn([sys.executable, 'app.py'], cwd=ROOT / 'standalone', env=env)
+        wait_for(f'{self.app_url}/health')
+
+    def _spawn(self, command, cwd, env=None):
+        """Start a quiet child process and remember it for shutdown."""
+        process = subprocess.Popen(command, cwd=cwd, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.processes.append(process)
+        return process
+
+    def stop(self):
+        """Terminate the child processes."""
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def upstream_stats(simulator_url: Optional[str]) -> Optional[dict]:
+    """Return the simulator's call counters, if there is a simulator."""
+    if not simulator_url:
+        return None
+    with urllib.request.urlopen(f'{simulator_url}/stats', timeout=5) as response:
+        return json.load(response)['calls']
+
+
+def reset_upstream(simulator_url: Optional[str]) -> None:
+    """Clear the simulator's call counters."""
+    if simulator_url:
+        request = urllib.request.Request(f'{simulator_url}/stats/reset', data=b'', method='POST')
+        urllib.request.urlopen(request, timeout=5).read()
+
+
+def worker(base_url: str, mix: list[tuple[str, int]], stop_at: float,
+           seed: int, samples: list, lock: threading.Lock) -> None:
+    """Send requests over one keep-alive connection until stop_at."""
+    parts = urlsplit(base_url)
+    prefix = parts.path.rstrip('/')
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    paths = [path for path, _ in mix]
+    weights = [weight for _, weight in mix]
+    rng = random.Random(seed)
+    local = []
+
+    while time.monotonic() < stop_at:
+        path = rng.choices(paths, weights)[0]
+        start = time.perf_counter()
+        try:
+            connection.request('GET', prefix + path)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            connection.close()
+        local.append((path, time.perf_counter() - start, ok))
+
+    connection.close()
+    with lock:
+        samples.extend(local)
+
+
+def run_level(base_url: str, concurrency: int, args, simulator_url: Optional[str],
+              pid: Optional[int]) -> RunResult:
+    """Run one concurrency level and summarise it."""
+    mix = parse_mix(args.mix)
+
+    # Warm up caches and the query sizer without counting it
+    warmup_stop = time.monotonic() + args.warmup
+    threads = [threading.Thread(target=worker,
+                                args=(base_url, mix, warmup_stop, i, [], threading.Lock()))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reset_upstream(simulator_url)
+    samples = []
+    lock = threading.Lock()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = [threading.Thread(target=worker,
+                                args=(base_url, mix, stop_at, 1000 + i, samples, lock))
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    result = RunResult(concurrency=concurrency, duration=round(elapsed, 2))
+    result.requests = len(samples)
+    result.errors = sum(1 for _, _, ok in samples if not ok)
+    result.rps = round(result.requests / elapsed, 1)
+
+    latencies = sorted(latency * 1000 for _, latency, _ in samples)
+    result.p50_ms = round(percentile(latencies, 50), 1)
+    result.p95_ms = round(percentile(latencies, 95), 1)
+    result.p99_ms = round(percentile(latencies, 99), 1)
+
+    for path, _ in mix:
+        path_latencies = sorted(latency * 1000 for p, latency, _ in samples if p == path)
+        result.paths[path] = {
+            'requests': len(path_latencies),
+            'rps': round(len(path_latencies) / elapsed, 1),
+            'p50_ms': round(percentile(path_latencies, 50), 1),
+            'p95_ms': round(percentile(path_latencies, 95), 1),
+            'p99_ms': round(percentile(path_latencies, 99), 1),
+        }
+
+    result.upstream_calls = upstream_stats(simulator_url)
+    boards = result.paths.get('/api/departures', {}).get('requests', 0)
+    if result.upstream_calls is not None and boards:
+        result.upstream_per_board = round(sum(result.upstream_calls.values()) / boards, 2)
+    if boards:
+        result.screens = int(boards / elapsed * BOARD_REFRESH_SECONDS)
+    if pid:
+        result.rss_mib, result.peak_rss_mib = read_rss(pid)
+    return result
+
+
+def print_table(results: list[RunResult]) -> None:
+    """Print one row per concurrency level."""
+    print(f"\n{'conc':>4} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'darwin/board':>12} {'rss MiB':>8} {'peak MiB':>8} {'screens':>7}")
+    for r in results:
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else '-'
+        print(f"{r.concurrency:>4} {r.requests:>7} {r.errors:>5} {r.rps:>8.1f} "
+              f"{r.p50_ms:>8.1f} {r.p95_ms:>8.1f} {r.p99_ms:>8.1f} "
+              f"{fmt(r.upstream_per_board, '>12.2f'):>12} {fmt(r.rss_mib, '>8.1f'):>8} "
+              f"{fmt(r.peak_rss_mib, '>8.1f'):>8} {fmt(r.screens, '>7d'):>7}")
+
+
+def main():
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description='Load test the standalone departure board')
+    parser.add_argument('--target', help='test an already running server instead of starting one')
+    parser.add_argument('--simulator', help='simulator URL for upstream counts with --target')
+    parser.add_argument('--pid', type=int, help='server PID for RSS with --target')
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help='comma-separated concurrency levels (default 1,4,16)')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds per level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'path:weight list (default {DEFAULT_MIX})')
+    parser.add_argument('--station', default='PAD')
+    parser.add_argument('--destinations', default='', help='DESTINATION_CRS for the app')
+    parser.add_argument('--services', type=int, default=20, help='simulator services per board')
+    parser.add_argument('--calling-points', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='simulated Darwin latency')
+    parser.add_argument('--jitter-ms', type=float, default=30.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra environment for the app (repeatable)')
+    parser.add_argument('--json', dest='json_path', help='also write results to this file')
+    args = parser.parse_args()
+
+    servers = None
+    if args.target:
+        base_url, simulator_url, pid = args.target, args.simulator, args.pid
+    else:
+        servers = Servers(args)
+        base_url, simulator_url, pid = servers.app_url, servers.simulator_url, servers.app.pid
+        print(f"App {base_url} (pid {pid}), Darwin simulator {simulator_url}")
+
+    results = []
+    try:
+        for level in (int(c) for c in args.concurrency.split(',')):
+            print(f"Running concurrency {level} for {args.duration:.0f}s...", flush=True)
+            results.append(run_level(base_url, level, args, simulator_url, pid))
+    finally:
+        if servers:
+            servers.stop()
+
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as out:
+            json.dump({
+                'target': args.target or 'local',
+                'mix': args.mix,
+                'env': args.env,
+                'latency_ms': args.latency_ms,
+                'results': [asdict(r) for r in results],
+            }, out, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
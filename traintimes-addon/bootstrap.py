@@ -0,0 +1,75 @@
+"""
+Boards embedded in the board page for the first paint
+
+Without help the page arrives empty and the browser has to fetch
+/api/departures before showing a single train: two round trips in a row,
+which is slow through Home Assistant ingress. Instead the last live board
+served for the same query is kept here and written into the page as an
+inline JSON blob, so the first paint shows real departures while the
+browser's first fetch brings them up to date.
+
+Rendered pages are cached by query and board version: a new board for a
+station bumps its version, so a page is only rendered again when its
+board has changed. Boards older than max_age are not embedded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+DEFAULT_BOARDS = 256
+DEFAULT_PAGES = 128
+
+
+class BoardBootstrap:
+    """The latest live board per query and the pages rendered from them."""
+
+    def __init__(self, max_age: float, boards: int = DEFAULT_BOARDS,
+                 pages: int = DEFAULT_PAGES):
+        """Initialize empty caches."""
+        self.max_age = max_age
+        self.max_boards = boards
+        self.max_pages = pages
+        # key -> (version, recorded at, body); least recently recorded first
+        self._boards: OrderedDict = OrderedDict()
+        self._pages: OrderedDict = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, body: str) -> None:
+        """Keep a live board's serialized body as the latest for its query."""
+        with self._lock:
+            self._version += 1
+            self._boards[key] = (self._version, time.monotonic(), body)
+            self._boards.move_to_end(key)
+            if len(self._boards) > self.max_boards:
+                self._boards.popitem(last=False)
+
+    def latest(self, key: Hashable) -> tuple[int, Optional[str]]:
+        """Return the version and body of a query's latest board.
+
+        Version 0 and None when there is no board young enough to embed.
+        """
+        with self._lock:
+            entry = self._boards.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.max_age:
+            return 0, None
+        return entry[0], entry[2]
+
+    def page(self, key: Hashable, render: Callable[[], str]) -> str:
+        """Return the cached page for key, rendering it on a miss.
+
+        key must include whatever the page shows, such as the board version.
+        """
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+        page = render()
+        with self._lock:
+            self._pages[key] = page
+            if len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return page
@@ -5,6 +5,8 @@ CONF_STATION_CRS = "station_crs"
 CONF_API_TOKEN = "api_token"
 CONF_DESTINATION_CRS = "destination_crs"
 CONF_NUM_DEPARTURES = "num_departures"
+CONF_LAZY_CALLING_POINTS = "lazy_calling_points"
+CONF_HEDGE_REQUESTS = "hedge_requests"
 
 # Watched trains configuration
 CONF_WATCHED_TRAIN_1_TIME = "watched_train_1_time"
@@ -17,6 +19,16 @@ CONF_WATCHED_TRAIN_3_DEST = "watched_train_3_destination"
 DEFAULT_NUM_DEPARTURES = 3
 DEFAULT_SCAN_INTERVAL = 30  # seconds
 
+# Fetch telemetry kept per coordinator (about 25 minutes at the scan interval)
+TELEMETRY_HISTORY = 50
+TELEMETRY_ERROR_HISTORY = 20
+
+# Rolling punctuality counters are saved at most this often (seconds)
+PUNCTUALITY_SAVE_DELAY = 300
+
+# Darwin's HH:MM times are UK local time, whatever Home Assistant's time zone
+UK_TIME_ZONE = "Europe/London"
+
 # Darwin API endpoint
 DARWIN_WSDL = "https://lite.realtime.nationalrail.co.uk/OpenLDBWS/wsdl.aspx?ver=2021-11-01"
 DARWIN_NAMESPACE = "http://thalesgroup.com/RTTI/2021-11-01/Token/types"
@@ -26,27 +38,3 @@ STATUS_ON_TIME = "on_time"
 STATUS_DELAYED = "delayed"
 STATUS_CANCELLED = "cancelled"
 STATUS_NO_REPORT = "no_report"
-
-# Common UK station CRS codes for reference
-STATION_CODES = {
-    "PAD": "London Paddington",
-    "EUS": "London Euston",
-    "KGX": "London King's Cross",
-    "STP": "London St Pancras",
-    "VIC": "London Victoria",
-    "WAT": "London Waterloo",
-    "CHX": "London Charing Cross",
-    "LST": "London Liverpool Street",
-    "BHM": "Birmingham New Street",
-    "MAN": "Manchester Piccadilly",
-    "LDS": "Leeds",
-    "EDB": "Edinburgh Waverley",
-    "GLC": "Glasgow Central",
-    "BRI": "Bristol Temple Meads",
-    "RDG": "Reading",
-    "OXF": "Oxford",
-    "CBG": "Cambridge",
-    "NCL": "Newcastle",
-    "LIV": "Liverpool Lime Street",
-    "SHF": "Sheffield",
-}
@@ -3,12 +3,18 @@
 import logging
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .api import calculate_delay_minutes
 from .const import (
     CONF_NUM_DEPARTURES,
     CONF_STATION_CRS,
@@ -20,37 +26,13 @@ from .const import (
     CONF_WATCHED_TRAIN_3_DEST,
     DEFAULT_NUM_DEPARTURES,
     DOMAIN,
-    STATION_CODES,
     STATUS_CANCELLED,
     STATUS_DELAYED,
     STATUS_ON_TIME,
 )
-from .coordinator import TrainDeparturesCoordinator
-
-
-def calculate_delay_minutes(scheduled: str, expected: str) -> int:
-    """Calculate delay in minutes between scheduled and expected times."""
-    if not scheduled or not expected:
-        return 0
-    if expected in ("On time", "Delayed", "Cancelled"):
-        return 0 if expected == "On time" else -1  # -1 for unknown delay
-
-    try:
-        # Parse times (HH:MM format)
-        sch_h, sch_m = map(int, scheduled.split(":"))
-        exp_h, exp_m = map(int, expected.split(":"))
-
-        sch_mins = sch_h * 60 + sch_m
-        exp_mins = exp_h * 60 + exp_m
+from .coordinator import TrainDeparturesCoordinator, uk_now
+from .stations import get_station_index
 
-        # Handle day wraparound
-        diff = exp_mins - sch_mins
-        if diff < -720:  # More than 12 hours negative = next day
-            diff += 1440
-
-        return max(0, diff)
-    except (ValueError, AttributeError):
-        return 0
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -105,6 +87,17 @@ async def async_setup_entry(
                 )
             )
 
+    # Diagnostic sensors for fetch performance
+    sensors.extend(
+        sensor_class(coordinator=coordinator, entry=entry)
+        for sensor_class in (
+            FetchDurationSensor,
+            DarwinCallsTodaySensor,
+            DataReceivedTodaySensor,
+            FetchErrorsTodaySensor,
+        )
+    )
+
     async_add_entities(sensors)
 
 
@@ -126,7 +119,6 @@ class TrainDepartureSensor(CoordinatorEntity[TrainDeparturesCoordinator], Sensor
         self._departure_index = departure_index
         self._entry = entry
 
-        station_name = STATION_CODES.get(station_crs.upper(), station_crs)
         self._attr_unique_id = f"{entry.entry_id}_departure_{departure_index + 1}"
         self._attr_name = f"Departure {departure_index + 1}"
         self._attr_icon = "mdi:train"
@@ -161,6 +153,8 @@ class TrainDepartureSensor(CoordinatorEntity[TrainDeparturesCoordinator], Sensor
             "calling_points": [],
             "service_id": None,
             "station_crs": self._station_crs,
+            "punctuality_7d": None,
+            "punctuality_30d": None,
         }
         if not self.coordinator.data:
             return no_service_attrs
@@ -170,15 +164,7 @@ class TrainDepartureSensor(CoordinatorEntity[TrainDeparturesCoordinator], Sensor
         service = self.coordinator.data[self._departure_index]
 
         # Format calling points
-        calling_points = [
-            {
-                "station": cp.station_name,
-                "crs": cp.crs,
-                "scheduled": cp.scheduled_time,
-                "expected": cp.expected_time,
-            }
-            for cp in service.calling_points
-        ]
+        calling_points = self.coordinator.calling_points_as_dicts(service)
 
         delay_mins = calculate_delay_minutes(service.scheduled_time, service.expected_time)
         is_delayed = service.status == STATUS_DELAYED or delay_mins > 0
@@ -210,6 +196,7 @@ class TrainDepartureSensor(CoordinatorEntity[TrainDeparturesCoordinator], Sensor
             "calling_points": calling_points,
             "service_id": service.service_id,
             "station_crs": self._station_crs,
+            **self.coordinator.route_punctuality(service),
         }
 
     @property
@@ -228,6 +215,9 @@ class TrainDeparturesSummarySensor(
     """Summary sensor for all departures from a station."""
 
     _attr_has_entity_name = True
+    # The full board changes every refresh; frontends follow it over the
+    # websocket API instead of from the recorder's history
+    _unrecorded_attributes = frozenset({"departures", "query_stats"})
 
     def __init__(
         self,
@@ -240,7 +230,6 @@ class TrainDeparturesSummarySensor(
         self._station_crs = station_crs
         self._entry = entry
 
-        station_name = STATION_CODES.get(station_crs.upper(), station_crs)
         self._attr_unique_id = f"{entry.entry_id}_summary"
         self._attr_name = f"Departures"
         self._attr_icon = "mdi:train-variant"
@@ -256,33 +245,19 @@ class TrainDeparturesSummarySensor(
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return all departures as attributes."""
         if not self.coordinator.data:
-            return {"departures": [], "station_crs": self._station_crs}
-
-        departures = []
-        for service in self.coordinator.data:
-            calling_points = [
-                {
-                    "station": cp.station_name,
-                    "crs": cp.crs,
-                    "scheduled": cp.scheduled_time,
-                    "expected": cp.expected_time,
-                }
-                for cp in service.calling_points
-            ]
-
-            departures.append({
-                "destination": service.destination,
-                "destination_crs": service.destination_crs,
-                "scheduled_time": service.scheduled_time,
-                "expected_time": service.expected_time,
-                "platform": service.platform,
-                "operator": service.operator,
-                "status": service.status,
-                "is_cancelled": service.is_cancelled,
-                "cancel_reason": service.cancel_reason,
-                "delay_reason": service.delay_reason,
-                "calling_points": calling_points,
-            })
+            return {
+                "departures": [],
+                "station_crs": self._station_crs,
+                "query_stats": self.coordinator.query_sizer.stats(),
+                "circuit_state": self.coordinator.api.circuit_state()["state"],
+                "punctuality": self.coordinator.punctuality.station_stats(
+                    self._station_crs, uk_now()
+                ),
+            }
+
+        departures = [
+            self.coordinator.departure_as_dict(service) for service in self.coordinator.data
+        ]
 
         # Count statuses
         on_time = sum(1 for d in departures if d["status"] == STATUS_ON_TIME)
@@ -292,10 +267,15 @@ class TrainDeparturesSummarySensor(
         return {
             "departures": departures,
             "station_crs": self._station_crs,
-            "station_name": STATION_CODES.get(self._station_crs.upper(), self._station_crs),
+            "station_name": get_station_index().name(self._station_crs) or self._station_crs,
             "on_time_count": on_time,
             "delayed_count": delayed,
             "cancelled_count": cancelled,
+            "query_stats": self.coordinator.query_sizer.stats(),
+            "circuit_state": self.coordinator.api.circuit_state()["state"],
+            "punctuality": self.coordinator.punctuality.station_stats(
+                self._station_crs, uk_now()
+            ),
         }
 
 
@@ -373,6 +353,8 @@ class WatchedTrainSensor(CoordinatorEntity[TrainDeparturesCoordinator], SensorEn
                 "is_delayed": False,
                 "is_cancelled": False,
                 "delay_minutes": 0,
+                "punctuality_7d": None,
+                "punctuality_30d": None,
             }
 
         delay_mins = calculate_delay_minutes(service.scheduled_time, service.expected_time)
@@ -389,15 +371,7 @@ class WatchedTrainSensor(CoordinatorEntity[TrainDeparturesCoordinator], SensorEn
             summary = f"{service.scheduled_time} to {service.destination} - Exp {service.expected_time}"
 
         # Format calling points
-        calling_points = [
-            {
-                "station": cp.station_name,
-                "crs": cp.crs,
-                "scheduled": cp.scheduled_time,
-                "expected": cp.expected_time,
-            }
-            for cp in service.calling_points
-        ]
+        calling_points = self.coordinator.calling_points_as_dicts(service)
 
         return {
             **base_attrs,
@@ -414,9 +388,144 @@ class WatchedTrainSensor(CoordinatorEntity[TrainDeparturesCoordinator], SensorEn
             "delay_reason": service.delay_reason,
             "cancel_reason": service.cancel_reason,
             "calling_points": calling_points,
+            **self.coordinator.route_punctuality(service),
         }
 
     @property
     def available(self) -> bool:
         """Return if entity is available."""
         return self.coordinator.last_update_success
+
+
+class TelemetrySensor(CoordinatorEntity[TrainDeparturesCoordinator], SensorEntity):
+    """Base class for diagnostic sensors backed by the coordinator's telemetry."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _key = ""
+    _name = ""
+    _icon = "mdi:chart-line"
+
+    def __init__(
+        self,
+        coordinator: TrainDeparturesCoordinator,
+        entry: ConfigEntry,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._entry = entry
+        self._attr_unique_id = f"{entry.entry_id}_{self._key}"
+        self._attr_name = self._name
+        self._attr_icon = self._icon
+
+    @property
+    def available(self) -> bool:
+        """Stay available when fetches fail, since that is what these report."""
+        return True
+
+
+class FetchDurationSensor(TelemetrySensor):
+    """Duration of the last refresh, with recent averages."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _key = "last_fetch_duration"
+    _name = "Last fetch duration"
+    _icon = "mdi:timer-outline"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the last refresh duration in milliseconds."""
+        last = self.coordinator.telemetry.last
+        return round(last.duration * 1000, 1) if last else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the breakdown of the last refresh and recent averages."""
+        telemetry = self.coordinator.telemetry
+        last = telemetry.last
+        summary = telemetry.summary()
+        attrs = {
+            "avg_duration_ms": summary["avg_duration_ms"],
+            "p95_duration_ms": summary["p95_duration_ms"],
+            "refreshes": summary["refreshes"],
+            "failed_refreshes": summary["failed_refreshes"],
+        }
+        if last:
+            attrs.update({
+                "upstream_ms": round(last.upstream * 1000, 1),
+                "parse_ms": round(last.parse * 1000, 1),
+                "bytes_received": last.bytes_received,
+                "rows": last.rows,
+                "calls": last.calls,
+                "retries": last.retries,
+                "error": last.error,
+            })
+        return attrs
+
+
+class DarwinCallsTodaySensor(TelemetrySensor):
+    """Darwin requests made today, including retries."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _key = "darwin_calls_today"
+    _name = "Darwin calls today"
+    _icon = "mdi:api"
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of Darwin requests made today."""
+        return self.coordinator.telemetry.summary()["calls_today"]
+
+
+class DataReceivedTodaySensor(TelemetrySensor):
+    """Bytes received from Darwin today."""
+
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_suggested_unit_of_measurement = UnitOfInformation.KILOBYTES
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _key = "data_received_today"
+    _name = "Data received today"
+    _icon = "mdi:download-network"
+
+    @property
+    def native_value(self) -> int:
+        """Return the bytes received today."""
+        return self.coordinator.telemetry.summary()["bytes_today"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the average response size and rows per refresh."""
+        summary = self.coordinator.telemetry.summary()
+        return {
+            "avg_bytes_per_refresh": summary["avg_bytes"],
+            "avg_rows_per_refresh": summary["avg_rows"],
+        }
+
+
+class FetchErrorsTodaySensor(TelemetrySensor):
+    """Failed Darwin calls today, with the most recent error."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _key = "fetch_errors_today"
+    _name = "Fetch errors today"
+    _icon = "mdi:alert-circle-outline"
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of failed Darwin calls today."""
+        return self.coordinator.telemetry.summary()["errors_today"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the last error and counts by kind."""
+        telemetry = self.coordinator.telemetry
+        last_error = telemetry.errors[-1] if telemetry.errors else None
+        return {
+            "errors_by_kind": dict(telemetry.errors_by_kind),
+            "last_error": last_error.message if last_error else None,
+            "last_error_kind": last_error.kind if last_error else None,
+            "last_error_time": last_error.time.isoformat() if last_error else None,
+        }
@@ -1,17 +1,88 @@
 """National Rail Darwin SOAP API client - Standalone version using raw requests."""
 
+import contextvars
 import logging
+import random
+import re
+import threading
+import time
 import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from collections.abc import Sequence
 from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from tracing import NOOP_TRACER
 
 _LOGGER = logging.getLogger(__name__)
 
 # Darwin API endpoint
 DARWIN_ENDPOINT = "https://lite.realtime.nationalrail.co.uk/OpenLDBWS/ldb12.asmx"
 
+# SOAP actions for the operations we call
+SOAP_ACTION_DEP_BOARD_WITH_DETAILS = 'http://thalesgroup.com/RTTI/2015-05-14/ldb/GetDepBoardWithDetails'
+SOAP_ACTION_DEP_BOARD = 'http://thalesgroup.com/RTTI/2012-01-13/ldb/GetDepartureBoard'
+SOAP_ACTION_SERVICE_DETAILS = 'http://thalesgroup.com/RTTI/2012-01-13/ldb/GetServiceDetails'
+
+# How long fetched calling points are reused before asking Darwin again (seconds)
+SERVICE_DETAILS_TTL = 60
+
+# Bounds and defaults for adaptive board sizing
+DEFAULT_NUM_ROWS = 20
+DEFAULT_MIN_ROWS = 1
+DEFAULT_MAX_ROWS = 40
+DEFAULT_MIN_WINDOW = 30  # minutes
+DEFAULT_MAX_WINDOW = 120  # minutes, the most Darwin allows
+# Slack added on top of what recent boards actually needed
+ROW_HEADROOM = 2
+WINDOW_HEADROOM = 15  # minutes
+# Number of recent fetches the size estimates are based on
+SIZER_HISTORY = 10
+# Boards the sizer remembers; the least recently used is forgotten first
+SIZER_MAX_BOARDS = 256
+
+# Retry and circuit breaker settings for transient upstream errors
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 5.0  # seconds
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0  # seconds
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Timeouts for a single upstream call (seconds)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# Request hedging: send a second request once the first has taken longer
+# than the recent p95 latency, but only once there are enough samples
+LATENCY_WINDOW = 200
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.2  # seconds
+# Worker threads for hedged calls; each hedged call can hold two
+HEDGE_MAX_WORKERS = 16
+
+# Error kinds reported by DarwinApiError.kind
+ERROR_AUTH = "auth"
+ERROR_SOAP_FAULT = "soap_fault"
+ERROR_HTTP = "http"
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection"
+ERROR_PARSE = "parse"
+ERROR_DEADLINE = "deadline"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+ERROR_UNKNOWN = "unknown"
+
 # Status constants
 STATUS_ON_TIME = "on_time"
 STATUS_DELAYED = "delayed"
@@ -31,6 +102,57 @@ NS = {
     'lt8': 'http://thalesgroup.com/RTTI/2021-11-01/ldb/types',
 }
 
+# Start tag of a board's calling point list, cut out before the rest is
+# parsed. Self-closing tags are left alone: they have no closing tag to find.
+_CALLING_POINT_LIST = re.compile(
+    r"<((?:[\w.-]+:)?(?:previous|subsequent)CallingPoints)\b[^>]*(?<!/)>"
+)
+# Prefixed or default namespace declaration, with either quote style
+_NAMESPACE_DECLARATION = re.compile(r"""\sxmlns(?::([\w.-]+))?\s*=\s*(["'])(.*?)\2""")
+# Attribute on the empty element left where a list was cut out
+_RAW_REF = "raw"
+
+# Most bytes taken from a response body at a time
+_READ_CHUNK = 65536
+
+
+def _cut_calling_points(xml_text: str) -> tuple[str, list[str], str]:
+    """Cut the calling point lists out of a board response.
+
+    Returns the response with each list replaced by an empty element whose
+    raw attribute indexes the list's XML, the cut lists, and the namespace
+    declarations needed to parse a list on its own. A response that binds
+    one prefix to two namespaces is returned uncut, since its lists cannot
+    be parsed apart from their place in the document.
+    """
+    slices: list[str] = []
+    if "CallingPoints" not in xml_text:
+        return xml_text, slices, ""
+    parts = []
+    declarations: dict[str, tuple[str, str]] = {}
+    position = 0
+    while (match := _CALLING_POINT_LIST.search(xml_text, position)) is not None:
+        closing = f"</{match.group(1)}>"
+        end = xml_text.find(closing, match.end())
+        if end < 0:
+            break
+        end += len(closing)
+        # Only the text that is kept can declare the lists' prefixes
+        for prefix, quote, uri in _NAMESPACE_DECLARATION.findall(xml_text, position,
+                                                                 match.start()):
+            if declarations.setdefault(prefix, (quote, uri))[1] != uri:
+                return xml_text, [], ""
+        parts.append(xml_text[position:match.start()])
+        parts.append(f'<{match.group(1)} {_RAW_REF}="{len(slices)}"/>')
+        slices.append(xml_text[match.start():end])
+        position = end
+    parts.append(xml_text[position:])
+    namespaces = "".join(
+        f" xmlns{':' + prefix if prefix else ''}={quote}{uri}{quote}"
+        for prefix, (quote, uri) in declarations.items()
+    )
+    return "".join(parts), slices, namespaces
+
 
 @dataclass
 class CallingPoint:
@@ -54,6 +176,64 @@ class CallingPoint:
         return STATUS_ON_TIME
 
 
+# Held while a LazyCallingPoints list is decoded
+_DECODE_LOCK = threading.Lock()
+
+
+class LazyCallingPoints(Sequence):
+    """Calling points kept as the raw XML cut from the response until first accessed.
+
+    Most consumers only look at the service summary, so the lists are cut
+    out of the response before it is parsed and only parsed and decoded
+    when something reads them.
+    """
+
+    __slots__ = ('_raw', '_decode', '_items')
+
+    def __init__(self, raw: str, decode) -> None:
+        """Initialize with a service's calling point XML and the function decoding it."""
+        self._raw = raw
+        self._decode = decode
+        self._items: Optional[list[CallingPoint]] = None
+
+    @property
+    def is_materialized(self) -> bool:
+        """Return True once the calling points have been decoded."""
+        return self._items is not None
+
+    def _materialize(self) -> list[CallingPoint]:
+        """Decode the raw XML on first use and drop it."""
+        items = self._items
+        if items is None:
+            # Services are shared between threads; only one decodes
+            with _DECODE_LOCK:
+                if self._items is None:
+                    self._items = self._decode(self._raw)
+                    self._raw = None
+                    self._decode = None
+                items = self._items
+        return items
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __len__(self) -> int:
+        return len(self._materialize())
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (LazyCallingPoints, list)):
+            return self._materialize() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        if self._items is None:
+            return f"<LazyCallingPoints: {len(self._raw)} bytes undecoded>"
+        return repr(self._items)
+
+
 @dataclass
 class TrainService:
     """Represents a train departure service."""
@@ -69,7 +249,10 @@ class TrainService:
     is_cancelled: bool = False
     cancel_reason: Optional[str] = None
     delay_reason: Optional[str] = None
-    calling_points: list[CallingPoint] = field(default_factory=list)
+    calling_points: Sequence[CallingPoint] = field(default_factory=list)
+    # False when fetched from the lightweight board and calling points
+    # have not been loaded with GetServiceDetails yet
+    details_loaded: bool = True
 
     @property
     def status(self) -> str:
@@ -90,19 +273,546 @@ class TrainService:
 
 class DarwinApiError(Exception):
     """Exception for Darwin API errors."""
-    pass
+
+    def __init__(self, message: str, transient: bool = False, kind: str = ERROR_UNKNOWN):
+        """Initialize the error.
+
+        transient marks failures worth retrying, such as timeouts,
+        connection errors and 5xx responses. kind is one of the ERROR_*
+        constants, for metrics.
+        """
+        super().__init__(message)
+        self.transient = transient
+        self.kind = kind
+
+
+class CircuitOpenError(DarwinApiError):
+    """Raised without calling Darwin while the circuit breaker is open."""
+
+    def __init__(self, message: str):
+        """Initialize the error."""
+        super().__init__(message, transient=True, kind=ERROR_CIRCUIT_OPEN)
+
+
+class CircuitBreaker:
+    """Stops calling an endpoint after repeated transient failures.
+
+    After `failure_threshold` failed calls in a row the circuit opens and
+    calls fail fast. Once `reset_timeout` seconds have passed a single
+    half-open probe is let through: success closes the circuit again,
+    failure re-opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        """Initialize the breaker in the closed state."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> tuple[bool, bool]:
+        """Return whether a call may be made now and whether it is the half-open probe.
+
+        Both are decided together under the lock, so only one caller is ever
+        the probe, and that caller must end with record_success, record_failure
+        or release_probe.
+        """
+        with self._lock:
+            return self._admit()
+
+    def record_success(self) -> None:
+        """Record that the endpoint answered."""
+        with self._lock:
+            self._record_success()
+
+    def record_failure(self) -> None:
+        """Record a call that failed with a transient error."""
+        with self._lock:
+            self._record_failure()
+
+    def release_probe(self) -> None:
+        """Let another call probe if the half-open probe ended without a result."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        """Return the breaker state for health checks and diagnostics."""
+        retry_in = None
+        if self.state == CIRCUIT_OPEN and self.opened_at is not None:
+            retry_in = max(0.0, round(self.opened_at + self.reset_timeout - time.monotonic(), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected,
+            "retry_in": retry_in,
+        }
+
+    def _admit(self) -> tuple[bool, bool]:
+        """Decide whether a call may be made, moving to half-open when due."""
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False, False
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False, False
+            self._probe_in_flight = True
+            return True, True
+        return True, False
+
+    def _record_success(self) -> None:
+        """Close the circuit."""
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def _record_failure(self) -> None:
+        """Count a failure and open the circuit if needed."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self.times_opened += 1
+                _LOGGER.warning("Darwin circuit breaker opened after %d failures", self.failures)
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+
+
+# One breaker per endpoint, shared by every client talking to it
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(endpoint: str = DARWIN_ENDPOINT) -> CircuitBreaker:
+    """Return the shared circuit breaker for an endpoint."""
+    breaker = _circuit_breakers.get(endpoint)
+    if breaker is None:
+        breaker = _circuit_breakers.setdefault(endpoint, CircuitBreaker())
+    return breaker
+
+
+class LatencyHistogram:
+    """Rolling window of recent upstream latencies.
+
+    Keeps the last `size` successful call durations and answers percentile
+    queries, which is what request hedging needs to decide when a call is
+    running unusually long.
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        """Initialize an empty histogram."""
+        self._samples: deque = deque(maxlen=size)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Return the number of samples in the window."""
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        """Record the duration of a successful call."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def record_hedge(self) -> None:
+        """Count a hedge request being sent."""
+        with self._lock:
+            self.hedges_sent += 1
+
+    def record_hedge_won(self) -> None:
+        """Count a hedge request answering before the original."""
+        with self._lock:
+            self.hedges_won += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the given percentile in seconds, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+    def stats(self) -> dict:
+        """Return latency percentiles and hedging counts."""
+        return {
+            "samples": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
+
+
+# One latency window per endpoint, shared by every client talking to it
+_latency_histograms: dict[str, LatencyHistogram] = {}
+
+
+def get_latency_histogram(endpoint: str = DARWIN_ENDPOINT) -> LatencyHistogram:
+    """Return the shared latency histogram for an endpoint."""
+    histogram = _latency_histograms.get(endpoint)
+    if histogram is None:
+        histogram = _latency_histograms.setdefault(endpoint, LatencyHistogram())
+    return histogram
+
+
+def retry_delay(attempt: int) -> float:
+    """Return a full-jitter exponential backoff delay for a retry attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+
+class ServiceDetailsCache:
+    """Thread-safe TTL cache of calling points keyed by service ID."""
+
+    def __init__(self, ttl: float = SERVICE_DETAILS_TTL, max_entries: int = 500):
+        """Initialize the cache."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, tuple[float, list[CallingPoint]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_id: str) -> Optional[list[CallingPoint]]:
+        """Return cached calling points, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(service_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[service_id]
+            self.misses += 1
+            return None
+
+    def put(self, service_id: str, calling_points: list[CallingPoint]) -> None:
+        """Store calling points for a service."""
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict()
+            self._entries[service_id] = (time.monotonic() + self.ttl, calling_points)
+
+    def _evict(self) -> None:
+        """Drop expired entries, or the oldest half if none have expired."""
+        now = time.monotonic()
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        if not expired:
+            expired = list(self._entries)[:len(self._entries) // 2]
+        for key in expired:
+            del self._entries[key]
+
+
+# Shared by every client so per-request clients in the web app still benefit
+_details_cache = ServiceDetailsCache()
+
+
+def get_details_cache() -> ServiceDetailsCache:
+    """Return the service details cache shared by clients without their own."""
+    return _details_cache
+
+# Runs hedged request pairs; created on first use
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+# Free hedge workers; an attempt that cannot take one is not hedged
+_hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_WORKERS)
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Return the thread pool used for hedged requests."""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS,
+                                                 thread_name_prefix="darwin-hedge")
+        return _hedge_executor
+
+
+def _read_body(response: requests.Response, until: float) -> str:
+    """Read a streamed response body, giving up once time.monotonic() passes until."""
+    chunks = []
+    raw = response.raw
+    try:
+        if hasattr(raw, 'read1'):
+            # urllib3 2: read1 returns what has arrived instead of waiting for a full chunk
+            while chunk := raw.read1(_READ_CHUNK, decode_content=True):
+                chunks.append(chunk)
+                if time.monotonic() > until:
+                    raise requests.Timeout("Response body still arriving at the deadline")
+        else:
+            # urllib3 1 has no read1, so only each socket read is bounded
+            chunks.append(response.content)
+    finally:
+        response.close()
+    return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+
+
+def _submit_hedged(fn, *args) -> Optional[Future]:
+    """Run a call on the hedge pool, or return None if every worker is busy."""
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+    try:
+        # Run in a copy of the caller's context so its spans keep their parent
+        future = _get_hedge_executor().submit(contextvars.copy_context().run, fn, *args)
+    except BaseException:
+        _hedge_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hedge_slots.release())
+    return future
+
+
+# Connection timings for the current thread, set by the traced connection classes
+_connect_timing = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Records when connect() (DNS, TCP and TLS) starts and finishes."""
+
+    def connect(self):
+        """Open the connection, noting its start and end times."""
+        started = time.time_ns()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.span = (started, time.time_ns())
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTP connection with connect timing."""
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS connection with connect timing."""
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    """HTTP pool using timed connections."""
+
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    """HTTPS pool using timed connections."""
+
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """Transport adapter whose connections record connect timing."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Create the pool manager with the timed pool classes."""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def _traced_session() -> requests.Session:
+    """Return a one-shot session like requests.post() uses, with connect timing."""
+    session = requests.Session()
+    adapter = _TimedAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def minutes_until(scheduled: str, now: Optional[datetime] = None) -> Optional[int]:
+    """Minutes from now until an HH:MM time, allowing for midnight wraparound."""
+    try:
+        hours, minutes = map(int, scheduled.split(":"))
+    except (ValueError, AttributeError):
+        return None
+    now = now or datetime.now()
+    diff = hours * 60 + minutes - (now.hour * 60 + now.minute)
+    if diff < -720:  # More than 12 hours negative = next day
+        diff += 1440
+    return max(0, diff)
+
+
+@dataclass
+class _QuerySize:
+    """Learned query size and hit statistics for one board."""
+
+    num_rows: int
+    time_window: int
+    fetches: int = 0
+    filled: int = 0
+    grown: int = 0
+    recent_rows: deque = field(default_factory=lambda: deque(maxlen=SIZER_HISTORY))
+    recent_minutes: deque = field(default_factory=lambda: deque(maxlen=SIZER_HISTORY))
+
+
+class AdaptiveQuerySizer:
+    """Learns the numRows and timeWindow needed to fill a board.
+
+    Sizes are tracked per station, destination filter and number of wanted
+    departures. After each fetch the caller reports how many rows it had to
+    scan to find its departures; the sizer shrinks towards what recent boards
+    needed and grows as soon as a board comes back short.
+    """
+
+    def __init__(
+        self,
+        min_rows: int = DEFAULT_MIN_ROWS,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        min_window: int = DEFAULT_MIN_WINDOW,
+        max_window: int = DEFAULT_MAX_WINDOW,
+        initial_rows: int = DEFAULT_NUM_ROWS,
+        max_boards: int = SIZER_MAX_BOARDS,
+    ):
+        """Initialize the sizer with its bounds."""
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.min_window = min_window
+        self.max_window = max_window
+        self.initial_rows = initial_rows
+        self.max_boards = max_boards
+        self._sizes: OrderedDict[tuple, _QuerySize] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def max_size(self, wanted: int) -> tuple[int, int]:
+        """Return the unadapted query size: the initial rows and full window."""
+        return self._clamp_rows(self.initial_rows, wanted), self.max_window
+
+    def size_for(self, station_crs: str, destinations: Sequence[str],
+                 wanted: int) -> tuple[int, int]:
+        """Return the (num_rows, time_window) to request for a board."""
+        with self._lock:
+            size = self._get(self._key(station_crs, destinations, wanted), wanted)
+            return size.num_rows, size.time_window
+
+    def record(self, station_crs: str, destinations: Sequence[str], wanted: int,
+               services: Sequence[TrainService], consumed: int, filled: bool) -> bool:
+        """Record a fetch that used the first `consumed` rows of `services`.
+
+        Returns True if the board came back short and the query has been
+        grown, so fetching again might fill it.
+        """
+        with self._lock:
+            return self._record(self._key(station_crs, destinations, wanted),
+                                wanted, services, consumed, filled)
+
+    def stats(self) -> dict[str, dict]:
+        """Return the learned size and hit rate for each board."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> dict[str, dict]:
+        """Build the statistics for stats()."""
+        result = {}
+        for (station_crs, destinations, wanted), size in self._sizes.items():
+            name = station_crs
+            if destinations:
+                name += "->" + ",".join(destinations)
+            result[f"{name}/{wanted}"] = {
+                "num_rows": size.num_rows,
+                "time_window": size.time_window,
+                "fetches": size.fetches,
+                "filled": size.filled,
+                "grown": size.grown,
+                # Share of fetches where the learned size was big enough
+                "hit_rate": round(1 - size.grown / size.fetches, 3) if size.fetches else None,
+            }
+        return result
+
+    def _record(self, key: tuple, wanted: int, services: Sequence[TrainService],
+                consumed: int, filled: bool) -> bool:
+        """Update the learned size for one fetch."""
+        size = self._get(key, wanted)
+        size.fetches += 1
+
+        if filled:
+            size.filled += 1
+            size.recent_rows.append(consumed)
+            size.num_rows = self._clamp_rows(max(size.recent_rows) + ROW_HEADROOM, wanted)
+            minutes = minutes_until(services[consumed - 1].scheduled_time) if consumed else None
+            if minutes is not None:
+                size.recent_minutes.append(minutes)
+                size.time_window = self._clamp_window(max(size.recent_minutes) + WINDOW_HEADROOM)
+            return False
+
+        if len(services) >= size.num_rows and size.num_rows < self.max_rows:
+            # Darwin returned every row we asked for, so ask for more
+            size.num_rows = self._clamp_rows(size.num_rows * 2, wanted)
+        elif len(services) < size.num_rows and size.time_window < self.max_window:
+            # Fewer trains than rows, so the time window cut the board short
+            size.time_window = self.max_window
+        else:
+            # Already at the bounds - the station has no more trains
+            return False
+        size.grown += 1
+        return True
+
+    def _get(self, key: tuple, wanted: int) -> _QuerySize:
+        """Return the size for a board, creating it at the full size."""
+        size = self._sizes.get(key)
+        if size is not None:
+            self._sizes.move_to_end(key)
+            return size
+        num_rows, time_window = self.max_size(wanted)
+        size = self._sizes[key] = _QuerySize(num_rows, time_window)
+        if len(self._sizes) > self.max_boards:
+            self._sizes.popitem(last=False)
+        return size
+
+    def _clamp_rows(self, num_rows: int, wanted: int) -> int:
+        """Keep a row count within bounds and no smaller than the departures wanted."""
+        return min(self.max_rows, max(self.min_rows, wanted, num_rows))
+
+    def _clamp_window(self, time_window: int) -> int:
+        """Keep a time window within bounds."""
+        return min(self.max_window, max(self.min_window, time_window))
+
+    @staticmethod
+    def _key(station_crs: str, destinations: Sequence[str], wanted: int) -> tuple:
+        """Build the lookup key for a board."""
+        return station_crs.upper(), tuple(sorted(d.upper() for d in destinations)), wanted
 
 
 class DarwinApi:
     """Client for the National Rail Darwin SOAP API."""
 
-    def __init__(self, api_token: str):
-        """Initialize the Darwin API client."""
+    def __init__(self, api_token: str,
+                 details_cache: Optional[ServiceDetailsCache] = None,
+                 hedge: bool = False,
+                 endpoint: str = DARWIN_ENDPOINT,
+                 metrics=None,
+                 tracer=None):
+        """Initialize the Darwin API client.
+
+        With hedge=True a second request is sent when the first one runs
+        past the recent p95 latency, and whichever answers first is used.
+        endpoint can point the client at a local simulator. metrics, if
+        given, receives upstream and parse timings and errors (see
+        metrics.DarwinMetrics). tracer, if given, records a span for each
+        stage of every call (see tracing.Tracer).
+        """
         self._api_token = api_token
+        self._endpoint = endpoint
+        self._metrics = metrics
+        self._tracer = tracer or NOOP_TRACER
+        self._details_cache = details_cache or _details_cache
+        self._breaker = get_circuit_breaker(endpoint)
+        self._latency = get_latency_histogram(endpoint)
+        self._hedge = hedge
 
     def _build_request(self, station_crs: str, num_rows: int,
                        destination_crs: Optional[str] = None,
-                       time_offset: int = 0, time_window: int = 120) -> str:
+                       time_offset: int = 0, time_window: int = 120,
+                       with_details: bool = True) -> str:
         """Build the SOAP request XML."""
         filter_section = ""
         if destination_crs:
@@ -110,6 +820,25 @@ class DarwinApi:
             <ldb:filterCrs>{destination_crs.upper()}</ldb:filterCrs>
             <ldb:filterType>to</ldb:filterType>"""
 
+        operation = "GetDepBoardWithDetailsRequest" if with_details else "GetDepartureBoardRequest"
+
+        return self._build_envelope(f"""
+        <ldb:{operation}>
+            <ldb:numRows>{num_rows}</ldb:numRows>
+            <ldb:crs>{station_crs.upper()}</ldb:crs>{filter_section}
+            <ldb:timeOffset>{time_offset}</ldb:timeOffset>
+            <ldb:timeWindow>{time_window}</ldb:timeWindow>
+        </ldb:{operation}>""")
+
+    def _build_details_request(self, service_id: str) -> str:
+        """Build the SOAP request XML for GetServiceDetails."""
+        return self._build_envelope(f"""
+        <ldb:GetServiceDetailsRequest>
+            <ldb:serviceID>{service_id}</ldb:serviceID>
+        </ldb:GetServiceDetailsRequest>""")
+
+    def _build_envelope(self, body: str) -> str:
+        """Wrap a request body in the SOAP envelope with the access token."""
         return f"""<?xml version="1.0" encoding="utf-8"?>
 <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
                xmlns:typ="http://thalesgroup.com/RTTI/2013-11-28/Token/types"
@@ -119,13 +848,7 @@ class DarwinApi:
             <typ:TokenValue>{self._api_token}</typ:TokenValue>
         </typ:AccessToken>
     </soap:Header>
-    <soap:Body>
-        <ldb:GetDepBoardWithDetailsRequest>
-            <ldb:numRows>{num_rows}</ldb:numRows>
-            <ldb:crs>{station_crs.upper()}</ldb:crs>{filter_section}
-            <ldb:timeOffset>{time_offset}</ldb:timeOffset>
-            <ldb:timeWindow>{time_window}</ldb:timeWindow>
-        </ldb:GetDepBoardWithDetailsRequest>
+    <soap:Body>{body}
     </soap:Body>
 </soap:Envelope>"""
 
@@ -136,65 +859,321 @@ class DarwinApi:
         destination_crs: Optional[str] = None,
         time_offset: int = 0,
         time_window: int = 120,
+        with_details: bool = True,
+        deadline: Optional[float] = None,
     ) -> list[TrainService]:
-        """Get the departure board for a station."""
+        """Get the departure board for a station.
+
+        With with_details=False the lightweight GetDepartureBoard call is
+        used and calling points are left for load_calling_points().
+        deadline is an optional time.monotonic() value by which the call,
+        including retries, must finish.
+        """
+        soap_action = SOAP_ACTION_DEP_BOARD_WITH_DETAILS if with_details else SOAP_ACTION_DEP_BOARD
+        services = self._call(
+            soap_action,
+            lambda: self._build_request(station_crs, num_rows, destination_crs,
+                                        time_offset, time_window, with_details),
+            self._parse_response, deadline, station_crs.upper(),
+        )
+        if not with_details:
+            for service in services:
+                service.details_loaded = False
+        return services
+
+    def get_service_details(self, service_id: str,
+                            deadline: Optional[float] = None) -> list[CallingPoint]:
+        """Get the subsequent calling points for a service, using the cache."""
+        calling_points = self._details_cache.get(service_id)
+        if calling_points is not None:
+            return calling_points
+
+        calling_points = self._call(
+            SOAP_ACTION_SERVICE_DETAILS, lambda: self._build_details_request(service_id),
+            self._parse_details_response, deadline
+        )
+        self._details_cache.put(service_id, calling_points)
+        return calling_points
+
+    def load_calling_points(self, services: list[TrainService],
+                            deadline: Optional[float] = None) -> None:
+        """Fill in calling points for services fetched without details."""
+        for service in services:
+            if service.details_loaded:
+                continue
+            try:
+                service.calling_points = self.get_service_details(service.service_id, deadline)
+                service.details_loaded = True
+            except DarwinApiError as e:
+                _LOGGER.warning("Failed to load calling points for %s: %s",
+                                service.service_id, str(e))
+
+    def circuit_state(self) -> dict:
+        """Return the state of the circuit breaker for the Darwin endpoint."""
+        return self._breaker.stats()
+
+    def latency_stats(self) -> dict:
+        """Return recent upstream latency percentiles and hedging counts."""
+        return self._latency.stats()
+
+    def _call(self, soap_action: str, build_request, parser,
+              deadline: Optional[float] = None, station: str = ""):
+        """Build, post and parse a request, reporting to metrics and the tracer."""
+        operation = soap_action.rsplit('/', 1)[-1]
+        tracer = self._tracer
+        attributes = {'darwin.operation': operation}
+        if station:
+            attributes['darwin.station'] = station
         try:
-            soap_request = self._build_request(
-                station_crs, num_rows, destination_crs, time_offset, time_window
-            )
+            with tracer.span(f'darwin.{operation}', attributes) as span:
+                with tracer.span('darwin.build_request'):
+                    soap_request = build_request()
+                started = time.monotonic()
+                xml_text = self._post(soap_action, soap_request, deadline)
+                received = time.monotonic()
+                with tracer.span('darwin.parse'):
+                    result = self._parse(parser, xml_text)
+                span.set_attribute('darwin.rows', len(result))
+        except DarwinApiError as e:
+            if self._metrics:
+                self._metrics.record_error(operation, e.kind, str(e))
+            raise
+
+        if self._metrics:
+            self._metrics.observe_upstream(operation, station, received - started,
+                                           len(xml_text.encode('utf-8')))
+            self._metrics.observe_parse(operation, time.monotonic() - received)
+        return result
+
+    def _post(self, soap_action: str, soap_request: str,
+              deadline: Optional[float] = None) -> str:
+        """Send a SOAP request, retrying transient errors with backoff."""
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DarwinApiError("Deadline exceeded before calling Darwin", transient=True,
+                                 kind=ERROR_DEADLINE)
+        allowed, probe = self._breaker.admit()
+        if not allowed:
+            raise CircuitOpenError("Darwin API unavailable - circuit breaker open")
+
+        # A half-open probe gets a single attempt so recovery is detected quickly
+        attempts = 1 if probe else RETRY_ATTEMPTS
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    text = self._post_hedged(soap_action, soap_request,
+                                             self._read_timeout(deadline))
+                except DarwinApiError as e:
+                    if not e.transient:
+                        # Darwin answered, so the endpoint itself is healthy
+                        self._breaker.record_success()
+                        raise
+                    delay = retry_delay(attempt)
+                    out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                    if attempt == attempts or out_of_time:
+                        self._breaker.record_failure()
+                        raise
+                    _LOGGER.warning("Darwin request failed (%s), retry %d/%d in %.1fs",
+                                    str(e), attempt, attempts - 1, delay)
+                    if self._metrics:
+                        self._metrics.record_retry(soap_action.rsplit('/', 1)[-1], e.kind)
+                    with self._tracer.span('darwin.backoff', {'retry.attempt': attempt}):
+                        time.sleep(delay)
+                else:
+                    self._breaker.record_success()
+                    return text
+        finally:
+            if probe:
+                # Cancelled or failed unexpectedly: don't block every later call
+                self._breaker.release_probe()
+
+    def _read_timeout(self, deadline: Optional[float]) -> float:
+        """Return the time allowed for one attempt, capped by the deadline."""
+        if deadline is None:
+            return READ_TIMEOUT
+        return max(0.1, min(READ_TIMEOUT, deadline - time.monotonic()))
+
+    def _post_hedged(self, soap_action: str, soap_request: str, read_timeout: float) -> str:
+        """Send a request, hedging with a second one if the first runs long."""
+        hedge_after = None
+        if self._hedge and self._latency.count >= HEDGE_MIN_SAMPLES:
+            hedge_after = max(HEDGE_MIN_DELAY, self._latency.percentile(HEDGE_PERCENTILE))
+        if hedge_after is None or hedge_after >= read_timeout:
+            return self._post_once(soap_action, soap_request, read_timeout)
 
+        # Queueing behind other calls' hedges would defeat the point, so a
+        # saturated pool means sending the request without a hedge
+        first = _submit_hedged(self._post_once, soap_action, soap_request, read_timeout)
+        if first is None:
+            return self._post_once(soap_action, soap_request, read_timeout)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        second = _submit_hedged(self._post_once, soap_action, soap_request,
+                                max(0.1, read_timeout - hedge_after))
+        if second is None:
+            return first.result()
+        self._latency.record_hedge()
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._latency.record_hedge_won()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _post_once(self, soap_action: str, soap_request: str,
+                   read_timeout: float = READ_TIMEOUT) -> str:
+        """Send a SOAP request once and return the response body."""
+        if not self._tracer.enabled:
+            return self._send(soap_action, soap_request, read_timeout)
+        with self._tracer.span('darwin.http', {'http.method': 'POST', 'http.url': self._endpoint}):
+            return self._send(soap_action, soap_request, read_timeout)
+
+    def _send(self, soap_action: str, soap_request: str, read_timeout: float) -> str:
+        """Post a SOAP request and return the response body."""
+        try:
             headers = {
                 'Content-Type': 'text/xml; charset=utf-8',
-                'SOAPAction': 'http://thalesgroup.com/RTTI/2015-05-14/ldb/GetDepBoardWithDetails'
+                'SOAPAction': soap_action
             }
 
-            response = requests.post(
-                DARWIN_ENDPOINT,
-                data=soap_request,
-                headers=headers,
-                timeout=30
-            )
+            started = time.monotonic()
+            # requests only bounds the connect and each socket read, so the
+            # body is streamed and the attempt's whole time checked as it arrives
+            until = started + read_timeout
+            timeout = (min(CONNECT_TIMEOUT, read_timeout), read_timeout)
+            if self._tracer.enabled:
+                response, text = self._post_traced(soap_request, headers, timeout, until)
+            else:
+                response = requests.post(
+                    self._endpoint,
+                    data=soap_request,
+                    headers=headers,
+                    timeout=timeout,
+                    stream=True,
+                )
+                text = _read_body(response, until)
 
             if response.status_code == 401:
-                raise DarwinApiError("Invalid API token - authentication failed")
+                raise DarwinApiError("Invalid API token - authentication failed",
+                                     kind=ERROR_AUTH)
 
             if response.status_code != 200:
-                raise DarwinApiError(f"API returned status {response.status_code}")
+                fault = self._fault_string(text)
+                if fault:
+                    raise DarwinApiError(fault, kind=ERROR_SOAP_FAULT)
+                raise DarwinApiError(
+                    f"API returned status {response.status_code}",
+                    transient=response.status_code >= 500 or response.status_code == 429,
+                    kind=ERROR_HTTP,
+                )
 
-            return self._parse_response(response.text)
+            self._latency.observe(time.monotonic() - started)
+            return text
 
+        except requests.Timeout as e:
+            _LOGGER.error("Request timed out: %s", str(e))
+            raise DarwinApiError(f"Connection error: {str(e)}", transient=True,
+                                 kind=ERROR_TIMEOUT) from e
         except requests.RequestException as e:
             _LOGGER.error("Request error: %s", str(e))
-            raise DarwinApiError(f"Connection error: {str(e)}") from e
-        except ET.ParseError as e:
-            _LOGGER.error("XML parse error: %s", str(e))
-            raise DarwinApiError(f"Failed to parse response: {str(e)}") from e
+            raise DarwinApiError(f"Connection error: {str(e)}", transient=True,
+                                 kind=ERROR_CONNECTION) from e
+        except DarwinApiError:
+            raise
         except Exception as e:
             _LOGGER.error("Unexpected error: %s", str(e))
             raise DarwinApiError(f"Unexpected error: {str(e)}") from e
 
-    def _parse_response(self, xml_text: str) -> list[TrainService]:
-        """Parse the SOAP response XML into TrainService objects."""
+    def _post_traced(self, soap_request: str, headers: dict, timeout: tuple[float, float],
+                     until: float) -> tuple[requests.Response, str]:
+        """Post with connect, upstream wait and body read recorded as spans."""
+        tracer = self._tracer
+        _connect_timing.span = None
+        started = time.time_ns()
+        with _traced_session() as session:
+            response = session.post(
+                self._endpoint,
+                data=soap_request,
+                headers=headers,
+                timeout=timeout,
+                stream=True,
+            )
+            headers_received = time.time_ns()
+            connect = _connect_timing.span
+            if connect is not None:
+                tracer.record_span('darwin.connect', *connect)
+            tracer.record_span('darwin.upstream_wait', connect[1] if connect else started,
+                               headers_received, {'http.status_code': response.status_code})
+            with tracer.span('darwin.read_body') as span:
+                text = _read_body(response, until)
+                span.set_attribute('http.response_content_length', len(text))
+        return response, text
+
+    def _parse(self, parser, xml_text: str):
+        """Run a response parser, turning XML errors into DarwinApiError."""
+        try:
+            return parser(xml_text)
+        except ET.ParseError as e:
+            _LOGGER.error("XML parse error: %s", str(e))
+            raise DarwinApiError(f"Failed to parse response: {str(e)}",
+                                 kind=ERROR_PARSE) from e
+
+    def _fault_string(self, xml_text: str) -> Optional[str]:
+        """Return the SOAP fault message in an error response, if any."""
+        try:
+            fault = ET.fromstring(xml_text).find('.//soap:Fault', NS)
+        except ET.ParseError:
+            return None
+        if fault is None:
+            return None
+        fault_string = fault.find('faultstring')
+        return fault_string.text if fault_string is not None else "Unknown SOAP fault"
+
+    def _parse_root(self, xml_text: str):
+        """Parse the SOAP envelope and raise on a SOAP fault."""
         root = ET.fromstring(xml_text)
 
         # Check for SOAP fault
         fault = root.find('.//soap:Fault', NS)
         if fault is not None:
             fault_string = fault.find('faultstring')
-            raise DarwinApiError(fault_string.text if fault_string is not None else "Unknown SOAP fault")
+            raise DarwinApiError(
+                fault_string.text if fault_string is not None else "Unknown SOAP fault",
+                kind=ERROR_SOAP_FAULT,
+            )
+
+        return root
+
+    def _parse_response(self, xml_text: str) -> list[TrainService]:
+        """Parse the SOAP response XML into TrainService objects."""
+        xml_text, slices, namespaces = _cut_calling_points(xml_text)
+        root = self._parse_root(xml_text)
+        # One decoder shared by every service; it must not hold the response
+        decode = partial(self._decode_calling_points, namespaces)
 
         services = []
 
         # Find all train services in the response
         for service in root.findall('.//lt8:service', NS):
-            train_service = self._parse_service(service)
+            train_service = self._parse_service(service, slices, decode)
             if train_service:
                 services.append(train_service)
 
         return services
 
-    def _parse_service(self, service_elem) -> Optional[TrainService]:
-        """Parse a service element into a TrainService object."""
+    def _parse_service(self, service_elem, slices: Sequence[str] = (),
+                       decode=None) -> Optional[TrainService]:
+        """Parse a service element into a TrainService object.
+
+        slices and decode come from _parse_response when the calling point
+        lists were cut out; without them they are decoded from the element.
+        """
         try:
             # Get basic service info
             service_id = self._get_text(service_elem, 'lt4:serviceID')
@@ -227,22 +1206,15 @@ class DarwinApi:
             cancel_reason = self._get_text(service_elem, 'lt4:cancelReason')
             delay_reason = self._get_text(service_elem, 'lt4:delayReason')
 
-            # Get calling points
-            calling_points = []
-            for cp in service_elem.findall('.//lt8:callingPoint', NS):
-                cp_name = self._get_text(cp, 'lt8:locationName')
-                cp_crs = self._get_text(cp, 'lt8:crs') or ""
-                cp_st = self._get_text(cp, 'lt8:st') or ""
-                cp_et = self._get_text(cp, 'lt8:et') or "On time"
-
-                if cp_name:
-                    calling_points.append(CallingPoint(
-                        station_name=cp_name,
-                        crs=cp_crs,
-                        scheduled_time=cp_st,
-                        expected_time=cp_et,
-                        is_cancelled=cp_et == "Cancelled"
-                    ))
+            # Keep calling points as raw XML until something reads them
+            raw = "".join(slices[int(child.get(_RAW_REF))]
+                          for child in service_elem if child.get(_RAW_REF) is not None)
+            if raw:
+                calling_points = LazyCallingPoints(raw, decode)
+            else:
+                calling_points = self._parse_calling_points(
+                    service_elem.findall('.//lt8:callingPoint', NS)
+                )
 
             return TrainService(
                 service_id=service_id,
@@ -263,6 +1235,42 @@ class DarwinApi:
             _LOGGER.warning("Failed to parse service: %s", str(e))
             return None
 
+    def _parse_details_response(self, xml_text: str) -> list[CallingPoint]:
+        """Parse a GetServiceDetails response into its subsequent calling points."""
+        root = self._parse_root(xml_text)
+        return self._parse_calling_points(
+            root.findall('.//lt8:subsequentCallingPoints//lt8:callingPoint', NS)
+        )
+
+    def _decode_calling_points(self, namespaces: str, raw: str) -> list[CallingPoint]:
+        """Parse calling point lists cut from a response into CallingPoint objects."""
+        try:
+            root = ET.fromstring(f"<callingPoints{namespaces}>{raw}</callingPoints>")
+        except ET.ParseError as e:
+            # Raised on first access, far from the response, so don't propagate
+            _LOGGER.warning("Failed to decode calling points: %s", str(e))
+            return []
+        return self._parse_calling_points(root.iterfind('.//lt8:callingPoint', NS))
+
+    def _parse_calling_points(self, cp_elems) -> list[CallingPoint]:
+        """Parse callingPoint elements into CallingPoint objects."""
+        calling_points = []
+        for cp in cp_elems:
+            cp_name = self._get_text(cp, 'lt8:locationName')
+            cp_crs = self._get_text(cp, 'lt8:crs') or ""
+            cp_st = self._get_text(cp, 'lt8:st') or ""
+            cp_et = self._get_text(cp, 'lt8:et') or "On time"
+
+            if cp_name:
+                calling_points.append(CallingPoint(
+                    station_name=cp_name,
+                    crs=cp_crs,
+                    scheduled_time=cp_st,
+                    expected_time=cp_et,
+                    is_cancelled=cp_et == "Cancelled"
+                ))
+        return calling_points
+
     def _get_text(self, elem, path: str) -> Optional[str]:
         """Get text content from an element by path."""
         # Try with each namespace prefix
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for serving the departure board in production
+
+Used automatically when gunicorn is started from this directory:
+
+    gunicorn app:app
+
+There is always exactly one worker process, scaled with threads: a board
+request spends most of its time waiting on Darwin, and the screen pollers,
+circuit breaker, caches, learned query sizes, /metrics, /health and the
+punctuality file all live in (or are written from) process memory. A second
+worker would poll every screen station again, answer /metrics and /health
+from its own counters, and overwrite the other's punctuality counts.
+
+Configuration (environment):
+    PORT                  listen port (default 5000)
+    WEB_THREADS           threads per worker (default 8)
+    WEB_TIMEOUT           seconds before a stuck worker is restarted (default 60)
+    WEB_GRACEFUL_TIMEOUT  seconds to finish in-flight requests on SIGTERM (default 10)
+    LOG_LEVEL             gunicorn log level (default info)
+"""
+
+import os
+import random
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = 'gthread'
+# One worker only; see above
+workers = 1
+threads = int(os.environ.get('WEB_THREADS', '8'))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+# Longer than REQUEST_DEADLINE, so only a truly stuck worker is killed
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+# On SIGTERM, stop accepting connections and let in-flight requests finish
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '10'))
+keepalive = 5
+
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+accesslog = '-' if loglevel == 'debug' else None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Reseed random in each worker so trace IDs and retry jitter differ."""
+    random.seed()
@@ -0,0 +1,260 @@
+"""
+On-demand request profiling for the standalone departure board
+
+A sampled fraction of requests is profiled and written to PROFILE_DIR,
+one file per request in a subdirectory per endpoint. Only the newest
+PROFILE_KEEP files are kept for each endpoint.
+
+Modes:
+    cprofile  deterministic profile saved as .prof (open with pstats,
+              snakeviz or gprof2dot)
+    stacks    statistical sampler saved as .folded collapsed stacks, ready
+              for flamegraph.pl or speedscope; much lower overhead, so it
+              suits a Raspberry Pi under real load
+
+Configuration (environment):
+    PROFILE_REQUESTS     true to profile from startup (default false)
+    PROFILE_MODE         cprofile | stacks (default stacks)
+    PROFILE_SAMPLE_RATE  fraction of requests profiled (default 0.1)
+    PROFILE_DIR          output directory (default profiles)
+    PROFILE_KEEP         files kept per endpoint (default 20)
+    PROFILE_INTERVAL     stack sampling interval in seconds (default 0.005)
+    PROFILE_TOKEN        enables the /admin/profiling route when set
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+MODE_CPROFILE = "cprofile"
+MODE_STACKS = "stacks"
+MODES = (MODE_CPROFILE, MODE_STACKS)
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_KEEP = 20
+DEFAULT_INTERVAL = 0.005  # seconds
+
+_EXTENSIONS = {MODE_CPROFILE: '.prof', MODE_STACKS: '.folded'}
+
+
+def _safe_name(name: str) -> str:
+    """Return name reduced to characters safe in a file name."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'unknown'
+
+
+def _frame_label(frame) -> str:
+    """Return a flamegraph label for a stack frame."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from a background thread.
+
+    The thread runs only while at least one request is being sampled.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        """Initialize the sampler."""
+        self.interval = interval
+        self._threads: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int) -> Counter:
+        """Start sampling a thread; returns the counter its stacks go into."""
+        stacks = Counter()
+        with self._lock:
+            self._threads[thread_id] = stacks
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler',
+                                                daemon=True)
+                self._thread.start()
+        return stacks
+
+    def remove(self, thread_id: int) -> Counter:
+        """Stop sampling a thread and return its collapsed stacks."""
+        with self._lock:
+            return self._threads.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        """Sample until no threads are registered."""
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._threads:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for thread_id, stacks in self._threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stacks[';'.join(reversed(labels))] += 1
+            time.sleep(self.interval)
+
+
+class _Capture:
+    """An in-progress profile of one request."""
+
+    __slots__ = ('endpoint', 'mode', 'started', 'profile', 'thread_id')
+
+    def __init__(self, endpoint: str, mode: str):
+        """Initialize the capture."""
+        self.endpoint = endpoint
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.profile: Optional[cProfile.Profile] = None
+        self.thread_id: Optional[int] = None
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests and writes rotating files."""
+
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, enabled: bool = False,
+                 mode: str = MODE_STACKS, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 keep: int = DEFAULT_KEEP, interval: float = DEFAULT_INTERVAL):
+        """Initialize the profiler."""
+        self.directory = directory
+        self.enabled = enabled
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.profiled = 0
+        self._sampler = StackSampler(interval)
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, mode: Optional[str] = None,
+                  sample_rate: Optional[float] = None) -> None:
+        """Change settings at runtime; raises ValueError on a bad value."""
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if sample_rate is not None and not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        with self._lock:
+            if mode is not None:
+                self.mode = mode
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if enabled is not None:
+                self.enabled = enabled
+
+    def start(self, endpoint: str) -> Optional[_Capture]:
+        """Begin profiling the current request if it is sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        capture = _Capture(endpoint, self.mode)
+        if capture.mode == MODE_CPROFILE:
+            capture.profile = cProfile.Profile()
+            try:
+                capture.profile.enable()
+            except ValueError:
+                # Another profiler is active in this thread
+                return None
+        else:
+            capture.thread_id = threading.get_ident()
+            self._sampler.add(capture.thread_id)
+        return capture
+
+    def stop(self, capture: Optional[_Capture]) -> Optional[str]:
+        """Finish a capture, write its file and return the path."""
+        if capture is None:
+            return None
+        elapsed_ms = (time.perf_counter() - capture.started) * 1000
+        if capture.profile is not None:
+            capture.profile.disable()
+        else:
+            stacks = self._sampler.remove(capture.thread_id)
+        try:
+            folder = os.path.join(self.directory, _safe_name(capture.endpoint))
+            os.makedirs(folder, exist_ok=True)
+            name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{elapsed_ms:.0f}ms{_EXTENSIONS[capture.mode]}"
+            path = os.path.join(folder, name)
+            if capture.profile is not None:
+                capture.profile.dump_stats(path)
+            else:
+                with open(path, 'w', encoding='utf-8') as out:
+                    out.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+            self._rotate(folder)
+        except OSError as e:
+            _LOGGER.warning("Failed to write profile: %s", str(e))
+            return None
+        with self._lock:
+            self.profiled += 1
+        return path
+
+    def _rotate(self, folder: str) -> None:
+        """Delete all but the newest keep files in folder."""
+        files = sorted(
+            (entry for entry in os.scandir(folder) if entry.is_file()),
+            key=lambda entry: entry.name,
+        )
+        for entry in files[:-self.keep] if self.keep > 0 else files:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def files(self) -> dict[str, list[str]]:
+        """Return the stored profile file names, newest first, by endpoint."""
+        result = {}
+        try:
+            folders = sorted(e for e in os.scandir(self.directory) if e.is_dir())
+        except OSError:
+            return result
+        for folder in folders:
+            result[folder.name] = sorted(
+                (e.name for e in os.scandir(folder.path) if e.is_file()), reverse=True
+            )
+        return result
+
+    def path_for(self, endpoint: str, name: str) -> Optional[str]:
+        """Return the path of a stored profile, or None if it does not exist."""
+        for part in (endpoint, name):
+            if _safe_name(part) != part or part.startswith('.'):
+                return None
+        path = os.path.join(self.directory, endpoint, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self) -> dict:
+        """Return the current settings and stored files."""
+        return {
+            'enabled': self.enabled,
+            'mode': self.mode,
+            'sample_rate': self.sample_rate,
+            'keep': self.keep,
+            'directory': os.path.abspath(self.directory),
+            'profiled': self.profiled,
+            'files': self.files(),
+        }
+
+
+def profiler_from_env() -> RequestProfiler:
+    """Build the profiler configured by the PROFILE_* environment variables."""
+    mode = os.environ.get('PROFILE_MODE', MODE_STACKS).lower()
+    if mode not in MODES:
+        _LOGGER.warning("Unknown PROFILE_MODE %r; using %s", mode, MODE_STACKS)
+        mode = MODE_STACKS
+    return RequestProfiler(
+        directory=os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR),
+        enabled=os.environ.get('PROFILE_REQUESTS', 'false').lower() == 'true',
+        mode=mode,
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)),
+        keep=int(os.environ.get('PROFILE_KEEP', DEFAULT_KEEP)),
+        interval=float(os.environ.get('PROFILE_INTERVAL', DEFAULT_INTERVAL)),
+    )
@@ -25,6 +25,19 @@ export DARWIN_API_TOKEN=$(python3 -c "import json; print(json.load(open('$CONFIG
 export STATION_CRS=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH'))['station_crs'])")
 export DESTINATION_CRS=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH')).get('destination_filter', ''))")
 export NUM_DEPARTURES=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH'))['num_departures'])")
+export LAZY_CALLING_POINTS=$(python3 -c "import json; print(str(json.load(open('$CONFIG_PATH')).get('lazy_calling_points', False)).lower())")
+TRACE_REQUESTS=$(python3 -c "import json; print(str(json.load(open('$CONFIG_PATH')).get('trace_requests', False)).lower())")
+if [ "$TRACE_REQUESTS" = "true" ]; then
+    export TRACING_EXPORTER=console
+fi
+export PROFILE_TOKEN=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH')).get('profiling_token', ''))")
+export PROFILE_DIR=/data/profiles
+export PUNCTUALITY_FILE=/data/punctuality.json
+export WEB_THREADS=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH')).get('web_threads', 8))")
+DEPARTURE_HISTORY=$(python3 -c "import json; print(str(json.load(open('$CONFIG_PATH')).get('departure_history', False)).lower())")
+if [ "$DEPARTURE_HISTORY" = "true" ]; then
+    export HISTORY_DB=/data/history.db
+fi
 export LOG_LEVEL=$(python3 -c "import json; print(json.load(open('$CONFIG_PATH'))['log_level'])")
 
 # Set Flask to run on the ingress port
@@ -35,8 +48,13 @@ echo "Web UI Configuration:"
 echo "  Station: ${STATION_CRS}"
 echo "  Destination Filter: ${DESTINATION_CRS:-none}"
 echo "  Number of Departures: ${NUM_DEPARTURES}"
+echo "  Lazy Calling Points: ${LAZY_CALLING_POINTS}"
+echo "  Trace Requests: ${TRACE_REQUESTS}"
+echo "  Departure History: ${DEPARTURE_HISTORY}"
+echo "  Web Server: gunicorn, 1 worker x ${WEB_THREADS} threads"
 echo "=============================================="
 
-# Start the Flask application
+# Start the app under gunicorn (settings in /app/gunicorn.conf.py); exec so
+# SIGTERM from the Supervisor reaches gunicorn and in-flight requests finish
 cd /app
-exec python3 app.py
+exec gunicorn app:app
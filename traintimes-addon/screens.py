@@ -0,0 +1,313 @@
+"""
+Multi-screen mode for the standalone departure board
+
+A registry of configured screens, each showing one station with its own
+destination filter and number of rows, served at /screen/<id>. Screens on
+the same station share a single upstream poller: one Darwin board is
+fetched per station every SCREEN_POLL_INTERVAL seconds and every screen's
+view is derived from it in memory, so a screen request never waits on
+Darwin once its station is warm. A station is only polled while at least
+one of its screens has asked for it within SCREEN_IDLE_SECONDS.
+
+The screens file is YAML (JSON works too) with a top-level screens list:
+
+    screens:
+      - id: pad-concourse
+        station: PAD
+        num: 10
+      - id: pad-platform-1
+        station: PAD
+        destination: RDG,OXF
+        num: 3
+        name: Platform 1 - Reading line
+
+Configuration (environment):
+    SCREENS_FILE          screens file; enables multi-screen mode when set
+    SCREEN_POLL_INTERVAL  seconds between polls of a station (default 30)
+    SCREEN_IDLE_SECONDS   stop polling a station after this long without a
+                          request from any of its screens (default 300)
+    SCREEN_POLL_WORKERS   stations polled at the same time (default 8)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from stations import get_station_index
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_NUM = 6
+DEFAULT_POLL_INTERVAL = 30.0  # seconds
+DEFAULT_IDLE_SECONDS = 300.0
+DEFAULT_POLL_WORKERS = 8
+
+_SCREEN_ID = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+@dataclass(frozen=True)
+class Screen:
+    """A configured display: one station, its destination filter and rows."""
+
+    id: str
+    station: str
+    destinations: tuple[str, ...] = ()
+    num: int = DEFAULT_NUM
+    name: str = ''
+
+
+def parse_screens(data: Any) -> dict[str, Screen]:
+    """Build the screen registry from parsed config; raises ValueError if invalid."""
+    entries = data.get('screens') if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError("expected a 'screens' list")
+    index = get_station_index()
+    screens = {}
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"screen {position}: expected a mapping")
+        screen_id = str(entry.get('id', ''))
+        if not _SCREEN_ID.match(screen_id):
+            raise ValueError(f"screen {position}: id must be 1-64 letters, digits, '.', '_' or '-'")
+        if screen_id in screens:
+            raise ValueError(f"screen {screen_id}: duplicate id")
+        station = str(entry.get('station', '')).strip().upper()
+        if not index.accepts(station):
+            raise ValueError(f"screen {screen_id}: unknown station {station!r}")
+        destination = entry.get('destination') or ''
+        if isinstance(destination, list):
+            destination = ','.join(str(d) for d in destination)
+        destinations = tuple(d.strip().upper() for d in str(destination).split(',') if d.strip())
+        bad = [d for d in destinations if not index.accepts(d)]
+        if bad:
+            raise ValueError(f"screen {screen_id}: unknown destination {', '.join(bad)}")
+        try:
+            num = int(entry.get('num', DEFAULT_NUM))
+        except (TypeError, ValueError):
+            raise ValueError(f"screen {screen_id}: num must be a number") from None
+        if not 1 <= num <= 20:
+            raise ValueError(f"screen {screen_id}: num must be between 1 and 20")
+        screens[screen_id] = Screen(screen_id, station, destinations, num,
+                                    str(entry.get('name') or ''))
+    return screens
+
+
+def load_screens(path: str) -> dict[str, Screen]:
+    """Read the screens file; raises ValueError or OSError if it is unusable."""
+    with open(path, encoding='utf-8') as source:
+        text = source.read()
+    try:
+        import yaml
+    except ImportError:
+        # Without PyYAML only JSON screens files can be read
+        data = json.loads(text)
+    else:
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(str(e)) from e
+    return parse_screens(data)
+
+
+class _StationBoard:
+    """Shared poll state for the screens on one station."""
+
+    __slots__ = ('station', 'screens', 'views', 'updated', 'error', 'last_request',
+                 'next_poll', 'polling', 'done', 'polls', 'failures', 'poll_ms')
+
+    def __init__(self, station: str):
+        """Initialize the board."""
+        self.station = station
+        self.screens: list[Screen] = []
+        self.views: dict[str, Any] = {}
+        self.updated: Optional[float] = None
+        self.error: Optional[str] = None
+        self.last_request = float('-inf')
+        self.next_poll = 0.0
+        self.polling = False
+        # Set whenever no poll is outstanding; replaced when one is queued
+        self.done = threading.Event()
+        self.done.set()
+        self.polls = 0
+        self.failures = 0
+        self.poll_ms: Optional[float] = None
+
+
+class ScreenHub:
+    """Polls each station once for all its screens and keeps their views.
+
+    refresh(station, screens) fetches the station's board and returns a
+    view per screen id; it may raise, in which case the previous views are
+    kept and the error is reported alongside them.
+    """
+
+    def __init__(self, screens: dict[str, Screen],
+                 refresh: Callable[[str, list[Screen]], dict[str, Any]],
+                 interval: float = DEFAULT_POLL_INTERVAL,
+                 idle: float = DEFAULT_IDLE_SECONDS,
+                 workers: int = DEFAULT_POLL_WORKERS):
+        """Initialize the hub."""
+        self.screens = screens
+        self.refresh = refresh
+        self.interval = interval
+        self.idle = idle
+        self.workers = workers
+        self._boards: dict[str, _StationBoard] = {}
+        for screen in screens.values():
+            board = self._boards.get(screen.station)
+            if board is None:
+                board = self._boards[screen.station] = _StationBoard(screen.station)
+            board.screens.append(screen)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def view(self, screen_id: str, timeout: float) -> tuple[Optional[Any], Optional[str]]:
+        """Return a screen's latest view and the station's last error.
+
+        A station that was idle is polled straight away. While its views are
+        out of date, waits up to timeout for the poll in progress rather than
+        returning an old board. Raises KeyError for an unknown screen.
+        """
+        screen = self.screens[screen_id]
+        board = self._boards[screen.station]
+        now = time.monotonic()
+        with self._cond:
+            self._start()
+            if now - board.last_request > self.idle and not board.polling:
+                board.next_poll = now
+                self._queue(board)
+                self._cond.notify()
+            board.last_request = now
+            fresh = board.updated is not None and now - board.updated <= 2 * self.interval
+            done = board.done
+        if not fresh:
+            done.wait(timeout)
+        with self._cond:
+            return board.views.get(screen_id), board.error
+
+    def refresh_in(self, screen_id: str) -> float:
+        """Return the seconds until a screen's station should have a new board."""
+        board = self._boards[self.screens[screen_id].station]
+        with self._cond:
+            # The next poll starts at next_poll and takes about as long as the last
+            due = board.next_poll + (board.poll_ms or 0) / 1000
+        return max(0.0, due - time.monotonic())
+
+    def _start(self) -> None:
+        """Start the scheduler thread and poll pool on first use (lock held)."""
+        if self._thread is None:
+            # Created lazily so gunicorn's forked workers each get their own
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='screen-poll')
+            self._thread = threading.Thread(target=self._run, name='screen-scheduler',
+                                            daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _queue(board: _StationBoard) -> None:
+        """Give a board a fresh completion event for its next poll (lock held)."""
+        if board.done.is_set():
+            board.done = threading.Event()
+
+    def _run(self) -> None:
+        """Submit a poll for each active station whenever it falls due."""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                wake = now + self.interval
+                due = []
+                for board in self._boards.values():
+                    if board.polling or now - board.last_request > self.idle:
+                        continue
+                    if board.next_poll <= now:
+                        board.polling = True
+                        self._queue(board)
+                        due.append(board)
+                    else:
+                        wake = min(wake, board.next_poll)
+                if not due:
+                    self._cond.wait(wake - now)
+                    continue
+            for board in due:
+                self._executor.submit(self._poll, board)
+
+    def _poll(self, board: _StationBoard) -> None:
+        """Refresh one station's views."""
+        started = time.monotonic()
+        try:
+            views = self.refresh(board.station, board.screens)
+        except Exception as e:  # Keep serving the last views whatever went wrong
+            _LOGGER.warning("Polling %s for %d screens failed: %s",
+                            board.station, len(board.screens), str(e))
+            views, error = None, str(e)
+        else:
+            error = None
+        finished = time.monotonic()
+        with self._cond:
+            board.polls += 1
+            board.poll_ms = (finished - started) * 1000
+            if views is None:
+                board.failures += 1
+            else:
+                board.views = views
+                board.updated = finished
+            board.error = error
+            board.next_poll = started + self.interval
+            board.polling = False
+            board.done.set()
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        """Return the registry and the poll state of every station."""
+        now = time.monotonic()
+        with self._cond:
+            stations = [
+                {
+                    'station': board.station,
+                    'screens': [screen.id for screen in board.screens],
+                    'active': now - board.last_request <= self.idle,
+                    'polls': board.polls,
+                    'failures': board.failures,
+                    'last_poll_ms': round(board.poll_ms, 1) if board.poll_ms is not None else None,
+                    'age_seconds': round(now - board.updated, 1) if board.updated is not None else None,
+                    'error': board.error,
+                }
+                for board in sorted(self._boards.values(), key=lambda b: b.station)
+            ]
+        return {
+            'screen_count': len(self.screens),
+            'stations': stations,
+            'active_stations': sum(1 for s in stations if s['active']),
+            'poll_interval': self.interval,
+            'idle_seconds': self.idle,
+        }
+
+
+def screens_from_env(refresh: Callable[[str, list[Screen]], dict[str, Any]]
+                     ) -> Optional[ScreenHub]:
+    """Build the hub for SCREENS_FILE, or None when multi-screen mode is off."""
+    path = os.environ.get('SCREENS_FILE', '')
+    if not path:
+        return None
+    try:
+        screens = load_screens(path)
+    except (OSError, ValueError) as e:
+        _LOGGER.error("Multi-screen mode disabled; cannot load %s: %s", path, str(e))
+        return None
+    hub = ScreenHub(
+        screens,
+        refresh,
+        interval=float(os.environ.get('SCREEN_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)),
+        idle=float(os.environ.get('SCREEN_IDLE_SECONDS', DEFAULT_IDLE_SECONDS)),
+        workers=int(os.environ.get('SCREEN_POLL_WORKERS', DEFAULT_POLL_WORKERS)),
+    )
+    _LOGGER.info("Multi-screen mode: %d screens across %d stations",
+                 len(screens), len(hub.stats()['stations']))
+    return hub
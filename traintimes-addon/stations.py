@@ -0,0 +1,189 @@
+"""
+UK station reference index: CRS lookup, autocomplete and fuzzy search
+
+The station list is bundled in stations.csv next to this module, one
+"CRS,Name" row per station, and is only read the first time the index is
+used. Names are indexed two ways:
+
+    prefix trie    every word of every name, plus the CRS code, so "kin"
+                   finds London King's Cross and "kgx" finds it by code
+    trigram index  three-letter fragments of each name, for misspellings
+                   such as "edinbrugh"
+
+A "# complete" line in the data file marks it as the full list of stations.
+Only then are unknown CRS codes rejected; otherwise any well-formed code is
+passed on to Darwin, which remains the judge. Rebuild the file from
+NaPTAN's RailReferences.csv with tools/build_station_index.py.
+"""
+
+import os
+import re
+import threading
+from typing import Optional
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stations.csv')
+
+_CRS = re.compile(r'^[A-Z]{3}$')
+_NOT_WORD = re.compile(r'[^a-z0-9]+')
+
+# Ranks, best first
+_RANK_CODE = 0      # query is the station's CRS code
+_RANK_NAME = 1      # name starts with the query
+_RANK_WORDS = 2     # every query word starts a word of the name
+_RANK_FUZZY = 3     # enough shared trigrams
+_MIN_SIMILARITY = 0.3
+
+
+def normalize(text: str) -> str:
+    """Return text lower-cased with punctuation dropped, for matching."""
+    text = text.lower().replace('&', ' and ').replace("'", '')
+    return _NOT_WORD.sub(' ', text).strip()
+
+
+def is_crs(code: str) -> bool:
+    """Check that a code has the shape of a CRS code."""
+    return bool(_CRS.match(code or ''))
+
+
+def _trigrams(text: str) -> set[str]:
+    """Return the trigrams of text, padded so word starts count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationIndex:
+    """Station names by CRS code with prefix and fuzzy search."""
+
+    def __init__(self, stations: dict[str, str], complete: bool = False):
+        """Initialize the index from a CRS code to name mapping."""
+        self.complete = complete
+        self.names = stations
+        self._codes = sorted(stations)
+        self._numbers = {code: number for number, code in enumerate(self._codes)}
+        self._normalized = [normalize(stations[code]) for code in self._codes]
+        self._trie: dict = {}
+        self._trigrams: dict[str, list[int]] = {}
+        for number, (code, name) in enumerate(zip(self._codes, self._normalized)):
+            for word in set(name.split()) | {code.lower()}:
+                self._insert(word, number)
+            for trigram in _trigrams(name):
+                self._trigrams.setdefault(trigram, []).append(number)
+        self._trigram_counts = [len(_trigrams(name)) for name in self._normalized]
+
+    def _insert(self, word: str, number: int) -> None:
+        """Add a word of station number to the trie."""
+        node = self._trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault('', []).append(number)
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        """Return the stations with a word starting with prefix."""
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key:
+                    stack.append(child)
+                else:
+                    found.update(child)
+        return found
+
+    def __len__(self) -> int:
+        """Return the number of stations."""
+        return len(self._codes)
+
+    def name(self, code: str) -> Optional[str]:
+        """Return the station name for a CRS code, or None if unknown."""
+        return self.names.get((code or '').upper())
+
+    def accepts(self, code: str) -> bool:
+        """Check a CRS code is worth asking Darwin about.
+
+        Malformed codes are always refused; unknown ones only when the
+        bundled list is complete.
+        """
+        code = (code or '').upper()
+        return is_crs(code) and (code in self.names or not self.complete)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """Return the CRS code for a code or exact station name, or None."""
+        code = (text or '').strip().upper()
+        if code in self.names:
+            return code
+        wanted = normalize(text or '')
+        for result in self.search(text, limit=2):
+            if normalize(result['name']) == wanted:
+                return result['crs']
+        return code if self.accepts(code) else None
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Return the best matching stations for a name, word prefix or code."""
+        text = normalize(query or '')
+        if not text or limit <= 0:
+            return []
+        ranked: dict[int, tuple] = {}
+        code = text.upper().replace(' ', '')
+        if code in self.names:
+            ranked[self._numbers[code]] = (_RANK_CODE, 0)
+
+        words = text.split()
+        matches = self._prefixed(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches &= self._prefixed(word)
+        for number in matches:
+            rank = _RANK_NAME if self._normalized[number].startswith(text) else _RANK_WORDS
+            ranked.setdefault(number, (rank, len(self._normalized[number])))
+
+        if len(ranked) < limit and len(text) >= 3:
+            query_trigrams = _trigrams(text)
+            shared: dict[int, int] = {}
+            for trigram in query_trigrams:
+                for number in self._trigrams.get(trigram, ()):
+                    shared[number] = shared.get(number, 0) + 1
+            for number, count in shared.items():
+                # Dice coefficient of the two trigram sets
+                similarity = 2 * count / (len(query_trigrams) + self._trigram_counts[number])
+                if similarity >= _MIN_SIMILARITY and number not in ranked:
+                    ranked[number] = (_RANK_FUZZY, -similarity)
+
+        best = sorted(ranked, key=lambda n: (*ranked[n], self._normalized[n]))[:limit]
+        return [{'crs': self._codes[n], 'name': self.names[self._codes[n]]} for n in best]
+
+
+def load_stations(path: str = DATA_FILE) -> StationIndex:
+    """Read a "CRS,Name" station file into an index."""
+    stations = {}
+    complete = False
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            line = line.strip()
+            if line.startswith('#'):
+                complete = complete or line[1:].strip().lower() == 'complete'
+                continue
+            code, _, name = line.partition(',')
+            if is_crs(code) and name:
+                stations[code] = name
+    return StationIndex(stations, complete)
+
+
+_index: Optional[StationIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    """Return the shared station index, loading it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_stations()
+    return _index
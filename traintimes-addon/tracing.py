@@ -0,0 +1,400 @@
+"""
+Request tracing for the standalone departure board
+
+Spans follow the OpenTelemetry data model (128-bit trace IDs, 64-bit span
+IDs, nanosecond timestamps, attributes and status) and are handed to a
+pluggable exporter when their trace finishes. Console and JSON-lines file
+exporters are included. When the opentelemetry package is installed,
+TRACING_EXPORTER=otel sends spans through the OpenTelemetry API instead,
+so an SDK configured in the environment (e.g. OTLP) picks them up.
+
+Configuration (environment):
+    TRACING_EXPORTER     none | console | file | otel (default none)
+    TRACING_FILE         path for the file exporter (default traces.jsonl)
+    TRACING_SAMPLE_RATE  fraction of requests traced (default 1.0)
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+STATUS_UNSET = "UNSET"
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+DEFAULT_TRACE_FILE = "traces.jsonl"
+# Rotate the trace file to <file>.1 once it reaches this size
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024
+
+_current_span = contextvars.ContextVar('traintimes_current_span', default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'start_ns',
+                 'end_ns', 'attributes', 'status', 'status_message')
+
+    def __init__(self, tracer: 'Tracer', name: str, trace_id: str,
+                 parent_id: Optional[str], start_ns: int, attributes: dict):
+        """Initialize the span."""
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Return the span duration in milliseconds (0 while running)."""
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns else 0.0
+
+    def set_attribute(self, key: str, value) -> None:
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+    def set_status(self, status: str, message: Optional[str] = None) -> None:
+        """Set the span status."""
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException) -> None:
+        """Mark the span as failed by an exception."""
+        self.set_status(STATUS_ERROR, str(exc))
+        self.attributes['exception.type'] = type(exc).__name__
+        kind = getattr(exc, 'kind', None)
+        if kind:
+            self.attributes['error.kind'] = kind
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        """Finish the span and hand it to the tracer."""
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self.tracer._finish(self)
+
+    def to_dict(self) -> dict:
+        """Return the span in OTLP JSON field names."""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': {'code': self.status, 'message': self.status_message or ''},
+        }
+
+
+class _NoopSpan:
+    """Span stand-in used when tracing is off or a request is not sampled."""
+
+    __slots__ = ()
+    name = ''
+    duration_ms = 0.0
+
+    def set_attribute(self, key, value):
+        """Ignore the attribute."""
+
+    def set_status(self, status, message=None):
+        """Ignore the status."""
+
+    def record_exception(self, exc):
+        """Ignore the exception."""
+
+    def end(self, end_ns=None):
+        """Do nothing."""
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class NoopTracer:
+    """Tracer that records nothing; the default when tracing is off."""
+
+    enabled = False
+
+    def start_span(self, name, attributes=None, parent=None, start_ns=None):
+        """Return the no-op span."""
+        return NOOP_SPAN
+
+    @contextmanager
+    def span(self, name, attributes=None):
+        """Run the block without recording a span."""
+        yield NOOP_SPAN
+
+    def record_span(self, name, start_ns, end_ns, attributes=None, parent=None):
+        """Ignore the interval."""
+
+    def activate(self, span):
+        """Return a token for deactivate()."""
+        return None
+
+    def deactivate(self, token):
+        """Do nothing."""
+
+    def current_span(self):
+        """Return the no-op span."""
+        return NOOP_SPAN
+
+
+class Tracer:
+    """Creates spans and exports each trace once its root span ends."""
+
+    enabled = True
+
+    def __init__(self, exporter, sample_rate: float = 1.0):
+        """Initialize the tracer."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._pending: dict[str, list[Span]] = {}
+        self._lock = threading.Lock()
+
+    def current_span(self):
+        """Return the span active in this context, if any."""
+        return _current_span.get() or NOOP_SPAN
+
+    def start_span(self, name: str, attributes: Optional[dict] = None, parent=None,
+                   start_ns: Optional[int] = None):
+        """Start a span under parent (default: the current span).
+
+        Root spans are sampled at sample_rate; children follow their root.
+        Children started after their trace was exported are dropped.
+        """
+        parent = parent if parent is not None else _current_span.get()
+        if parent is NOOP_SPAN or (parent is None and random.random() >= self.sample_rate):
+            return NOOP_SPAN
+        if parent is None:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        span = Span(self, name, trace_id, parent_id, start_ns or time.time_ns(),
+                    dict(attributes or {}))
+        with self._lock:
+            if parent_id is None:
+                self._pending[trace_id] = [span]
+            elif trace_id in self._pending:
+                self._pending[trace_id].append(span)
+            else:
+                return NOOP_SPAN
+        return span
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[dict] = None):
+        """Run the block inside a child of the current span."""
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start_ns: int, end_ns: int,
+                    attributes: Optional[dict] = None, parent=None) -> None:
+        """Record an interval that was measured rather than wrapped."""
+        self.start_span(name, attributes, parent, start_ns).end(end_ns)
+
+    def activate(self, span):
+        """Make span current; returns a token for deactivate()."""
+        return _current_span.set(span)
+
+    def deactivate(self, token) -> None:
+        """Restore the span that was current before activate()."""
+        _current_span.reset(token)
+
+    def _finish(self, span: Span) -> None:
+        """Export the trace once its root span has ended."""
+        if span.parent_id is not None:
+            return
+        with self._lock:
+            spans = self._pending.pop(span.trace_id, [])
+        try:
+            self.exporter.export(spans)
+        except Exception as e:
+            _LOGGER.warning("Failed to export trace: %s", str(e))
+
+
+class ConsoleSpanExporter:
+    """Writes each trace as an indented tree of span durations."""
+
+    def __init__(self, stream=None):
+        """Initialize the exporter."""
+        self._stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        """Write one trace."""
+        children: dict[Optional[str], list[Span]] = {}
+        for span in spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = []
+
+        def walk(parent_id, depth):
+            for span in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+                attrs = ' '.join(f"{k}={v}" for k, v in span.attributes.items())
+                status = ' ERROR' if span.status == STATUS_ERROR else ''
+                # e.g. the losing half of a hedged request
+                duration = f"{span.duration_ms:.1f}ms" if span.end_ns else "unfinished"
+                lines.append(f"{'  ' * depth}{span.name} {duration}{status} {attrs}".rstrip())
+                walk(span.span_id, depth + 1)
+
+        walk(None, 0)
+        if spans:
+            lines.insert(0, f"trace {spans[0].trace_id}")
+        with self._lock:
+            self._stream.write('\n'.join(lines) + '\n')
+            self._stream.flush()
+
+
+class FileSpanExporter:
+    """Appends spans as JSON lines (OTLP field names), rotating at max_bytes."""
+
+    def __init__(self, path: str, max_bytes: int = TRACE_FILE_MAX_BYTES):
+        """Initialize the exporter."""
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        """Append one trace."""
+        data = ''.join(json.dumps(span.to_dict(), default=str) + '\n' for span in spans)
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+            except OSError:
+                pass
+            with open(self.path, 'a', encoding='utf-8') as out:
+                out.write(data)
+
+
+class _OtelSpan:
+    """Adapts an OpenTelemetry span to the Span interface used here."""
+
+    __slots__ = ('span',)
+
+    def __init__(self, span):
+        """Wrap an OpenTelemetry span."""
+        self.span = span
+
+    @property
+    def duration_ms(self) -> float:
+        """Durations are reported by the OpenTelemetry SDK."""
+        return 0.0
+
+    def set_attribute(self, key, value):
+        """Set an attribute on the span."""
+        self.span.set_attribute(key, value)
+
+    def set_status(self, status, message=None):
+        """Set the span status."""
+        from opentelemetry.trace import Status, StatusCode
+        self.span.set_status(Status(StatusCode[status], message))
+
+    def record_exception(self, exc):
+        """Record the exception and mark the span as failed."""
+        self.span.record_exception(exc)
+        self.set_status(STATUS_ERROR, str(exc))
+
+    def end(self, end_ns=None):
+        """End the span."""
+        self.span.end(end_time=end_ns)
+
+
+class OpenTelemetryTracer:
+    """Sends spans through the OpenTelemetry API (needs opentelemetry-api)."""
+
+    enabled = True
+
+    def __init__(self):
+        """Get a tracer from the globally configured OpenTelemetry provider."""
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer('traintimes')
+
+    def current_span(self):
+        """Return the active OpenTelemetry span."""
+        return _OtelSpan(self._trace.get_current_span())
+
+    def _context(self, parent):
+        """Return the OpenTelemetry context for an explicit parent."""
+        if parent is None:
+            return None
+        return self._trace.set_span_in_context(parent.span)
+
+    def start_span(self, name, attributes=None, parent=None, start_ns=None):
+        """Start a span under parent (default: the current span)."""
+        return _OtelSpan(self._tracer.start_span(
+            name, context=self._context(parent), attributes=attributes, start_time=start_ns
+        ))
+
+    @contextmanager
+    def span(self, name, attributes=None):
+        """Run the block inside a child of the current span."""
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield _OtelSpan(span)
+
+    def record_span(self, name, start_ns, end_ns, attributes=None, parent=None):
+        """Record an interval that was measured rather than wrapped."""
+        self.start_span(name, attributes, parent, start_ns).end(end_ns)
+
+    def activate(self, span):
+        """Make span current; returns a token for deactivate()."""
+        from opentelemetry import context
+        return context.attach(self._trace.set_span_in_context(span.span))
+
+    def deactivate(self, token):
+        """Restore the previous context."""
+        from opentelemetry import context
+        context.detach(token)
+
+
+def create_tracer(exporter: str = 'none', path: str = DEFAULT_TRACE_FILE,
+                  sample_rate: float = 1.0):
+    """Build a tracer for an exporter name."""
+    exporter = (exporter or 'none').lower()
+    if exporter == 'console':
+        return Tracer(ConsoleSpanExporter(), sample_rate)
+    if exporter == 'file':
+        return Tracer(FileSpanExporter(path), sample_rate)
+    if exporter == 'otel':
+        try:
+            return OpenTelemetryTracer()
+        except ImportError:
+            _LOGGER.warning("TRACING_EXPORTER=otel but opentelemetry is not installed; "
+                            "tracing disabled")
+            return NoopTracer()
+    if exporter != 'none':
+        _LOGGER.warning("Unknown TRACING_EXPORTER %r; tracing disabled", exporter)
+    return NoopTracer()
+
+
+def tracer_from_env():
+    """Build the tracer configured by the TRACING_* environment variables."""
+    return create_tracer(
+        os.environ.get('TRACING_EXPORTER', 'none'),
+        os.environ.get('TRACING_FILE', DEFAULT_TRACE_FILE),
+        float(os.environ.get('TRACING_SAMPLE_RATE', '1.0')),
+    )
+
+
+NOOP_TRACER = NoopTracer()